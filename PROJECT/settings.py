@@ -22,6 +22,7 @@ INSTALLED_APPS = [
 
     # Custom apps
     'api',
+    'jobs',
 
     # 3rd party apps
     'rest_framework',
@@ -31,10 +32,24 @@ INSTALLED_APPS = [
     'corsheaders',
 ]
 
+# "database" looks the user up on every request, "cached" keeps users in an in-process TTL/LRU cache and
+# "claims" builds the user from token claims without touching the database. A user deactivated or given another
+# role is only dropped from the cache of the process that saved it, the other workers keep the old user for up to
+# USER_CACHE_TIMEOUT seconds, as they keep trusting the claims until the access token expires
+JWT_AUTHENTICATION_CLASSES = {
+    'database': 'rest_framework_simplejwt.authentication.JWTAuthentication',
+    'cached': 'api.authentication.CachedJWTAuthentication',
+    'claims': 'api.authentication.ClaimsJWTAuthentication',
+}
+JWT_AUTH_MODE = env.str('JWT_AUTH_MODE', default='database')
+USER_CACHE_TIMEOUT = env.int('USER_CACHE_TIMEOUT', default=60)
+USER_CACHE_SIZE = env.int('USER_CACHE_SIZE', default=10000)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        JWT_AUTHENTICATION_CLASSES[JWT_AUTH_MODE],
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
 }
 
 SIMPLE_JWT = {
@@ -70,13 +85,20 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=15),
 
     "TOKEN_OBTAIN_SERIALIZER": "api.serializers.MyTokenObtainPairSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "api.serializers.CachedTokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
 
+# Seconds a refreshed token keeps returning the tokens it was exchanged for, 0 disables reuse
+TOKEN_REFRESH_GRACE = env.int('TOKEN_REFRESH_GRACE', default=10)
+# How often each worker catches its blacklist Bloom filter up with the database, and rebuilds it from scratch
+TOKEN_BLACKLIST_SYNC_INTERVAL = env.int('TOKEN_BLACKLIST_SYNC_INTERVAL', default=5)
+TOKEN_BLACKLIST_REBUILD_INTERVAL = env.int('TOKEN_BLACKLIST_REBUILD_INTERVAL', default=3600)
+TOKEN_BLACKLIST_ERROR_RATE = 0.01
+
 CORS_ALLOW_ALL_ORIGINS = True
 
 MIDDLEWARE = [
@@ -131,9 +153,34 @@ else:
             'PORT': env.str("DB_PORT"),
             'USER': env.str("DB_USER"),
             'PASSWORD': env.str("DB_PASSWORD"),
+            # Keep connections open between requests, and check a reused one is still alive before a request
+            'CONN_MAX_AGE': env.int("DB_CONN_MAX_AGE", default=60),
+            'CONN_HEALTH_CHECKS': True,
         }
     }
 
+CACHES = {
+    'default': {
+        'BACKEND': env.str("CACHE_BACKEND", default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env.str("CACHE_LOCATION", default=''),
+    }
+}
+# Whether every process writing data (web workers, the sms and jobs workers, management commands) reads the same
+# cache. Caches invalidated by version bumps are only used when it does: local memory is kept per process, the
+# other processes would never see a bump and serve stale data. Set it with local memory for a single process server
+CACHE_SHARED = env.bool("CACHE_SHARED", default=CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache'))
+
+# Seconds to keep cached catalog responses (groups, subjects, rooms, teachers), 0 disables the cache, as does a
+# cache that is not shared (CACHE_SHARED)
+RESPONSE_CACHE_TIMEOUT = env.int("RESPONSE_CACHE_TIMEOUT", default=60 * 60)
+# Seconds to keep a computed teacher dashboard, 0 disables the cache
+DASHBOARD_CACHE_TIMEOUT = env.int("DASHBOARD_CACHE_TIMEOUT", default=60)
+# Seconds to keep a leaderboard page or rank, 0 disables the cache. Any point saved in a leaderboard invalidates it
+LEADERBOARD_CACHE_TIMEOUT = env.int("LEADERBOARD_CACHE_TIMEOUT", default=300)
+# Days no lesson is generated on, YYYY-MM-DD for a single date or MM-DD for every year
+LESSON_HOLIDAYS = env.list("LESSON_HOLIDAYS", default=[])
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -170,12 +217,52 @@ STATICFILES_DIRS = [
 
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# How homework downloads hand files to the front server: "x-accel-redirect" (nginx serving MEDIA_URL as an
+# internal location), "x-sendfile" (Apache, lighttpd) or empty to stream them from Django
+MEDIA_ACCEL = env.str("MEDIA_ACCEL", default="")
+
+# Chunked homework uploads: bytes per chunk (every chunk but the last must be this long, changing it changes the
+# content hashes of new uploads), the largest file accepted and seconds an idle upload or unused file is kept
+UPLOAD_CHUNK_SIZE = env.int("UPLOAD_CHUNK_SIZE", default=8 * 1024 * 1024)
+UPLOAD_MAX_SIZE = env.int("UPLOAD_MAX_SIZE", default=2 * 1024 * 1024 * 1024)
+UPLOAD_SESSION_TIMEOUT = env.int("UPLOAD_SESSION_TIMEOUT", default=24 * 60 * 60)
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Custom User model
 AUTH_USER_MODEL = 'api.User'
 
+# Background jobs: attempts before a job is left failed, seconds before the first retry (doubled on every further
+# one), seconds a job may run before it is taken as crashed and seconds finished jobs are kept
+JOBS_MAX_ATTEMPTS = env.int("JOBS_MAX_ATTEMPTS", default=3)
+JOBS_RETRY_DELAY = env.int("JOBS_RETRY_DELAY", default=30)
+JOBS_TIMEOUT = env.int("JOBS_TIMEOUT", default=30 * 60)
+JOBS_KEEP_FINISHED = env.int("JOBS_KEEP_FINISHED", default=7 * 24 * 60 * 60)
+# Tasks the workers queue on their own and seconds between their runs, e.g. api.prune_tokens=3600,jobs.prune_jobs=86400
+JOBS_SCHEDULE = env.dict("JOBS_SCHEDULE", subcast_values=int, default={})
+
 # Eskiz (SMS provider)
 ESKIZ_EMAIL = env.str("ESKIZ_EMAIL")
 ESKIZ_SECRET_TOKEN = env.str("ESKIZ_SECRET_TOKEN")
+ESKIZ_API_URL = env.str("ESKIZ_API_URL", default="https://notify.eskiz.uz/api")
+ESKIZ_SENDER = env.str("ESKIZ_SENDER", default="4546")
+# Public URL of /api/v1/sms/status/ with ?secret=<ESKIZ_CALLBACK_SECRET>, where Eskiz reports delivery. Empty leaves
+# sent messages as sent
+ESKIZ_CALLBACK_URL = env.str("ESKIZ_CALLBACK_URL", default="")
+ESKIZ_CALLBACK_SECRET = env.str("ESKIZ_CALLBACK_SECRET", default="")
+
+# SMS outbox: messages per batch request, messages sent per second at most, attempts before a message fails and
+# seconds before the first retry, doubled on every further one
+SMS_BATCH_SIZE = env.int("SMS_BATCH_SIZE", default=200)
+SMS_RATE_LIMIT = env.float("SMS_RATE_LIMIT", default=50)
+SMS_MAX_ATTEMPTS = env.int("SMS_MAX_ATTEMPTS", default=5)
+SMS_RETRY_DELAY = env.int("SMS_RETRY_DELAY", default=60)
+# Texts of the messages, they have to match the templates approved by Eskiz
+SMS_DEBT_REMINDER_TEXT = env.str(
+    "SMS_DEBT_REMINDER_TEXT",
+    default="{student}: the payment for {month} is due, {debt} UZS left to pay.",
+)
+SMS_ABSENCE_ALERT_TEXT = env.str(
+    "SMS_ABSENCE_ALERT_TEXT",
+    default="{student} missed the {group} lesson on {date}.",
+)
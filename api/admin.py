@@ -14,3 +14,4 @@ admin.site.register(models.Payment)
 admin.site.register(models.Group)
 admin.site.register(models.Subject)
 admin.site.register(models.Room)
+admin.site.register(models.SmsMessage)
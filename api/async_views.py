@@ -0,0 +1,97 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, NotFound, \
+    PermissionDenied
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+
+class AsyncReadView(View):
+    """
+    Async list/retrieve of a viewset, reusing its queryset, serializer and keyset ordering. Rows are fetched
+    with the async ORM while the serializer runs on prefetched data, so a worker on the ASGI stack serves other
+    connections while a query is waiting. A serializer reaching for a relation that was not prefetched raises
+    SynchronousOnlyOperation instead of quietly querying per row. Requests are authenticated and checked with the
+    viewset's authentication and permission classes, which run in a thread as they may query the database
+    """
+
+    viewset = None
+
+    def get_queryset(self):
+        return self.viewset.serializer_class.load_requested(self.viewset.queryset.all(), self.request)
+
+    def get_serializer(self, *args, **kwargs):
+        return self.viewset.serializer_class(*args, context={"request": self.request, "view": self}, **kwargs)
+
+    @property
+    def keyset_ordering(self):
+        return getattr(self.viewset, "keyset_ordering", self.viewset.pagination_class.ordering)
+
+    async def get(self, request, pk=None):
+        # A DRF request gives serializers and the paginator query_params and absolute URLs
+        self.request = Request(request, authenticators=[auth() for auth in self.viewset.authentication_classes])
+        self.action = "list" if pk is None else "retrieve"
+        try:
+            await sync_to_async(self.check_permissions)()
+            data = await (self.list() if pk is None else self.retrieve(pk))
+        except APIException as exc:
+            return self.handle_exception(exc)
+        return self.render(data)
+
+    def get_permissions(self):
+        return [permission() for permission in self.viewset.permission_classes]
+
+    def permission_denied(self, permission):
+        if self.request.authenticators and not self.request.successful_authenticator:
+            raise NotAuthenticated()
+        raise PermissionDenied(getattr(permission, "message", None))
+
+    def check_permissions(self):
+        """
+        Authenticate the request and apply the viewset's permissions, as APIView.initial does
+        """
+        # Reading the user runs the authenticators
+        self.request.user
+        for permission in self.get_permissions():
+            if not permission.has_permission(self.request, self):
+                self.permission_denied(permission)
+
+    def check_object_permissions(self, instance):
+        for permission in self.get_permissions():
+            if not permission.has_object_permission(self.request, self, instance):
+                self.permission_denied(permission)
+
+    def handle_exception(self, exc):
+        """
+        The response an APIView answers with: 401 with the scheme to authenticate with, 403 when there is none
+        """
+        status, header = exc.status_code, None
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            authenticators = self.request.authenticators
+            header = authenticators[0].authenticate_header(self.request) if authenticators else None
+            if not header:
+                status = 403
+        response = self.render({"detail": exc.detail}, status=status)
+        if header:
+            response["WWW-Authenticate"] = header
+        return response
+
+    async def list(self):
+        paginator = self.viewset.pagination_class()
+        rows = await paginator.apaginate_queryset(self.get_queryset(), self.request, view=self)
+        return paginator.get_paginated_response(self.get_serializer(rows, many=True).data).data
+
+    async def retrieve(self, pk):
+        queryset = self.get_queryset()
+        try:
+            instance = await queryset.aget(pk=pk)
+        except (queryset.model.DoesNotExist, ValidationError, ValueError):
+            raise NotFound()
+        await sync_to_async(self.check_object_permissions)(instance)
+        return self.get_serializer(instance).data
+
+    @staticmethod
+    def render(data, status=200):
+        return HttpResponse(JSONRenderer().render(data), content_type="application/json", status=status)
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from .models import Attendance
+from .sms import queue_absence_alerts
+from .utils import UserRoles
+
+User = get_user_model()
+
+
+def lesson_roster(lesson):
+    """
+    Every active student of the lesson's group with their attendance, None when not marked yet
+    """
+    attendance = Attendance.objects.filter(lesson_id=lesson.pk, student_id=OuterRef("pk")).values("is_absent")[:1]
+    return list(
+        User.objects
+        .filter(student_groups=lesson.group_id, role=UserRoles.STUDENT, is_active=True)
+        .annotate(is_absent=Subquery(attendance))
+        .order_by("first_name", "last_name", "middle_name")
+        .values("id", "first_name", "last_name", "middle_name", "is_absent")
+    )
+
+
+def mark_attendance(lesson, marks):
+    """
+    Upsert the attendance of a whole lesson with a single INSERT ... ON CONFLICT statement.
+    `marks` maps student ids to is_absent, parents of absent students get an SMS alert. Returns (roster, ids of
+    students not enrolled in the lesson's group)
+    """
+    enrolled = set(
+        User.student_groups.through.objects
+        .filter(group_id=lesson.group_id, user_id__in=marks)
+        .values_list("user_id", flat=True)
+    )
+    unknown = set(marks) - enrolled
+    if unknown:
+        return None, unknown
+
+    with transaction.atomic():
+        Attendance.objects.bulk_create(
+            [Attendance(lesson_id=lesson.pk, student_id=student_id, is_absent=is_absent)
+             for student_id, is_absent in marks.items()],
+            update_conflicts=True,
+            unique_fields=["lesson", "student"],
+            update_fields=["is_absent", "updated"],
+        )
+        queue_absence_alerts(lesson, marks)
+    return lesson_roster(lesson), set()
@@ -0,0 +1,121 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+
+class ClaimsUser(TokenUser):
+    """
+    Request user built from the claims MyTokenObtainPairSerializer puts into the token, without a database lookup
+    """
+
+    @cached_property
+    def role(self):
+        return self.token["role_code"]
+
+    @cached_property
+    def get_role_name(self):
+        return self.token.get("role", "")
+
+    @cached_property
+    def full_name(self):
+        return " ".join(filter(None, (self.first_name, self.last_name, self.middle_name)))
+
+    def __getattr__(self, attr):
+        # TokenUser proxies unknown attributes to the token, missing claims read as empty instead of None
+        if attr in ("email", "first_name", "last_name", "middle_name"):
+            return self.token.get(attr, "")
+        return super().__getattr__(attr)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Authenticates from token claims alone. Tokens issued before the role code claim existed fall back to the
+    database, a deactivated user keeps access until their access token expires
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken("Token contained no recognizable user identification")
+        if "role_code" not in validated_token:
+            return super().get_user(validated_token)
+        return ClaimsUser(validated_token)
+
+
+class UserCache:
+    """
+    Thread safe in-process LRU cache of users with a TTL. Each worker process has its own, so a change made in
+    another process is seen once the entry expires
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def timeout(self):
+        return settings.USER_CACHE_TIMEOUT
+
+    @property
+    def max_size(self):
+        return settings.USER_CACHE_SIZE
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        # Views may change request.user, they get their own copy
+        return copy.copy(user)
+
+    def set(self, key, user):
+        if self.timeout <= 0 or self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (copy.copy(user), time.monotonic() + self.timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(str(key), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Looks users up in the database at most once per USER_CACHE_TIMEOUT seconds per process. Saving or deleting
+    a user, which covers deactivation and role changes, drops it from this process's cache only, other processes
+    notice once their entry expires
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        key = str(user_id)
+        user = user_cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(key, user)
+        return user
@@ -0,0 +1,75 @@
+import time
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+
+def version_key(name):
+    return f"api:version:{name}"
+
+
+def get_versions(*names):
+    """
+    Current version of each named data set. A version missing from the cache (never set or evicted) starts
+    from the current time, so it never repeats a number that older cached responses could still be stored under
+    """
+    keys = [version_key(name) for name in names]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(*names):
+    """
+    Invalidate every response cached for the named data sets once the current transaction commits
+    """
+    def bump():
+        for name in names:
+            try:
+                cache.incr(version_key(name))
+            except ValueError:
+                cache.add(version_key(name), time.time_ns(), timeout=None)
+
+    transaction.on_commit(bump)
+
+
+class CachedResponseMixin:
+    """
+    Caches rendered list/retrieve JSON responses of a viewset under the versions of `cache_versions`, so a
+    save anywhere in those data sets invalidates all of them with a single version bump. Only used with a shared
+    cache (CACHE_SHARED), a bump in one process' local memory would not reach the others
+    """
+
+    cache_versions = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+        if not timeout or not settings.CACHE_SHARED or request.accepted_renderer.format != "json":
+            return handler(request, *args, **kwargs)
+
+        versions = ":".join(str(version) for version in get_versions(*self.cache_versions))
+        url = md5(request.build_absolute_uri().encode()).hexdigest()
+        key = f"api:response:{self.basename}:{self.action}:{versions}:{url}"
+
+        content = cache.get(key)
+        if content is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            content = JSONRenderer().render(response.data)
+            cache.set(key, content, timeout=timeout)
+
+        return HttpResponse(content, content_type="application/json")
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .cache import bump_version
+from .models import Group, Subject
+from .utils import UserRoles
+
+User = get_user_model()
+Enrollment = User.student_groups.through
+
+
+def students_count_subquery():
+    """
+    Number of active students enrolled in the outer group
+    """
+    enrollments = (
+        Enrollment.objects
+        .filter(group_id=OuterRef("pk"), user__is_active=True, user__role=UserRoles.STUDENT)
+        .order_by()
+        .values("group_id")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    return Coalesce(Subquery(enrollments, output_field=IntegerField()), Value(0))
+
+
+def groups_count_subquery():
+    """
+    Number of groups of the outer subject
+    """
+    groups = (
+        Group.objects
+        .filter(subject_id=OuterRef("pk"))
+        .order_by()
+        .values("subject_id")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    return Coalesce(Subquery(groups, output_field=IntegerField()), Value(0))
+
+
+def refresh_students_count(groups):
+    """
+    Recount active students of the given groups (ids or a queryset) with a single UPDATE
+    """
+    bump_version("group")
+    return Group.objects.filter(pk__in=groups).update(students_count=students_count_subquery())
+
+
+def refresh_groups_count(subjects):
+    """
+    Recount groups of the given subjects (ids or a queryset) with a single UPDATE
+    """
+    bump_version("subject")
+    return Subject.objects.filter(pk__in=subjects).update(groups_count=groups_count_subquery())
+
+
+def change_groups_count(subject_id, delta):
+    """
+    Shift a subject's group counter by `delta` without reading it first, never below 0 so a counter that drifted
+    does not fail the save of a group
+    """
+    bump_version("subject")
+    Subject.objects.filter(pk=subject_id).update(groups_count=Greatest(F("groups_count") + delta, 0))
+
+
+def rebuild_counters(batch_size=1000):
+    """
+    Recount every counter in batches of `batch_size` rows, returns the number of (subjects, groups) processed
+    """
+    subjects = _rebuild(Subject.objects.all(), refresh_groups_count, batch_size)
+    groups = _rebuild(Group.objects.all(), refresh_students_count, batch_size)
+    return subjects, groups
+
+
+def _rebuild(queryset, refresh, batch_size):
+    ids = list(queryset.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(ids), batch_size):
+        refresh(ids[start:start + batch_size])
+    return len(ids)
@@ -0,0 +1,134 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Avg, Case, Count, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Attendance, Group, Homework, Lesson, Payment, Point
+from .reports import MONEY, expected_amount, month_bounds
+from .utils import UserRoles
+
+User = get_user_model()
+Enrollment = User.student_groups.through
+
+
+def recent_lessons(group_ref, lessons):
+    """
+    Ids of the last `lessons` lessons of the referenced group
+    """
+    return Lesson.objects.filter(group_id=group_ref).order_by("-created", "-id").values("pk")[:lessons]
+
+
+def group_total(queryset, group_field, aggregate, output_field):
+    """
+    Subquery aggregating the rows of `queryset` that belong to the outer group
+    """
+    return Subquery(
+        queryset.filter(**{group_field: OuterRef("pk")}).order_by().values(group_field)
+        .annotate(total=aggregate).values("total"),
+        output_field=output_field,
+    )
+
+
+def dashboard_groups(teacher_id, year, month, lessons):
+    """
+    One row per group of the teacher running in the given month, with enrolled students, expected and collected
+    revenue of the month, attendance rate over the last `lessons` lessons and the average point, in one query
+    """
+    first_day, last_day = month_bounds(year, month)
+    zero = Value(Decimal(0))
+
+    expected = group_total(
+        Enrollment.objects.filter(user__is_active=True, user__role=UserRoles.STUDENT),
+        "group_id", Sum(expected_amount()), MONEY,
+    )
+    collected = group_total(Payment.objects.filter(year=year, month=month), "group_id", Sum("amount"), MONEY)
+    attendance_rate = group_total(
+        Attendance.objects.filter(lesson_id__in=recent_lessons(OuterRef(OuterRef("pk")), lessons)),
+        "lesson__group_id",
+        Avg(Case(When(is_absent=False, then=Value(1.0)), default=Value(0.0), output_field=FloatField())),
+        FloatField(),
+    )
+    average_point = group_total(Point.objects.all(), "homework__lesson__group_id", Avg("amount"), FloatField())
+
+    return Group.objects.filter(
+        teacher_id=teacher_id,
+        start_date__lte=last_day,
+        end_date__gte=first_day,
+    ).annotate(
+        expected=Coalesce(expected, zero, output_field=MONEY),
+        collected=Coalesce(collected, zero, output_field=MONEY),
+        attendance_rate=attendance_rate,
+        average_point=average_point,
+    ).order_by("name").values(
+        "id", "name", "subject__name", "students_count", "expected", "collected", "attendance_rate",
+        "average_point",
+    )
+
+
+def dashboard_homework(group_ids, lessons):
+    """
+    Homework of the last `lessons` lessons of each group with its number of points and average point, in one query
+    """
+    return Homework.objects.filter(
+        lesson__group_id__in=group_ids,
+        lesson_id__in=recent_lessons(OuterRef("lesson__group_id"), lessons),
+    ).annotate(
+        points=Count("point"),
+        average_point=Avg("point__amount"),
+    ).order_by("-deadline").values(
+        "id", "lesson__group_id", "lesson__theme", "deadline", "points", "average_point",
+    )
+
+
+def teacher_dashboard(teacher_id, year, month, lessons=10):
+    """
+    Dashboard of a teacher's groups built with two queries, cached for DASHBOARD_CACHE_TIMEOUT seconds
+    """
+    key = f"api:dashboard:{teacher_id}:{year}:{month}:{lessons}"
+    timeout = settings.DASHBOARD_CACHE_TIMEOUT
+    if timeout:
+        dashboard = cache.get(key)
+        if dashboard is not None:
+            return dashboard
+
+    groups = {}
+    for row in dashboard_groups(teacher_id, year, month, lessons):
+        rate, point = row["attendance_rate"], row["average_point"]
+        groups[row["id"]] = {
+            "id": row["id"],
+            "name": row["name"],
+            "subject": row["subject__name"],
+            "students": row["students_count"],
+            "expected": row["expected"],
+            "collected": row["collected"],
+            "debt": max(row["expected"] - row["collected"], Decimal(0)),
+            "attendance_rate": round(rate, 4) if rate is not None else None,
+            "average_point": round(point, 2) if point is not None else None,
+            "homework": [],
+        }
+
+    if groups:
+        for row in dashboard_homework(list(groups), lessons):
+            point = row["average_point"]
+            groups[row["lesson__group_id"]]["homework"].append({
+                "id": row["id"],
+                "theme": row["lesson__theme"],
+                "deadline": row["deadline"],
+                "points": row["points"],
+                "average_point": round(point, 2) if point is not None else None,
+            })
+
+    dashboard = {
+        "year": year,
+        "month": month,
+        "lessons": lessons,
+        "total_expected": sum(group["expected"] for group in groups.values()),
+        "total_collected": sum(group["collected"] for group in groups.values()),
+        "groups": list(groups.values()),
+    }
+    if timeout:
+        cache.set(key, dashboard, timeout)
+    return dashboard
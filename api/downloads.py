@@ -0,0 +1,133 @@
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .models import Group
+from .utils import UserRoles
+
+User = get_user_model()
+Enrollment = User.student_groups.through
+Family = User.parent_students.through
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def can_access_group(user, group_id):
+    """
+    Whether a user may see a group's materials: staff always, a teacher in their own groups, a student in the
+    groups they are enrolled in and a parent in their children's groups
+    """
+    if not user.is_authenticated:
+        return False
+    role = getattr(user, "role", None)
+    if role in (UserRoles.SUPERUSER, UserRoles.ADMIN):
+        return True
+    if role == UserRoles.TEACHER:
+        return Group.objects.filter(pk=group_id, teacher_id=user.pk).exists()
+    if role == UserRoles.STUDENT:
+        return Enrollment.objects.filter(group_id=group_id, user_id=user.pk).exists()
+    if role == UserRoles.PARENT:
+        children = Family.objects.filter(user_id=user.pk).values("student_id")
+        return Enrollment.objects.filter(group_id=group_id, user_id__in=children).exists()
+    return False
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive of a single byte range request, None to send the whole file (no or several ranges)
+    and ValueError when the range lies outside the file
+    """
+    match = RANGE_PATTERN.match(header or "")
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+class FileRange:
+    """
+    Reads at most `length` bytes of an open file from its current position. `fileno` lets the WSGI server's
+    file wrapper send the range with sendfile() without reading it into Python
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def file_response(request, name, file_name, content_type="", etag=None):
+    """
+    Response sending the media file `name` as an attachment called `file_name`. With MEDIA_ACCEL set, the bytes
+    are left to the front server through X-Accel-Redirect (nginx) or X-Sendfile (Apache, lighttpd), which handle
+    ranges and conditional requests themselves. Otherwise the file is streamed with FileResponse, answering
+    If-None-Match, If-Modified-Since and single byte Range requests
+    """
+    content_type = content_type or "application/octet-stream"
+    disposition = f"attachment; filename*=UTF-8''{quote(file_name)}"
+
+    if settings.MEDIA_ACCEL:
+        response = HttpResponse(content_type=content_type)
+        response["Content-Disposition"] = disposition
+        if settings.MEDIA_ACCEL == "x-sendfile":
+            response["X-Sendfile"] = os.path.join(settings.MEDIA_ROOT, name)
+        else:
+            response["X-Accel-Redirect"] = quote(f"/{settings.MEDIA_URL.strip('/')}/{name}")
+        if etag:
+            response["ETag"] = etag
+        return response
+
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    stat = os.stat(path)
+    if (etag and request.headers.get("If-None-Match") == etag) or (
+            "If-None-Match" not in request.headers
+            and not was_modified_since(request.headers.get("If-Modified-Since"), stat.st_mtime)):
+        return HttpResponseNotModified()
+
+    try:
+        byte_range = parse_range(request.headers.get("Range"), stat.st_size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{stat.st_size}"
+        return response
+
+    file = open(path, "rb")
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(FileRange(file, end - start + 1), status=206, content_type=content_type)
+        response["Content-Length"] = end - start + 1
+        response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    response["Content-Disposition"] = disposition
+    response["Accept-Ranges"] = "bytes"
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    if etag:
+        response["ETag"] = etag
+    return response
@@ -0,0 +1,235 @@
+import csv
+import inspect
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.contrib.auth import get_user_model
+from django.db.models import Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from .models import Payment, Expense, Attendance
+from .utils import UserRoles
+
+User = get_user_model()
+
+# Rows fetched per database round trip and written per yielded chunk
+CHUNK_SIZE = 2000
+
+
+def export_payments(date_from=None, date_to=None, group=None):
+    payments = Payment.objects.order_by("created")
+    if date_from:
+        payments = payments.filter(created__date__gte=date_from)
+    if date_to:
+        payments = payments.filter(created__date__lte=date_to)
+    if group:
+        payments = payments.filter(group_id=group)
+    header = ["Created", "Year", "Month", "Student", "Group", "Amount", "Description"]
+    return header, payments.values_list("created", "year", "month", "student_name", "group_name", "amount",
+                                        "description")
+
+
+def export_expenses(date_from=None, date_to=None):
+    expenses = Expense.objects.order_by("created")
+    if date_from:
+        expenses = expenses.filter(created__date__gte=date_from)
+    if date_to:
+        expenses = expenses.filter(created__date__lte=date_to)
+    header = ["Created", "Assigned by", "Assigned to", "Amount", "Description"]
+    return header, expenses.values_list("created", "assigned_by_name", "assigned_to_name", "amount", "description")
+
+
+def export_attendance(date_from=None, date_to=None, group=None):
+    attendance = Attendance.objects.order_by("lesson__created", "student__first_name", "student__last_name")
+    if date_from:
+        attendance = attendance.filter(lesson__created__date__gte=date_from)
+    if date_to:
+        attendance = attendance.filter(lesson__created__date__lte=date_to)
+    if group:
+        attendance = attendance.filter(lesson__group_id=group)
+    header = ["Lesson", "Group", "Theme", "Student", "Absent"]
+    return header, attendance.annotate(
+        student_name=Concat("student__first_name", Value(" "), "student__last_name", Value(" "),
+                            "student__middle_name"),
+    ).values_list("lesson__created", "lesson__group__name", "lesson__theme", "student_name", "is_absent")
+
+
+def export_roster(group=None):
+    students = User.objects.filter(role=UserRoles.STUDENT, is_active=True)
+    if group:
+        students = students.filter(student_groups=group)
+    header = ["First name", "Last name", "Middle name", "Email", "Phone number", "Preferential", "Preferential amount"]
+    return header, students.order_by("first_name", "last_name").values_list(
+        "first_name", "last_name", "middle_name", "email", "phone_number", "is_preferential", "preferential_amount",
+    )
+
+
+EXPORTS = {
+    "payments": export_payments,
+    "expenses": export_expenses,
+    "attendance": export_attendance,
+    "rosters": export_roster,
+}
+
+
+def export_filters(name):
+    """
+    Names of the filters an export accepts, expenses have no group and rosters list current students
+    """
+    return list(inspect.signature(EXPORTS[name]).parameters)
+
+
+def format_value(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).strftime("%Y-%m-%d %H:%M:%S")
+    if value is None:
+        return ""
+    return value
+
+
+class _Buffer:
+    """
+    Write-only file object that hands everything written so far back to the generator
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(chunk.encode() if isinstance(chunk, str) else bytes(chunk) for chunk in self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_csv(header, rows):
+    """
+    Yield a CSV file chunk by chunk from an iterable of row tuples, memory stays constant
+    """
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    # BOM lets Excel detect UTF-8
+    buffer.write("\ufeff")
+    writer.writerow(header)
+    for index, row in enumerate(rows, start=1):
+        writer.writerow([format_value(value) for value in row])
+        if index % CHUNK_SIZE == 0:
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+class _ZipSink(io.RawIOBase):
+    """
+    Unseekable sink for zipfile, which then writes local headers with data descriptors and never seeks back
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.buffer = _Buffer()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+
+XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+# Characters XML 1.0 does not allow even when escaped
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def xlsx_cell(value):
+    value = format_value(value)
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f"<c><v>{value}</v></c>"
+    if isinstance(value, date):
+        value = value.isoformat()
+    text = escape(_INVALID_XML.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def stream_xlsx(header, rows):
+    """
+    Yield an XLSX workbook chunk by chunk from an iterable of row tuples, memory stays constant
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in XLSX_STATIC_PARTS.items():
+            workbook.writestr(name, content)
+        yield sink.buffer.drain()
+
+        with workbook.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            sheet.write(("<row>" + "".join(xlsx_cell(value) for value in header) + "</row>").encode())
+            for index, row in enumerate(rows, start=1):
+                sheet.write(("<row>" + "".join(xlsx_cell(value) for value in row) + "</row>").encode())
+                if index % CHUNK_SIZE == 0:
+                    yield sink.buffer.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.buffer.drain()
+
+
+FORMATS = {
+    "csv": (stream_csv, "text/csv; charset=utf-8"),
+    "xlsx": (stream_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+def stream_export(name, file_type, **filters):
+    """
+    Returns (chunk iterator, content type) of an export, rows are read with a server-side cursor in chunks
+    """
+    header, rows = EXPORTS[name](**filters)
+    stream, content_type = FORMATS[file_type]
+    return stream(header, rows.iterator(chunk_size=CHUNK_SIZE)), content_type
@@ -0,0 +1,161 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum, Value
+from django.db.models.functions import Concat, ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from .models import Expense, FinanceRollup, Payment
+
+# Fields of each breakdown: (id, name) of the row a rollup is summed into
+BREAKDOWNS = {
+    "group": ("group_id", "group__name"),
+    "subject": ("group__subject_id", "group__subject__name"),
+    "teacher": ("group__teacher_id", "teacher_name"),
+}
+
+
+def payment_rollup(payment):
+    """
+    (rollup key, income) of a payment, payments count towards the month they pay for
+    """
+    return (payment.year, payment.month, payment.group_id), Decimal(str(payment.amount))
+
+
+def expense_rollup(expense):
+    """
+    (rollup key, expense amount) of an expense, expenses count towards the month they were made in
+    """
+    created = timezone.localdate(expense.created)
+    return (created.year, created.month, None), Decimal(str(expense.amount))
+
+
+def apply_deltas(income=None, expenses=None):
+    """
+    Add amounts to rollups given as {(year, month, group id): amount}, one UPDATE per touched rollup and an
+    INSERT for rollups that do not exist yet
+    """
+    income, expenses = income or {}, expenses or {}
+    for key in set(income) | set(expenses):
+        income_delta, expenses_delta = income.get(key, 0), expenses.get(key, 0)
+        if not income_delta and not expenses_delta:
+            continue
+        year, month, group_id = key
+        rollups = FinanceRollup.objects.filter(year=year, month=month, group_id=group_id)
+        changes = {"income": F("income") + income_delta, "expenses": F("expenses") + expenses_delta}
+        if rollups.update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                FinanceRollup.objects.create(year=year, month=month, group_id=group_id, income=income_delta,
+                                             expenses=expenses_delta)
+        except IntegrityError:
+            # Created by a concurrent transaction in the meantime
+            rollups.update(**changes)
+
+
+def add_payments(payments, batch_size=1000):
+    """
+    Count newly inserted payments, e.g. after bulk_create which sends no signals. The rollups are read, updated
+    and inserted with a statement each, however many months and groups the payments touch
+    """
+    income = defaultdict(Decimal)
+    for payment in payments:
+        key, amount = payment_rollup(payment)
+        income[key] += amount
+    if not income:
+        return
+
+    keys = Q()
+    for year, month, group_id in income:
+        keys |= Q(year=year, month=month, group_id=group_id)
+    rollups = {(rollup.year, rollup.month, rollup.group_id): rollup
+               for rollup in FinanceRollup.objects.select_for_update().filter(keys)}
+    for key, rollup in rollups.items():
+        rollup.income += income[key]
+    FinanceRollup.objects.bulk_update(rollups.values(), ["income"], batch_size=batch_size)
+
+    missing = {key: amount for key, amount in income.items() if key not in rollups}
+    try:
+        with transaction.atomic():
+            FinanceRollup.objects.bulk_create(
+                [FinanceRollup(year=year, month=month, group_id=group_id, income=amount)
+                 for (year, month, group_id), amount in missing.items()],
+                batch_size=batch_size,
+            )
+    except IntegrityError:
+        # Some were created by a concurrent transaction in the meantime
+        apply_deltas(income=missing)
+
+
+def move_group_rollups(group_id):
+    """
+    Move a group's amounts to the rollups without a group, its payments lose their group when it is deleted
+    """
+    income, expenses = defaultdict(Decimal), defaultdict(Decimal)
+    for rollup in FinanceRollup.objects.filter(group_id=group_id):
+        income[rollup.year, rollup.month, None] += rollup.income
+        expenses[rollup.year, rollup.month, None] += rollup.expenses
+    apply_deltas(income, expenses)
+
+
+def rebuild_rollups(batch_size=1000):
+    """
+    Recompute every rollup from payments and expenses. Returns the number of rollups written
+    """
+    rows = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    payments = Payment.objects.order_by().values("year", "month", "group_id").annotate(total=Sum("amount"))
+    for row in payments:
+        rows[row["year"], row["month"], row["group_id"]][0] += row["total"]
+
+    expenses = (Expense.objects.order_by()
+                .values(created_year=ExtractYear("created"), created_month=ExtractMonth("created"))
+                .annotate(total=Sum("amount")))
+    for row in expenses:
+        rows[row["created_year"], row["created_month"], None][1] += row["total"]
+
+    rollups = [
+        FinanceRollup(year=year, month=month, group_id=group_id, income=income, expenses=outflow)
+        for (year, month, group_id), (income, outflow) in rows.items()
+    ]
+    with transaction.atomic():
+        FinanceRollup.objects.all().delete()
+        FinanceRollup.objects.bulk_create(rollups, batch_size=batch_size)
+    return len(rollups)
+
+
+def period_filter(start, end):
+    """
+    Rollups from the (year, month) `start` to `end` inclusive, in a form the (year, month) index serves
+    """
+    return (
+        (Q(year__gt=start[0]) | Q(year=start[0], month__gte=start[1]))
+        & (Q(year__lt=end[0]) | Q(year=end[0], month__lte=end[1]))
+    )
+
+
+def finance_report(start, end, by="month"):
+    """
+    Income, expenses and net profit between two (year, month) pairs, per month or per group, subject or teacher,
+    read from the rollups only. Amounts without a group, all expenses among them, form a row without an id
+    """
+    rollups = FinanceRollup.objects.filter(period_filter(start, end)).order_by()
+    totals = {"income": Sum("income"), "expenses": Sum("expenses")}
+    net = F("income") - F("expenses")
+
+    if by == "month":
+        return list(rollups.values("year", "month").annotate(**totals).annotate(net=net).order_by("year", "month"))
+
+    id_field, name_field = BREAKDOWNS[by]
+    if by == "teacher":
+        rollups = rollups.annotate(teacher_name=Concat(
+            "group__teacher__first_name", Value(" "), "group__teacher__last_name", Value(" "),
+            "group__teacher__middle_name",
+        ))
+    rows = rollups.values(id_field, name_field).annotate(**totals).annotate(net=net).order_by(name_field)
+    return [
+        {"id": row[id_field], "name": row[name_field], "income": row["income"], "expenses": row["expenses"],
+         "net": row["net"]}
+        for row in rows
+    ]
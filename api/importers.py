@@ -0,0 +1,190 @@
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .counters import refresh_students_count
+from .models import Student, Group, Parent
+from .serializers import StudentImportSerializer
+from .utils import UserRoles
+
+User = get_user_model()
+
+LIST_FIELDS = ("student_groups", "student_parents")
+# Below this many passwords starting worker processes costs more than it saves, and an import is quick enough to
+# run within the request
+POOL_THRESHOLD = 50
+
+
+def read_csv(file):
+    """
+    Parse a CSV upload (bytes or text) into row dicts, list columns are separated by ";"
+    """
+    if isinstance(file, (bytes, bytearray)):
+        file = file.decode("utf-8-sig")
+    if isinstance(file, str):
+        file = io.StringIO(file)
+    elif not isinstance(file, io.TextIOBase):
+        file = io.TextIOWrapper(file, encoding="utf-8-sig")
+
+    rows = []
+    for row in csv.DictReader(file):
+        row = {key.strip(): (value or "").strip() for key, value in row.items() if key}
+        for field in LIST_FIELDS:
+            row[field] = [value.strip() for value in row.get(field, "").split(";") if value.strip()]
+        if not row.get("preferential_amount"):
+            row.pop("preferential_amount", None)
+        rows.append(row)
+    return rows
+
+
+def _hash_passwords(passwords):
+    """
+    Runs in a worker process, where Django may have to be set up first when processes are spawned, not forked
+    """
+    from django.conf import settings
+
+    if not settings.configured:
+        import django
+
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "PROJECT.settings")
+        django.setup()
+    return [make_password(password or None) for password in passwords]
+
+
+def hash_passwords(passwords, processes=None):
+    """
+    Hash passwords across a process pool, password hashing is CPU bound and holds the GIL. Only meant for
+    processes of their own, e.g. a job worker or a management command, never a web worker
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(passwords) < POOL_THRESHOLD:
+        return _hash_passwords(passwords)
+
+    chunk_size = -(-len(passwords) // processes)
+    chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return [password for chunk in pool.map(_hash_passwords, chunks) for password in chunk]
+
+
+def validate_rows(rows):
+    """
+    Validate every row, checking uniqueness and related objects for all rows with one query each.
+    Returns (validated rows, errors by row index)
+    """
+    errors = {}
+    validated = []
+    for index, row in enumerate(rows):
+        serializer = StudentImportSerializer(data=row)
+        if serializer.is_valid():
+            validated.append((index, serializer.validated_data))
+        else:
+            errors[index] = serializer.errors
+
+    for _, data in validated:
+        data["email"] = User.objects.normalize_email(data["email"])
+
+    emails = {data["email"] for _, data in validated}
+    names = {(data["first_name"], data["last_name"], data["middle_name"]) for _, data in validated}
+    group_ids = {pk for _, data in validated for pk in data["student_groups"]}
+    parent_ids = {pk for _, data in validated for pk in data["student_parents"]}
+
+    taken_emails = set(User.objects.filter(email__in=emails).values_list("email", flat=True))
+    taken_names = set(User.objects.filter(
+        first_name__in={name[0] for name in names},
+        last_name__in={name[1] for name in names},
+        middle_name__in={name[2] for name in names},
+    ).values_list("first_name", "last_name", "middle_name"))
+    existing_groups = set(Group.objects.filter(pk__in=group_ids).values_list("pk", flat=True))
+    existing_parents = set(Parent.objects.filter(pk__in=parent_ids).values_list("pk", flat=True))
+
+    seen_emails, seen_names = set(), set()
+    for index, data in validated:
+        row_errors = {}
+        email = data["email"]
+        name = (data["first_name"], data["last_name"], data["middle_name"])
+
+        if email in taken_emails or email in seen_emails:
+            row_errors["email"] = ["User with this email already exists"]
+        if name in taken_names or name in seen_names:
+            row_errors["first_name"] = ["User with this first name, last name and middle name already exists"]
+        missing_groups = set(data["student_groups"]) - existing_groups
+        if missing_groups:
+            row_errors["student_groups"] = [f"Group {pk} does not exist" for pk in missing_groups]
+        missing_parents = set(data["student_parents"]) - existing_parents
+        if missing_parents:
+            row_errors["student_parents"] = [f"Parent {pk} does not exist" for pk in missing_parents]
+
+        seen_emails.add(email)
+        seen_names.add(name)
+        if row_errors:
+            errors[index] = row_errors
+
+    return [data for _, data in validated], errors
+
+
+def with_hashed_passwords(rows):
+    """
+    Copies of the rows with their passwords hashed, to queue an import without storing a plaintext password
+    """
+    return [{**row, "password": make_password(row.get("password") or None)} for row in rows]
+
+
+def import_students(rows, processes=None, batch_size=1000, hashed=False):
+    """
+    Create students with their group and parent links from row dicts using bulk inserts, `hashed` tells the
+    passwords were hashed already by with_hashed_passwords. Returns (students, errors by row index); nothing is
+    created when any row is invalid
+    """
+    rows, errors = validate_rows(rows)
+    if errors:
+        return [], errors
+
+    passwords = [data.get("password") for data in rows]
+    if not hashed:
+        passwords = hash_passwords(passwords, processes=processes)
+    students = [
+        Student(
+            email=data["email"],
+            first_name=data["first_name"],
+            last_name=data["last_name"],
+            middle_name=data["middle_name"],
+            phone_number=data["phone_number"],
+            is_preferential=data["is_preferential"],
+            preferential_amount=data["preferential_amount"],
+            password=password,
+            role=UserRoles.STUDENT,
+        )
+        for data, password in zip(rows, passwords)
+    ]
+
+    enrollments = [
+        User.student_groups.through(user_id=student.id, group_id=group_id)
+        for student, data in zip(students, rows) for group_id in data["student_groups"]
+    ]
+    parent_links = [
+        User.parent_students.through(user_id=parent_id, student_id=student.id)
+        for student, data in zip(students, rows) for parent_id in data["student_parents"]
+    ]
+
+    with transaction.atomic():
+        Student.objects.bulk_create(students, batch_size=batch_size)
+        User.student_groups.through.objects.bulk_create(enrollments, batch_size=batch_size)
+        User.parent_students.through.objects.bulk_create(parent_links, batch_size=batch_size)
+        # bulk_create sends no m2m_changed signals
+        refresh_students_count({enrollment.group_id for enrollment in enrollments})
+
+    return students, {}
+
+
+def run_import(rows):
+    """
+    Import queued by the import endpoint with its passwords hashed, run by a job worker. Returns what the
+    endpoint would have answered
+    """
+    students, errors = import_students(rows, hashed=True)
+    return {"errors": errors} if errors else {"created": len(students)}
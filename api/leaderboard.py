@@ -0,0 +1,146 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Window
+from django.db.models.functions import Coalesce, Rank
+
+from .cache import bump_version, get_versions
+from .models import Homework, LeaderboardEntry, Point
+
+ENTRY_FIELDS = ["student_id", "student__first_name", "student__last_name", "points", "homeworks", "rank"]
+
+
+def board_version(group_id):
+    return f"leaderboard:{group_id or 'school'}"
+
+
+def homework_groups(homework_ids):
+    """
+    {homework id: group id} of the given homework, in one query
+    """
+    return dict(Homework.objects.filter(pk__in=homework_ids).values_list("pk", "lesson__group_id"))
+
+
+def apply_deltas(deltas):
+    """
+    Add (points, homeworks) given as {(student id, group id): (points, homeworks)} to the group's and the
+    school-wide entries of each student, one UPDATE per entry and an INSERT for entries that do not exist yet
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for (student_id, group_id), (points, homeworks) in deltas.items():
+        for key in {(student_id, group_id), (student_id, None)}:
+            totals[key][0] += points
+            totals[key][1] += homeworks
+
+    for (student_id, group_id), (points, homeworks) in totals.items():
+        if not points and not homeworks:
+            continue
+        bump_version(board_version(group_id))
+        entries = LeaderboardEntry.objects.filter(student_id=student_id, group_id=group_id)
+        changes = {"points": F("points") + points, "homeworks": F("homeworks") + homeworks}
+        # Entries are only created for new points: taking points away from a missing entry means the student or
+        # the group is being deleted together with it
+        if entries.update(**changes) or homeworks <= 0:
+            continue
+        try:
+            with transaction.atomic():
+                LeaderboardEntry.objects.create(student_id=student_id, group_id=group_id, points=points,
+                                                homeworks=homeworks)
+        except IntegrityError:
+            # Created by a concurrent transaction in the meantime
+            entries.update(**changes)
+
+
+def move_points(added=None, removed=None):
+    """
+    Count a point given as (student id, homework id, amount) `added` and take one `removed`, e.g. both for the
+    old and new state of a changed point
+    """
+    changes = [(point, sign) for point, sign in ((added, 1), (removed, -1)) if point is not None]
+    groups = homework_groups({homework_id for (_, homework_id, _), _ in changes})
+    deltas = defaultdict(lambda: (0, 0))
+    for (student_id, homework_id, amount), sign in changes:
+        # The homework is already gone when its group is deleted together with the points
+        key = (student_id, groups.get(homework_id))
+        points, homeworks = deltas[key]
+        deltas[key] = (points + sign * amount, homeworks + sign)
+    apply_deltas(deltas)
+
+
+def rebuild_leaderboard(batch_size=1000):
+    """
+    Recompute every leaderboard entry from the points. Returns the number of entries written
+    """
+    rows = defaultdict(lambda: [0, 0])
+    points = (Point.objects.order_by().values("student_id", group_id=F("homework__lesson__group_id"))
+              .annotate(total=Sum("amount"), count=Count("pk")))
+    for row in points:
+        for key in ((row["student_id"], row["group_id"]), (row["student_id"], None)):
+            rows[key][0] += row["total"]
+            rows[key][1] += row["count"]
+
+    entries = [
+        LeaderboardEntry(student_id=student_id, group_id=group_id, points=total, homeworks=count)
+        for (student_id, group_id), (total, count) in rows.items()
+    ]
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(entries, batch_size=batch_size)
+    bump_version("leaderboard")
+    return len(entries)
+
+
+def ranked(group_id=None):
+    """
+    Entries of a group's leaderboard, or the school-wide one, ranked by points with a window function. Students
+    with as many points share a rank
+    """
+    return LeaderboardEntry.objects.filter(group_id=group_id).annotate(
+        rank=Window(Rank(), order_by=F("points").desc()),
+    ).order_by("-points", "student_id")
+
+
+def cached(key, group_id, compute):
+    """
+    `compute()` cached for LEADERBOARD_CACHE_TIMEOUT seconds until the leaderboard changes, in a shared cache only
+    """
+    timeout = settings.LEADERBOARD_CACHE_TIMEOUT
+    if not timeout or not settings.CACHE_SHARED:
+        return compute()
+    versions = ":".join(str(version) for version in get_versions("leaderboard", board_version(group_id)))
+    key = f"api:leaderboard:{group_id or 'school'}:{key}:{versions}"
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+def top_students(group_id=None, limit=10):
+    """
+    The `limit` best students of a group's leaderboard, or the school-wide one
+    """
+    return cached(f"top:{limit}", group_id, lambda: list(ranked(group_id).values(*ENTRY_FIELDS)[:limit]))
+
+
+def student_rank(student_id, group_id=None):
+    """
+    A student's entry and rank in a group's leaderboard, or the school-wide one, with the number of ranked
+    students. None when the student has no points there
+    """
+    def compute():
+        # A window over the whole leaderboard would be computed after filtering for the student, so the rank
+        # counts the better entries instead, both counts read from the (group, points) index
+        board = LeaderboardEntry.objects.filter(group_id=group_id).order_by()
+        better = board.filter(points__gt=OuterRef("points")).values("group_id").annotate(count=Count("pk"))
+        total = board.values("group_id").annotate(count=Count("pk"))
+        entry = board.filter(student_id=student_id).annotate(
+            rank=Coalesce(Subquery(better.values("count")), 0) + 1,
+            total=Subquery(total.values("count")),
+        ).values(*ENTRY_FIELDS, "total").first()
+        # None is not cached, an empty dict is
+        return entry or {}
+
+    return cached(f"rank:{student_id}", group_id, compute) or None
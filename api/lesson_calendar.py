@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Attendance, Group, Homework, Lesson
+from .schedule import WEEKDAYS
+
+
+def holidays():
+    """
+    (dates, (month, day) pairs repeating every year) read from LESSON_HOLIDAYS
+    """
+    dates, yearly = set(), set()
+    for value in settings.LESSON_HOLIDAYS:
+        try:
+            if value.count("-") == 1:
+                month, day = map(int, value.split("-"))
+                date(2000, month, day)
+                yearly.add((month, day))
+            else:
+                dates.add(date.fromisoformat(value))
+        except ValueError:
+            raise ImproperlyConfigured(f"LESSON_HOLIDAYS: {value!r} is neither YYYY-MM-DD nor MM-DD")
+    return dates, yearly
+
+
+def lesson_dates(lesson_days, first_day, last_day, excluded=None):
+    """
+    Dates between `first_day` and `last_day` inclusive a group with the given lesson days meets on, except the
+    `excluded` holidays
+    """
+    dates, yearly = excluded or (set(), set())
+    result = []
+    for weekday in WEEKDAYS.get(lesson_days, ()):
+        day = first_day + timedelta(days=(weekday - first_day.weekday()) % 7)
+        while day <= last_day:
+            if day not in dates and (day.month, day.day) not in yearly:
+                result.append(day)
+            day += timedelta(days=7)
+    return sorted(result)
+
+
+def generate_lessons(groups=None, since=None, batch_size=1000):
+    """
+    Create a lesson for every date the groups (ids or a queryset, every group by default) meet on from `since`
+    (today by default) to their end date, skipping holidays and dates that already have a lesson. Lessons from
+    `since` on that no longer fit the schedule are deleted unless they already have homework or attendance. Runs
+    a fixed number of queries however many groups there are and returns the number of lessons (created, deleted)
+    """
+    since = since or timezone.localdate()
+    excluded = holidays()
+    future = Lesson.objects.filter(date__gte=since).order_by()
+    queryset = Group.objects.all()
+    if groups is not None:
+        queryset = queryset.filter(pk__in=groups)
+        future = future.filter(group__in=queryset.values("pk"))
+
+    wanted = {}
+    # Groups whose term ended before `since` get no new lessons, but their lessons from `since` on are still stale
+    for group in queryset.filter(end_date__gte=since).values("id", "lesson_days", "start_date", "end_date", "room_id"):
+        for day in lesson_dates(group["lesson_days"], max(group["start_date"], since), group["end_date"], excluded):
+            wanted[group["id"], day] = group["room_id"]
+
+    used = Exists(Homework.objects.filter(lesson_id=OuterRef("pk"))) | \
+        Exists(Attendance.objects.filter(lesson_id=OuterRef("pk")))
+    existing, stale = set(), []
+    for lesson in future.annotate(used=used).values("id", "group_id", "date", "used"):
+        key = (lesson["group_id"], lesson["date"])
+        if key in wanted or lesson["used"]:
+            existing.add(key)
+        else:
+            stale.append(lesson["id"])
+
+    with transaction.atomic():
+        if stale:
+            Lesson.objects.filter(pk__in=stale).delete()
+        Lesson.objects.bulk_create(
+            [Lesson(group_id=group_id, date=day, room_id=room_id, theme="")
+             for (group_id, day), room_id in wanted.items() if (group_id, day) not in existing],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+    return len(wanted.keys() - existing), len(stale)
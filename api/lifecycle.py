@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import bump_version
+from .counters import refresh_students_count
+from .models import Group
+
+User = get_user_model()
+Enrollment = User.student_groups.through
+
+
+def running_on(day):
+    """
+    Groups that have started and not finished on `day`, both dates inclusive
+    """
+    return Q(start_date__lte=day, end_date__gte=day)
+
+
+def update_in_batches(queryset, batch_size, **changes):
+    """
+    Apply `changes` to the rows of `queryset` with one UPDATE per batch of `batch_size` rows. The queryset must
+    stop matching a row once it is updated. Returns the number of rows updated
+    """
+    updated = 0
+    while True:
+        count = Group.objects.filter(pk__in=queryset.order_by("pk").values("pk")[:batch_size]).update(**changes)
+        updated += count
+        if count < batch_size:
+            return updated
+
+
+def detach_finished_students(day, batch_size):
+    """
+    Remove enrollments in groups that finished before `day`, one DELETE per batch, and recount the students of
+    the groups they were removed from. Returns the number of enrollments removed
+    """
+    removed = 0
+    while True:
+        batch = list(Enrollment.objects.filter(group__end_date__lt=day).order_by("pk")
+                     .values_list("pk", "group_id")[:batch_size])
+        if not batch:
+            return removed
+        Enrollment.objects.filter(pk__in=[pk for pk, _ in batch]).delete()
+        refresh_students_count({group_id for _, group_id in batch})
+        removed += len(batch)
+
+
+def update_group_states(day=None, detach_students=False, batch_size=1000, dry_run=False):
+    """
+    Activate groups that have started, deactivate groups that have finished or not started yet and optionally
+    detach students from finished groups, as of `day` (today by default). Returns the number of groups activated
+    and deactivated and of enrollments detached, or would be with `dry_run`
+    """
+    day = day or timezone.localdate()
+    to_activate = Group.objects.filter(running_on(day), is_active=False)
+    to_deactivate = Group.objects.filter(~running_on(day), is_active=True)
+    finished_enrollments = Enrollment.objects.filter(group__end_date__lt=day)
+
+    if dry_run:
+        return {
+            "activated": to_activate.count(),
+            "deactivated": to_deactivate.count(),
+            "detached": finished_enrollments.count() if detach_students else 0,
+        }
+
+    changes = {
+        "activated": update_in_batches(to_activate, batch_size, is_active=True),
+        "deactivated": update_in_batches(to_deactivate, batch_size, is_active=False),
+        "detached": detach_finished_students(day, batch_size) if detach_students else 0,
+    }
+    if changes["activated"] or changes["deactivated"]:
+        bump_version("group")
+    return changes
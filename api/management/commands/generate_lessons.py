@@ -0,0 +1,20 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from api.lesson_calendar import generate_lessons
+
+
+class Command(BaseCommand):
+    help = "Create the lessons of every group's term from its lesson days, skipping LESSON_HOLIDAYS"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--group", action="append", dest="groups",
+                            help="Id of a group to generate lessons for, repeat for more, every group by default")
+        parser.add_argument("--since", type=date.fromisoformat, help="First date to generate, today by default")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Lessons inserted per statement")
+
+    def handle(self, *args, **options):
+        created, deleted = generate_lessons(options["groups"], since=options["since"],
+                                            batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Created {created} lessons and deleted {deleted}"))
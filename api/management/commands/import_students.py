@@ -0,0 +1,27 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importers import import_students, read_csv
+
+
+class Command(BaseCommand):
+    help = "Create students with their groups and parents from a CSV or JSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row, or a JSON list of students")
+        parser.add_argument("--processes", type=int, default=None, help="Password hashing processes")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per INSERT statement")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        with open(path, encoding="utf-8-sig") as file:
+            rows = json.load(file) if path.endswith(".json") else read_csv(file)
+
+        students, errors = import_students(rows, processes=options["processes"], batch_size=options["batch_size"])
+        if errors:
+            for index, row_errors in sorted(errors.items()):
+                self.stderr.write(f"Row {index + 1}: {json.dumps(row_errors, default=str, ensure_ascii=False)}")
+            raise CommandError(f"{len(errors)} invalid rows, nothing was imported")
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {len(students)} students"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.tokens import prune_tokens
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding and blacklisted JWT refresh tokens in batches, meant to run on a schedule"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Tokens deleted per transaction")
+
+    def handle(self, *args, **options):
+        deleted = prune_tokens(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired tokens"))
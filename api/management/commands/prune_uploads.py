@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.uploads import prune_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete idle chunked uploads and stored files no homework uses anymore, meant to run on a schedule"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows read per query")
+
+    def handle(self, *args, **options):
+        sessions, files = prune_uploads(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {sessions} uploads and {files} unused files"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.sms import queue_debt_reminders
+
+
+class Command(BaseCommand):
+    help = "Queue an SMS reminder to the parents of every student owing money for a month, the current one by default"
+
+    def add_arguments(self, parser):
+        today = timezone.localdate()
+        parser.add_argument("--year", type=int, default=today.year)
+        parser.add_argument("--month", type=int, choices=range(1, 13), default=today.month)
+        parser.add_argument("--batch-size", type=int, default=1000, help="Messages inserted per statement")
+
+    def handle(self, *args, **options):
+        queued = queue_debt_reminders(options["year"], options["month"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} reminders, run send_sms to send them"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recount Subject.groups_count and Group.students_count from scratch"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows updated per UPDATE statement")
+
+    def handle(self, *args, **options):
+        subjects, groups = rebuild_counters(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Recounted {subjects} subjects and {groups} groups"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.finance import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the monthly finance rollups from all payments and expenses"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rollups inserted per INSERT statement")
+
+    def handle(self, *args, **options):
+        rollups = rebuild_rollups(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rollups} finance rollups"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = "Recompute the group and school-wide points leaderboards from all points"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Entries inserted per INSERT statement")
+
+    def handle(self, *args, **options):
+        entries = rebuild_leaderboard(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {entries} leaderboard entries"))
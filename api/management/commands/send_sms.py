@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.sms import send_queued
+
+
+class Command(BaseCommand):
+    help = "Send queued SMS messages through Eskiz in batches, keeps running and polling the outbox by default"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Messages per request, SMS_BATCH_SIZE by default")
+        parser.add_argument("--interval", type=float, default=5, help="Seconds to wait when nothing is due")
+        parser.add_argument("--once", action="store_true", help="Send what is due and exit")
+
+    def handle(self, *args, **options):
+        while True:
+            counts = send_queued(batch_size=options["batch_size"])
+            if any(counts.values()) or options["once"]:
+                self.stdout.write(self.style.SUCCESS(
+                    "Sent {sent} messages, {retried} to retry and {failed} failed".format(**counts)
+                ))
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.lifecycle import update_group_states
+
+
+class Command(BaseCommand):
+    help = "Activate started groups and deactivate finished ones in batches, meant to run daily on a schedule"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows changed per statement")
+        parser.add_argument("--detach-students", action="store_true",
+                            help="Also remove students from groups that have finished")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+
+    def handle(self, *args, **options):
+        changes = update_group_states(detach_students=options["detach_students"],
+                                      batch_size=options["batch_size"], dry_run=options["dry_run"])
+        if options["dry_run"]:
+            message = "Would activate {activated} groups, deactivate {deactivated} groups and detach {detached} students"
+        else:
+            message = "Activated {activated} groups, deactivated {deactivated} groups and detached {detached} students"
+        self.stdout.write(self.style.SUCCESS(message.format(**changes)))
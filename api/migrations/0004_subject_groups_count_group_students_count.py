@@ -0,0 +1,46 @@
+# Generated by Django 5.1.6 on 2026-10-17 06:36
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Subject = apps.get_model("api", "Subject")
+    Group = apps.get_model("api", "Group")
+    User = apps.get_model("api", "User")
+    Enrollment = User.student_groups.through
+
+    groups = (Group.objects.filter(subject_id=OuterRef("pk")).order_by().values("subject_id")
+              .annotate(count=Count("pk")).values("count"))
+    Subject.objects.update(groups_count=Coalesce(Subquery(groups, output_field=IntegerField()), Value(0)))
+
+    students = (Enrollment.objects.filter(group_id=OuterRef("pk"), user__is_active=True, user__role="student")
+                .order_by().values("group_id").annotate(count=Count("pk")).values("count"))
+    Group.objects.update(students_count=Coalesce(Subquery(students, output_field=IntegerField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_alter_user_parent_students'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='students_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='groups_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='parent_students',
+            field=models.ManyToManyField(blank=True, related_name='parents', to='api.student'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
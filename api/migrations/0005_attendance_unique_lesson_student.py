@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-17 07:02
+
+from django.db import migrations, models
+
+
+def remove_duplicate_attendance(apps, schema_editor):
+    """
+    Keep only the latest attendance of a student for a lesson before making the pair unique, the highest id among
+    rows created at the same time
+    """
+    Attendance = apps.get_model("api", "Attendance")
+    duplicates = (Attendance.objects.values("lesson_id", "student_id").order_by()
+                  .annotate(count=models.Count("pk")).filter(count__gt=1))
+    for duplicate in duplicates:
+        rows = Attendance.objects.filter(lesson_id=duplicate["lesson_id"], student_id=duplicate["student_id"])
+        latest = rows.order_by("-created", "-pk").values_list("pk", flat=True)[0]
+        rows.exclude(pk=latest).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_subject_groups_count_group_students_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_attendance, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('lesson', 'student'), name='unique_attendance_lesson_student'),
+        ),
+    ]
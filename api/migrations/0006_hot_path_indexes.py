@@ -0,0 +1,38 @@
+# Generated by Django 5.1.6 on 2026-10-17 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_attendance_unique_lesson_student'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['assigned_to', 'created'], name='expense_assigned_to_created'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['group', '-created', '-id'], name='lesson_group_created'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['year', 'month'], name='payment_year_month'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['student', 'year', 'month'], name='payment_student_year_month'),
+        ),
+        migrations.AddIndex(
+            model_name='point',
+            index=models.Index(fields=['student', 'homework'], name='point_student_homework'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['role', '-created', '-id'], name='user_active_role_created'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.6 on 2026-10-17 06:59
+
+from collections import defaultdict
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def populate_rollups(apps, schema_editor):
+    Payment = apps.get_model("api", "Payment")
+    Expense = apps.get_model("api", "Expense")
+    FinanceRollup = apps.get_model("api", "FinanceRollup")
+
+    rows = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    for row in Payment.objects.order_by().values("year", "month", "group_id").annotate(total=Sum("amount")):
+        rows[row["year"], row["month"], row["group_id"]][0] += row["total"]
+    expenses = (Expense.objects.order_by()
+                .values(created_year=ExtractYear("created"), created_month=ExtractMonth("created"))
+                .annotate(total=Sum("amount")))
+    for row in expenses:
+        rows[row["created_year"], row["created_month"], None][1] += row["total"]
+
+    FinanceRollup.objects.bulk_create(
+        (FinanceRollup(year=year, month=month, group_id=group_id, income=income, expenses=outflow)
+         for (year, month, group_id), (income, outflow) in rows.items()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('income', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('expenses', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.group')),
+            ],
+            options={
+                'ordering': ['year', 'month'],
+                'indexes': [models.Index(fields=['year', 'month'], name='finance_rollup_year_month')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('group__isnull', False)), fields=('year', 'month', 'group'), name='unique_finance_rollup_group'), models.UniqueConstraint(condition=models.Q(('group__isnull', True)), fields=('year', 'month'), name='unique_finance_rollup_without_group')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-17 07:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_finance_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='room',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.room'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-17 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_group_room'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='lesson',
+            constraint=models.UniqueConstraint(condition=models.Q(('date__isnull', False)), fields=('group', 'date'), name='unique_lesson_group_date'),
+        ),
+    ]
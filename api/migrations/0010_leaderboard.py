@@ -0,0 +1,51 @@
+# Generated by Django 5.1.6 on 2026-10-17 07:10
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def populate_leaderboard(apps, schema_editor):
+    Point = apps.get_model("api", "Point")
+    LeaderboardEntry = apps.get_model("api", "LeaderboardEntry")
+
+    rows = defaultdict(lambda: [0, 0])
+    points = (Point.objects.order_by().values("student_id", group_id=F("homework__lesson__group_id"))
+              .annotate(total=Sum("amount"), count=Count("pk")))
+    for row in points:
+        for key in ((row["student_id"], row["group_id"]), (row["student_id"], None)):
+            rows[key][0] += row["total"]
+            rows[key][1] += row["count"]
+
+    LeaderboardEntry.objects.bulk_create(
+        (LeaderboardEntry(student_id=student_id, group_id=group_id, points=total, homeworks=count)
+         for (student_id, group_id), (total, count) in rows.items()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_lesson_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.IntegerField(default=0)),
+                ('homeworks', models.IntegerField(default=0)),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.group')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['group', '-points', 'student'], name='leaderboard_group_points')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('group__isnull', False)), fields=('student', 'group'), name='unique_leaderboard_group'), models.UniqueConstraint(condition=models.Q(('group__isnull', True)), fields=('student',), name='unique_leaderboard_school')],
+            },
+        ),
+        migrations.RunPython(populate_leaderboard, migrations.RunPython.noop),
+    ]
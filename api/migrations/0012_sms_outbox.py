@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-17 07:18
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_chunked_uploads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SmsMessage',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('debt_reminder', 'Debt Reminder'), ('absence_alert', 'Absence Alert')], max_length=20)),
+                ('key', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('phone_number', models.CharField(max_length=20)),
+                ('text', models.TextField()),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('delivered', 'Delivered'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('send_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created'],
+                'indexes': [models.Index(condition=models.Q(('status__in', ['queued', 'sending'])), fields=['send_after'], name='sms_message_due')],
+            },
+        ),
+    ]
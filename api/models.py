@@ -11,7 +11,7 @@ from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from phonenumber_field.modelfields import PhoneNumberField
 
 from .validators import group_price_validator
-from .utils import UserRoles
+from .utils import UserRoles, SmsKinds, SmsStatuses
 from .managers import (
     UserManager,
     SuperuserManager,
@@ -58,6 +58,9 @@ class Expense(models.Model):
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["assigned_to", "created"], name="expense_assigned_to_created"),
+        ]
 
     def __str__(self):
         return f"{self.assigned_to if self.assigned_to else self.assigned_to_name} - {self.amount} - {self.created}"
@@ -72,6 +75,7 @@ class Subject(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     name = models.CharField(max_length=255, unique=True)
+    groups_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["name", "-created"]
@@ -112,6 +116,11 @@ class User(AbstractBaseUser, PermissionsMixin):
         unique_together = [
             ["first_name", "last_name", "middle_name"]
         ]
+        indexes = [
+            # Every proxy manager filters by role and the viewsets list active users only, newest first
+            models.Index(fields=["role", "-created", "-id"], condition=models.Q(is_active=True),
+                         name="user_active_role_created"),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} {self.middle_name}"
@@ -133,21 +142,21 @@ class User(AbstractBaseUser, PermissionsMixin):
     @property
     def is_fully_paid(self) -> tuple[bool, Decimal]:
         """
-        Returns (bool, decimal) indicating whether the student is fully paid
+        Returns (bool, decimal) indicating whether the student is fully paid for the current month in all of
+        their groups, and how much they paid. Use api.reports.monthly_payment_report to check many students
         """
         if self.role != UserRoles.STUDENT:
             raise AttributeError(f"{self.__class__.__name__} object has no attribute 'is_fully_paid'")
 
-        current_year, current_month = date.today().year, date.today().month
+        from .reports import monthly_payment_report
 
-        payment = self.payment_set.filter(year=current_year, month=current_month).first()
+        today = timezone.localdate()
+        rows = list(monthly_payment_report(today.year, today.month).filter(user_id=self.pk))
 
-        if not payment:
+        if not rows:
             return False, Decimal(0)
 
-        group_price = payment.student.preferential_amount if self.is_preferential else payment.group.price
-
-        return payment.amount >= group_price, Decimal(payment.amount)
+        return all(row["debt"] == 0 for row in rows), sum(row["paid"] for row in rows)
 
 
 class Lesson(models.Model):
@@ -161,9 +170,18 @@ class Lesson(models.Model):
     group = models.ForeignKey(to="Group", on_delete=models.CASCADE)
     theme = models.CharField(max_length=255)
     room = models.ForeignKey("Room", on_delete=models.SET_NULL, null=True)
+    date = models.DateField(null=True, blank=True)
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["group", "-created", "-id"], name="lesson_group_created"),
+        ]
+        constraints = [
+            # A group meets once a day, generated calendars rely on it to skip lessons that already exist
+            models.UniqueConstraint(fields=["group", "date"], condition=models.Q(date__isnull=False),
+                                    name="unique_lesson_group_date"),
+        ]
 
     def __str__(self):
         return f"{self.group.name} - {self.theme} - {self.created}"
@@ -174,14 +192,18 @@ class Homework(models.Model):
     Represents homework for each lesson
     """
 
-    def get_upload_path(self):
-        return f"lessons/{self.lesson.group.name}"
+    def get_upload_path(instance, filename):
+        return f"lessons/{instance.lesson.group.name}/{filename}"
 
     id = models.UUIDField(default=uuid4, primary_key=True, unique=True, editable=False)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     lesson = models.ForeignKey(to=Lesson, on_delete=models.CASCADE)
     file = models.FileField(upload_to=get_upload_path, null=True, blank=True)
+    # Files uploaded in chunks are stored once by content, `file_name` is the name this homework shows
+    stored_file = models.ForeignKey(to="StoredFile", on_delete=models.PROTECT, null=True, blank=True,
+                                    related_name="homework")
+    file_name = models.CharField(max_length=255, blank=True)
     description = models.TextField()
     deadline = models.DateTimeField()
 
@@ -202,6 +224,7 @@ class Group(models.Model):
     updated = models.DateTimeField(auto_now=True)
     subject = models.ForeignKey(to=Subject, on_delete=models.PROTECT)
     teacher = models.ForeignKey(to="Teacher", on_delete=models.PROTECT)
+    room = models.ForeignKey(to=Room, on_delete=models.SET_NULL, null=True, blank=True)
     name = models.CharField(max_length=255, unique=True)
     price = models.DecimalField(max_digits=12, decimal_places=2, validators=[group_price_validator])
     lesson_days = models.CharField(max_length=255, choices=LessonDays.choices)
@@ -210,6 +233,7 @@ class Group(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     is_active = models.BooleanField(default=False)
+    students_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
@@ -310,6 +334,10 @@ class Attendance(models.Model):
 
     class Meta:
         ordering = ["-created"]
+        constraints = [
+            # Lesson first, so the constraint's index also serves "roster of a lesson" lookups
+            models.UniqueConstraint(fields=["lesson", "student"], name="unique_attendance_lesson_student"),
+        ]
 
     def __str__(self):
         return f"{self.student.full_name} - {self.lesson.created} - {not self.is_absent}"
@@ -341,6 +369,10 @@ class Payment(models.Model):
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["year", "month"], name="payment_year_month"),
+            models.Index(fields=["student", "year", "month"], name="payment_student_year_month"),
+        ]
 
 
 class Point(models.Model):
@@ -355,5 +387,139 @@ class Point(models.Model):
     homework = models.ForeignKey(to=Homework, on_delete=models.CASCADE)
     amount = models.IntegerField(validators=[MinValueValidator(0), MaxValueValidator(100)])
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["student", "homework"], name="point_student_homework"),
+        ]
+
     def __str__(self):
         return f"{self.amount} - {self.student.full_name} - {self.homework.lesson.theme}"
+
+
+class FinanceRollup(models.Model):
+    """
+    Income and expenses of a month per group, kept up to date by signals on Payment and Expense. Expenses have no
+    group, they are summed in the month's row without one
+    """
+
+    year = models.IntegerField()
+    month = models.IntegerField()
+    group = models.ForeignKey(to=Group, on_delete=models.CASCADE, null=True, blank=True)
+    income = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    expenses = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["year", "month"]
+        constraints = [
+            models.UniqueConstraint(fields=["year", "month", "group"], condition=models.Q(group__isnull=False),
+                                    name="unique_finance_rollup_group"),
+            models.UniqueConstraint(fields=["year", "month"], condition=models.Q(group__isnull=True),
+                                    name="unique_finance_rollup_without_group"),
+        ]
+        indexes = [
+            models.Index(fields=["year", "month"], name="finance_rollup_year_month"),
+        ]
+
+    def __str__(self):
+        return f"{self.month}/{self.year} - {self.group_id} - {self.income - self.expenses}"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    Points a student has collected in a group, kept up to date by signals on Point. The entry without a group
+    holds the student's points in all groups for the school-wide leaderboard
+    """
+
+    student = models.ForeignKey(to=Student, on_delete=models.CASCADE)
+    group = models.ForeignKey(to=Group, on_delete=models.CASCADE, null=True, blank=True)
+    points = models.IntegerField(default=0)
+    homeworks = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["student", "group"], condition=models.Q(group__isnull=False),
+                                    name="unique_leaderboard_group"),
+            models.UniqueConstraint(fields=["student"], condition=models.Q(group__isnull=True),
+                                    name="unique_leaderboard_school"),
+        ]
+        indexes = [
+            # Every leaderboard is read best first
+            models.Index(fields=["group", "-points", "student"], name="leaderboard_group_points"),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.group_id} - {self.points}"
+
+
+class StoredFile(models.Model):
+    """
+    A file stored once under the hash of its content, however many homework use it. `references` counts the
+    homework using it, files without references are pruned
+    """
+
+    id = models.UUIDField(default=uuid4, primary_key=True, unique=True, editable=False)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    content_hash = models.CharField(max_length=64, unique=True)
+    file = models.FileField(max_length=255)
+    size = models.BigIntegerField()
+    content_type = models.CharField(max_length=255, blank=True)
+    references = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.content_hash
+
+
+class UploadSession(models.Model):
+    """
+    A file being uploaded in chunks. Chunks are appended to a part file in order and hashed as they arrive, so an
+    interrupted upload resumes from `received`
+    """
+
+    id = models.UUIDField(default=uuid4, primary_key=True, unique=True, editable=False)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    created_by = models.ForeignKey(to=User, on_delete=models.SET_NULL, null=True, blank=True)
+    file_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=255, blank=True)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    # SHA-256 hex digests of the received chunks, one after another
+    chunk_hashes = models.TextField(blank=True, default="")
+    stored_file = models.ForeignKey(to=StoredFile, on_delete=models.SET_NULL, null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.file_name} - {self.received}/{self.size}"
+
+
+class SmsMessage(models.Model):
+    """
+    An SMS waiting in the outbox or sent. Messages are queued in the transaction that causes them and sent in
+    batches by the send_sms worker. `key` keeps the same reminder or alert from being queued twice
+    """
+
+    id = models.UUIDField(default=uuid4, primary_key=True, unique=True, editable=False)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    kind = models.CharField(max_length=20, choices=SmsKinds.choices)
+    key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    phone_number = models.CharField(max_length=20)
+    text = models.TextField()
+    status = models.CharField(max_length=10, choices=SmsStatuses.choices, default=SmsStatuses.QUEUED)
+    # Not sent before then: the next retry of a queued message, the end of a sending message's claim
+    send_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    sent_at = models.DateTimeField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created"]
+        indexes = [
+            # The worker only looks at messages still waiting to be sent, oldest due first
+            models.Index(fields=["send_after"], condition=models.Q(status__in=["queued", "sending"]),
+                         name="sms_message_due"),
+        ]
+
+    def __str__(self):
+        return f"{self.phone_number} - {self.kind} - {self.status}"
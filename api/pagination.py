@@ -0,0 +1,176 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset, threshold):
+    """
+    Count rows of a queryset, trusting the PostgreSQL planner estimate instead of running COUNT(*) once it
+    reaches `threshold` rows. Returns (count, is_estimate)
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        sql, params = queryset.order_by().query.get_compiler(using=queryset.db).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]["Plan"]["Plan Rows"])
+        if estimate >= threshold:
+            return estimate, True
+    return queryset.count(), False
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination: each page continues from the ordering key of the previous page's edge row,
+    so late pages cost the same as the first one. Ordering comes from `view.keyset_ordering` and must end
+    with a unique field, e.g. ("-created", "-id")
+    """
+
+    ordering = ("-created", "-id")
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    # Below this many (estimated) rows an exact COUNT(*) is cheap enough
+    estimate_threshold = 10000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = self.get_page_queryset(queryset, request, view)
+        self.count, self.count_is_estimate = estimate_count(queryset, self.estimate_threshold)
+        return self.get_page(list(page))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset for async views, rows are fetched with the async ORM
+        """
+        page = self.get_page_queryset(queryset, request, view)
+        self.count, self.count_is_estimate = await sync_to_async(estimate_count)(queryset, self.estimate_threshold)
+        return self.get_page([row async for row in page.aiterator(chunk_size=self.current_page_size + 1)])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        Queryset of the requested page plus one row, which tells whether there is a next page
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(getattr(view, "keyset_ordering", self.ordering))
+        self.model = queryset.model
+        self.current_page_size = self.get_page_size(request)
+
+        self.cursor = self.decode_cursor(request)
+        self.reverse = bool(self.cursor and self.cursor["reverse"])
+        ordering = self.reverse_ordering(self.ordering) if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor:
+            queryset = queryset.filter(self.after(ordering, self.cursor["key"]))
+        return queryset[:self.current_page_size + 1]
+
+    def get_page(self, rows):
+        cursor, reverse = self.cursor, self.reverse
+        has_more = len(rows) > self.current_page_size
+        rows = rows[:self.current_page_size]
+        if reverse:
+            rows.reverse()
+
+        first, last = (rows[0], rows[-1]) if rows else (None, None)
+        if reverse:
+            self.next_key = self.get_key(last) if last else cursor["key"]
+            self.previous_key = self.get_key(first) if has_more else None
+        else:
+            self.next_key = self.get_key(last) if has_more else None
+            self.previous_key = (self.get_key(first) if first else cursor["key"]) if cursor else None
+
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            "count": self.count,
+            "count_is_estimate": self.count_is_estimate,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["count", "results"],
+            "properties": {
+                "count": {"type": "integer"},
+                "count_is_estimate": {"type": "boolean"},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(page_size, self.max_page_size) if page_size > 0 else self.page_size
+
+    def get_next_link(self):
+        return self.encode_cursor(self.next_key, reverse=False) if self.next_key else None
+
+    def get_previous_link(self):
+        return self.encode_cursor(self.previous_key, reverse=True) if self.previous_key else None
+
+    @staticmethod
+    def reverse_ordering(ordering):
+        return tuple(name[1:] if name.startswith("-") else f"-{name}" for name in ordering)
+
+    @staticmethod
+    def after(ordering, key):
+        """
+        Filter for rows strictly after `key` in `ordering`: (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        equal = {}
+        for name, value in zip(ordering, key):
+            field = name.lstrip("-")
+            lookup = "lt" if name.startswith("-") else "gt"
+            condition |= Q(**equal, **{f"{field}__{lookup}": value})
+            equal[field] = value
+        return condition
+
+    def get_key(self, instance):
+        return [self.model._meta.get_field(name.lstrip("-")).value_to_string(instance) for name in self.ordering]
+
+    def encode_cursor(self, key, reverse):
+        cursor = urlsafe_b64encode(json.dumps({"k": key, "r": int(reverse)}).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()))
+            raw_key, reverse = cursor["k"], bool(cursor["r"])
+            if len(raw_key) != len(self.ordering):
+                raise ValueError
+            key = [
+                self.model._meta.get_field(name.lstrip("-")).to_python(value)
+                for name, value in zip(self.ordering, raw_key)
+            ]
+        except (BinasciiError, UnicodeDecodeError, ValueError, KeyError, TypeError, FieldDoesNotExist,
+                ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return {"key": key, "reverse": reverse}
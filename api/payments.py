@@ -0,0 +1,51 @@
+from django.db import transaction
+
+from .finance import add_payments
+from .models import Payment, Student, Group
+
+
+def fill_payment_names(payments):
+    """
+    Set student_name/group_name snapshots on unsaved payments with one query per related model,
+    the bulk counterpart of the pre_save signal that bulk_create skips
+    """
+    student_ids = {payment.student_id for payment in payments if payment.student_id}
+    group_ids = {payment.group_id for payment in payments if payment.group_id}
+    students = Student.objects.only("first_name", "last_name", "middle_name").in_bulk(student_ids)
+    groups = Group.objects.only("name").in_bulk(group_ids)
+
+    for payment in payments:
+        if payment.student_id in students:
+            payment.student_name = students[payment.student_id].full_name
+        if payment.group_id in groups:
+            payment.group_name = groups[payment.group_id].name
+    return students, groups
+
+
+def bulk_create_payments(rows, batch_size=1000):
+    """
+    Validate and insert payments given as dicts with student/group ids using a constant number of queries.
+    Returns (payments, errors) where errors maps a row index to its error messages; nothing is inserted when
+    any row is invalid
+    """
+    payments = [Payment(**row) for row in rows]
+    students, groups = fill_payment_names(payments)
+
+    errors = {}
+    for index, payment in enumerate(payments):
+        row_errors = {}
+        if payment.student_id not in students:
+            row_errors["student"] = [f"Student {payment.student_id} does not exist"]
+        if payment.group_id not in groups:
+            row_errors["group"] = [f"Group {payment.group_id} does not exist"]
+        if row_errors:
+            errors[index] = row_errors
+
+    if errors:
+        return [], errors
+
+    with transaction.atomic():
+        payments = Payment.objects.bulk_create(payments, batch_size=batch_size)
+        # bulk_create sends no post_save signals
+        add_payments(payments, batch_size=batch_size)
+    return payments, {}
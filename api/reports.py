@@ -0,0 +1,85 @@
+import calendar
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Concat, Greatest
+
+from .models import Payment
+from .utils import UserRoles
+
+User = get_user_model()
+Enrollment = User.student_groups.through
+
+MONEY = DecimalField(max_digits=18, decimal_places=2)
+
+
+def month_bounds(year, month):
+    """
+    First and last day of a month
+    """
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def expected_amount():
+    """
+    Monthly amount due for the outer enrollment: the student's preferential amount or the group price
+    """
+    return Case(
+        When(user__is_preferential=True, then=F("user__preferential_amount")),
+        default=F("group__price"),
+        output_field=MONEY,
+    )
+
+
+def paid_amount(year, month):
+    """
+    Sum of the outer enrollment's payments for the given month
+    """
+    payments = (
+        Payment.objects
+        .filter(student_id=OuterRef("user_id"), group_id=OuterRef("group_id"), year=year, month=month)
+        .order_by()
+        .values("student_id")
+        .annotate(total=Sum("amount"))
+        .values("total")
+    )
+    return Coalesce(Subquery(payments, output_field=MONEY), Value(Decimal(0)), output_field=MONEY)
+
+
+def monthly_payment_report(year, month, group=None, teacher=None, debtors=False):
+    """
+    Paid amount, expected amount and debt of every active student in every group running in the given month,
+    computed in a single query. Returns a queryset of dicts, one per (student, group)
+    """
+    first_day, last_day = month_bounds(year, month)
+
+    enrollments = Enrollment.objects.filter(
+        user__is_active=True,
+        user__role=UserRoles.STUDENT,
+        group__start_date__lte=last_day,
+        group__end_date__gte=first_day,
+    )
+    if group:
+        enrollments = enrollments.filter(group_id=group)
+    if teacher:
+        enrollments = enrollments.filter(group__teacher_id=teacher)
+
+    enrollments = enrollments.annotate(
+        expected=expected_amount(),
+        paid=paid_amount(year, month),
+    ).annotate(
+        debt=Greatest(F("expected") - F("paid"), Value(Decimal(0)), output_field=MONEY),
+    )
+    if debtors:
+        enrollments = enrollments.filter(debt__gt=0)
+
+    return enrollments.annotate(
+        student_id=F("user_id"),
+        student_name=Concat("user__first_name", Value(" "), "user__last_name", Value(" "), "user__middle_name"),
+        group_name=F("group__name"),
+        teacher_id=F("group__teacher_id"),
+    ).order_by("group__name", "user__first_name", "user__last_name").values(
+        "student_id", "student_name", "group_id", "group_name", "teacher_id", "expected", "paid", "debt",
+    )
@@ -0,0 +1,176 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import get_versions
+from .models import Group, Room
+from .utils import LessonDays
+
+# Weekdays (Monday is 0) each lesson days choice meets on
+WEEKDAYS = {
+    LessonDays.ODD: (0, 2, 4),
+    LessonDays.EVEN: (1, 3, 5),
+}
+
+# A group's lesson on one weekday, times in seconds since midnight
+Slot = namedtuple("Slot", ["start", "end", "group_id", "start_date", "end_date"])
+
+
+def seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+class Timeline:
+    """
+    Slots of one weekday sorted by start. The longest slot bounds how far back an overlapping slot can start, so
+    a lookup only bisects and walks the slots that can overlap
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.slots = []
+        self.longest = 0
+
+    def add(self, slot):
+        index = bisect_left(self.starts, slot.start)
+        self.starts.insert(index, slot.start)
+        self.slots.insert(index, slot)
+        self.longest = max(self.longest, slot.end - slot.start)
+
+    def overlapping(self, start, end, first_day, last_day):
+        """
+        Slots overlapping [start, end) of groups running at some point between the two dates
+        """
+        low = bisect_left(self.starts, start - self.longest)
+        high = bisect_left(self.starts, end)
+        for slot in self.slots[low:high]:
+            if slot.end > start and slot.start_date <= last_day and slot.end_date >= first_day:
+                yield slot
+
+
+class ScheduleIndex:
+    """
+    Per weekday timelines of every room, every teacher and the whole school, built from groups that have not
+    ended yet
+    """
+
+    def __init__(self, groups, rooms):
+        self.groups = {}
+        self.rooms = {room["id"]: room for room in rooms}
+        self.by_room = defaultdict(Timeline)
+        self.by_teacher = defaultdict(Timeline)
+        self.by_day = defaultdict(Timeline)
+        for group in groups:
+            self.add(group)
+
+    def add(self, group):
+        self.groups[group["id"]] = group
+        for weekday in WEEKDAYS.get(group["lesson_days"], ()):
+            slot = Slot(seconds(group["start_time"]), seconds(group["end_time"]), group["id"],
+                        group["start_date"], group["end_date"])
+            self.by_day[weekday].add(slot)
+            if group["room_id"]:
+                self.by_room[weekday, group["room_id"]].add(slot)
+            self.by_teacher[weekday, group["teacher_id"]].add(slot)
+
+    def conflicts(self, lesson_days, start_time, end_time, start_date, end_date, room_id=None, teacher_id=None,
+                  exclude=None):
+        """
+        {"room": [group, ...], "teacher": [group, ...]} of groups sharing the room or the teacher at an overlapping
+        time on a common weekday while both groups run
+        """
+        start, end = seconds(start_time), seconds(end_time)
+        found = {"room": {}, "teacher": {}}
+        for weekday in WEEKDAYS.get(lesson_days, ()):
+            timelines = (("room", self.by_room.get((weekday, room_id))),
+                         ("teacher", self.by_teacher.get((weekday, teacher_id))))
+            for kind, timeline in timelines:
+                if timeline is None:
+                    continue
+                for slot in timeline.overlapping(start, end, start_date, end_date):
+                    if slot.group_id != exclude:
+                        found[kind][slot.group_id] = self.groups[slot.group_id]
+        return {kind: list(groups.values()) for kind, groups in found.items() if groups}
+
+    def running(self, at):
+        """
+        Groups having a lesson at the local datetime `at`, ordered by start time
+        """
+        day, moment = at.date(), seconds(at)
+        timeline = self.by_day.get(at.weekday())
+        if timeline is None:
+            return []
+        return [self.groups[slot.group_id] for slot in timeline.overlapping(moment, moment + 1, day, day)]
+
+    def free_rooms(self, at):
+        """
+        Rooms no group has a lesson in at the local datetime `at`, ordered by number
+        """
+        busy = {group["room_id"] for group in self.running(at)}
+        return [room for room_id, room in self.rooms.items() if room_id not in busy]
+
+
+def find_conflicts(lesson_days, start_time, end_time, start_date, end_date, room_id=None, teacher_id=None,
+                   exclude=None):
+    """
+    Same as ScheduleIndex.conflicts, asked from the database: a query per room and teacher, always current
+    """
+    weekdays = set(WEEKDAYS.get(lesson_days, ()))
+    overlapping = Group.objects.filter(
+        lesson_days__in=[days for days, other in WEEKDAYS.items() if weekdays & set(other)],
+        start_time__lt=end_time, end_time__gt=start_time,
+        start_date__lte=end_date, end_date__gte=max(start_date, timezone.localdate()),
+    ).order_by("start_time")
+    if exclude is not None:
+        overlapping = overlapping.exclude(pk=exclude)
+    found = {}
+    for kind, related_id in (("room", room_id), ("teacher", teacher_id)):
+        if related_id is not None:
+            groups = list(overlapping.filter(**{f"{kind}_id": related_id}).values("id", "name", "start_time",
+                                                                                  "end_time"))
+            if groups:
+                found[kind] = groups
+    return found
+
+
+_lock = threading.Lock()
+_index = {"versions": None, "schedule": None}
+
+
+def build_schedule():
+    """
+    Load the schedule index with two queries
+    """
+    groups = Group.objects.filter(end_date__gte=timezone.localdate()).order_by("start_time").values(
+        "id", "name", "lesson_days", "start_time", "end_time", "start_date", "end_date", "room_id", "room__number",
+        "teacher_id", "teacher__first_name", "teacher__last_name",
+    )
+    rooms = Room.objects.order_by("number").values("id", "number", "floor", "alias_name")
+    return ScheduleIndex(groups, rooms)
+
+
+def get_schedule():
+    """
+    The process-wide schedule index, rebuilt when a group, room or teacher changes anywhere. Checking whether it
+    is current costs a single cache read. Without a shared cache (CACHE_SHARED) changes made by other processes
+    are not seen, the index is built for every call instead
+    """
+    if not settings.CACHE_SHARED:
+        return build_schedule()
+    versions = get_versions("group", "room", "teacher")
+    schedule = _index["schedule"]
+    if schedule is not None and _index["versions"] == versions:
+        return schedule
+
+    with _lock:
+        if _index["schedule"] is None or _index["versions"] != versions:
+            _index["schedule"], _index["versions"] = build_schedule(), versions
+        return _index["schedule"]
+
+
+def clear_schedule():
+    with _lock:
+        _index["schedule"] = _index["versions"] = None
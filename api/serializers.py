@@ -1,11 +1,28 @@
+from collections import namedtuple
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import QuerySet
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch, QuerySet
 from django.utils import timezone
-
-from rest_framework.serializers import ModelSerializer, PrimaryKeyRelatedField, HyperlinkedIdentityField
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-
-from .models import Student, Group, Subject, Parent, Room, Teacher, Admin, Superuser
+from django.utils.functional import cached_property
+
+from rest_framework.serializers import ModelSerializer, PrimaryKeyRelatedField, HyperlinkedIdentityField, Serializer, \
+    IntegerField, UUIDField, BooleanField, DecimalField, CharField, EmailField, ListField, DateField, ChoiceField, \
+    DateTimeField, SerializerMethodField, ValidationError
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from phonenumber_field.serializerfields import PhoneNumberField
+
+from .authentication import user_cache
+from .models import Student, Group, Subject, Parent, Room, Teacher, Admin, Superuser, Payment, Lesson, Homework, \
+    StoredFile, UploadSession
+from .schedule import find_conflicts, get_schedule
+from .tokens import CachedRefreshToken, refreshed_key
 
 User = get_user_model()
 
@@ -26,11 +43,211 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         token["last_name"] = user.last_name
         token["middle_name"] = user.middle_name
         token["role"] = user.get_role_name
+        token["role_code"] = user.role
         token["is_superuser"] = user.is_superuser
         token["is_staff"] = user.is_staff
         return token
 
 
+class CachedTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh serializer that checks the blacklist through caches and the user through the user cache in cached
+    JWT_AUTH_MODE, and answers a token refreshed again within TOKEN_REFRESH_GRACE seconds, e.g. by another browser
+    tab, with the tokens the first refresh issued
+    """
+
+    token_class = CachedRefreshToken
+
+    def get_user(self, user_id):
+        if settings.JWT_AUTH_MODE != "cached":
+            return User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        user = user_cache.get(str(user_id))
+        if user is None:
+            user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+            if user is not None:
+                user_cache.set(str(user_id), user)
+        return user
+
+    def validate(self, attrs):
+        grace_key = refreshed_key(attrs["refresh"])
+        data = cache.get(grace_key)
+        if data is not None:
+            return data
+
+        try:
+            refresh = self.token_class(attrs["refresh"])
+        except TokenError:
+            # A concurrent refresh may have blacklisted the token right before remembering its response
+            data = cache.get(grace_key)
+            if data is not None:
+                return data
+            raise
+
+        user = self.get_user(refresh.payload.get(api_settings.USER_ID_CLAIM))
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except TokenError:
+                    data = cache.get(grace_key)
+                    if data is not None:
+                        return data
+                    raise
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+
+        if settings.TOKEN_REFRESH_GRACE > 0 and not cache.add(grace_key, data, settings.TOKEN_REFRESH_GRACE):
+            # Another request refreshed the same token first, both callers get the same tokens
+            data = cache.get(grace_key, data)
+        return data
+
+
+# A relation a serializer renders as ids unless expanded: the name of the serializer rendering the related objects,
+# the attribute holding them (the field name by default), whether there are many and a callable returning the
+# queryset they are read from (the related model's default manager by default)
+Expandable = namedtuple("Expandable", ["serializer", "source", "many", "queryset"], defaults=[None, False, None])
+
+
+def split_paths(paths):
+    """
+    {name: [paths below it]} of dotted paths, e.g. ["student_groups.subject", "student_parents"] gives
+    {"student_groups": ["subject"], "student_parents": []}
+    """
+    tree = {}
+    for path in paths:
+        name, _, rest = path.partition(".")
+        tree.setdefault(name, [])
+        if rest:
+            tree[name].append(rest)
+    return tree
+
+
+def query_paths(request, name):
+    """
+    Dotted paths of a comma separated query parameter of the request, e.g. ?expand=student_groups.subject,parents
+    """
+    params = getattr(request, "query_params", None) or {}
+    return [path.strip() for path in params.get(name, "").split(",") if path.strip()]
+
+
+class ExpandableFieldsMixin:
+    """
+    Sparse fieldsets and opt-in expansion of relations. ?fields=id,first_name renders only those fields and
+    ?expand=student_groups renders the relations of `expandable_fields` as objects instead of ids. Dotted paths
+    reach into expanded relations, e.g. ?expand=student_groups.subject&fields=id,student_groups.name. A nested
+    serializer gets its paths through the `fields` and `expand` arguments instead of the request
+    """
+
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requested_fields = fields
+        self.requested_expand = expand
+
+    @cached_property
+    def requested(self):
+        """
+        (names of the fields to render, None for all of them, {expanded relation: (fields, expand) below it})
+        """
+        fields, expand = self.requested_fields, self.requested_expand
+        if fields is None and expand is None:
+            request = self.context.get("request")
+            fields, expand = query_paths(request, "fields"), query_paths(request, "expand")
+        fields, expand = split_paths(fields or []), split_paths(expand or [])
+        return (set(fields) or None), {
+            name: (fields.get(name, []), paths) for name, paths in expand.items() if name in self.expandable_fields
+        }
+
+    @property
+    def _readable_fields(self):
+        only, _ = self.requested
+        for field in super()._readable_fields:
+            if field.field_name not in self.expandable_fields and (only is None or field.field_name in only):
+                yield field
+
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        only, expand = self.requested
+        for name, relation in self.expandable_fields.items():
+            if only is None or name in only:
+                representation[name] = self.represent_relation(instance, name, relation, expand.get(name))
+        return representation
+
+    def represent_relation(self, instance, name, relation, paths):
+        source = relation.source or name
+        if paths is None:
+            if relation.many:
+                return [related.pk for related in getattr(instance, source).all()]
+            return getattr(instance, f"{source}_id")
+
+        related = getattr(instance, source)
+        if relation.many:
+            related = related.all()
+        elif related is None:
+            return None
+        fields, expand = paths
+        return globals()[relation.serializer](related, many=relation.many, context=self.context, fields=fields,
+                                              expand=expand).data
+
+    @classmethod
+    def related_lookups(cls, model, fields, expand, prefix=""):
+        """
+        (select_related, prefetch_related) lookups that read every relation rendered for `fields` and `expand`
+        up front, ids only for the relations not expanded
+        """
+        fields, expand = split_paths(fields), split_paths(expand)
+        select, prefetch = [], []
+        for name, relation in cls.expandable_fields.items():
+            if fields and name not in fields:
+                continue
+            source = relation.source or name
+            related_model = model._meta.get_field(source).related_model
+            nested = globals()[relation.serializer]
+            if not relation.many:
+                if name in expand:
+                    select.append(f"{prefix}{source}")
+                    nested_select, nested_prefetch = nested.related_lookups(
+                        related_model, fields.get(name, []), expand[name], prefix=f"{prefix}{source}__",
+                    )
+                    select += nested_select
+                    prefetch += nested_prefetch
+                continue
+
+            queryset = relation.queryset() if relation.queryset else related_model._default_manager.all()
+            if name in expand:
+                queryset = nested.load_related(queryset, fields.get(name, []), expand[name])
+            else:
+                queryset = queryset.only("pk")
+            prefetch.append(Prefetch(f"{prefix}{source}", queryset=queryset))
+        return select, prefetch
+
+    @classmethod
+    def load_related(cls, queryset, fields=(), expand=()):
+        """
+        The queryset with the related objects rendering it for `fields` and `expand` needs loaded up front
+        """
+        select, prefetch = cls.related_lookups(queryset.model, fields, expand)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+    @classmethod
+    def load_requested(cls, queryset, request):
+        """
+        The queryset with what the request's ?fields= and ?expand= render loaded up front
+        """
+        return cls.load_related(queryset, query_paths(request, "fields"), query_paths(request, "expand"))
+
+
 class PasswordHashMixin:
     """
     Mixin to hash passwords before saving user instances
@@ -41,13 +258,7 @@ class PasswordHashMixin:
         Create user instance with hashed password
         """
         password = validated_data.pop("password", None)
-        user = self.Meta.model.objects.create_user(**validated_data)
-
-        if password:
-            user.set_password(password)
-            user.save()
-
-        return user
+        return self.Meta.model.objects.create_user(password=password, **validated_data)
 
     def update(self, instance, validated_data):
         password = validated_data.pop("password", None)
@@ -59,7 +270,7 @@ class PasswordHashMixin:
         return super().update(instance, validated_data)
 
 
-class UserSerializer(PasswordHashMixin, ModelSerializer):
+class UserSerializer(ExpandableFieldsMixin, PasswordHashMixin, ModelSerializer):
     """
     Base User serializer
     """
@@ -93,28 +304,24 @@ class AdminSerializer(UserSerializer):
         model = Admin
 
 
-class SubjectSerializer(ModelSerializer):
+class SubjectSerializer(ExpandableFieldsMixin, ModelSerializer):
     """
     Serializer for Subject model
     """
+    groups = IntegerField(source="groups_count", read_only=True)
 
     class Meta:
         model = Subject
-        fields = "__all__"
+        exclude = ["groups_count"]
 
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation["groups"] = Group.objects.filter(subject=instance).count()
-        return representation
-    
 
-class RoomSerializer(ModelSerializer):
+class RoomSerializer(ExpandableFieldsMixin, ModelSerializer):
     class Meta:
         model = Room
         fields = "__all__"
 
 
-class StudentParentSerializer(ModelSerializer):
+class StudentParentSerializer(ExpandableFieldsMixin, ModelSerializer):
     """
     Nested serializer for Student's parent
     """
@@ -124,11 +331,15 @@ class StudentParentSerializer(ModelSerializer):
         fields = ["id", "email", "first_name", "last_name", "middle_name", "phone_number", "role", "created", "updated"]
 
 
-class ParentSerializer(PasswordHashMixin, ModelSerializer):
+class ParentSerializer(ExpandableFieldsMixin, PasswordHashMixin, ModelSerializer):
     """
-    Serializer for Parent model with password hashing and nested student relationship.
+    Serializer for Parent model with password hashing and the parent's active students, ids unless expanded
     """
     students = PrimaryKeyRelatedField(queryset=Student.objects.all(), many=True, required=False)
+    expandable_fields = {
+        "students": Expandable("StudentSerializer", source="parent_students", many=True,
+                               queryset=lambda: Student.objects.filter(is_active=True)),
+    }
 
     class Meta:
         model = Parent
@@ -140,14 +351,6 @@ class ParentSerializer(PasswordHashMixin, ModelSerializer):
             }
         }
 
-    def to_representation(self, instance):
-        """
-        Add nested student data to the serialized representation.
-        """
-        representation = super().to_representation(instance)
-        representation["students"] = StudentSerializer(instance.parent_students.all(), many=True).data
-        return representation
-
     def create(self, validated_data):
         """
         Create parent instance with student relationship.
@@ -170,13 +373,20 @@ class TeacherSerializer(UserSerializer):
         model = Teacher
 
 
-class GroupSerializer(ModelSerializer):
+class GroupSerializer(ExpandableFieldsMixin, ModelSerializer):
     """
-    Serializer for Group model with subject and teacher nested representations
+    Serializer for Group model with its subject, teacher and room, ids unless expanded. Rejects groups whose
+    lessons overlap another group's in the same room or with the same teacher
     """
 
     subject = PrimaryKeyRelatedField(queryset=Subject.objects.all(), many=False, required=True)
     teacher = PrimaryKeyRelatedField(queryset=Teacher.objects.all(), many=False, required=True)
+    room = PrimaryKeyRelatedField(queryset=Room.objects.all(), many=False, required=False, allow_null=True)
+    expandable_fields = {
+        "subject": Expandable("SubjectSerializer"),
+        "teacher": Expandable("TeacherSerializer"),
+        "room": Expandable("RoomSerializer"),
+    }
 
     class Meta:
         model = Group
@@ -187,56 +397,98 @@ class GroupSerializer(ModelSerializer):
             }
         }
 
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation["subject"] = SubjectSerializer(instance.subject, many=False).data
-        representation["teacher"] = TeacherSerializer(instance.teacher, many=False).data
-        return representation
+    schedule_fields = ("lesson_days", "start_time", "end_time", "start_date", "end_date", "room", "teacher")
+
+    def schedule_values(self, attrs):
+        return {field: attrs.get(field, getattr(self.instance, field, None)) for field in self.schedule_fields}
+
+    def check_conflicts(self, find, values):
+        conflicts = find(
+            values["lesson_days"], values["start_time"], values["end_time"], values["start_date"],
+            values["end_date"],
+            room_id=values["room"].pk if values["room"] else None,
+            teacher_id=values["teacher"].pk,
+            exclude=self.instance.pk if self.instance else None,
+        )
+        if conflicts:
+            raise ValidationError({
+                kind: [f"The {kind} is busy with group {group['name']} from {group['start_time']:%H:%M} to "
+                       f"{group['end_time']:%H:%M}" for group in groups]
+                for kind, groups in conflicts.items()
+            })
+
+    def validate(self, attrs):
+        """
+        Check the lesson times and dates are in order and that neither the room nor the teacher is busy with
+        another group at the same time, looked up in the schedule index when every process shares the cache it
+        is kept current with
+        """
+        values = self.schedule_values(attrs)
+        if values["start_time"] >= values["end_time"]:
+            raise ValidationError({"end_time": "End time must be after the start time"})
+        if values["start_date"] > values["end_date"]:
+            raise ValidationError({"end_date": "End date must not be before the start date"})
+        if settings.CACHE_SHARED:
+            self.check_conflicts(get_schedule().conflicts, values)
+        return attrs
+
+    def save_checked(self, save, validated_data):
+        """
+        Save once the database confirms there is no conflict. The teacher and room rows are locked, so concurrent
+        saves booking them are checked one after another, whatever the schedule index of their process knew
+        """
+        values = self.schedule_values(validated_data)
+        with transaction.atomic():
+            User.objects.select_for_update().filter(pk=values["teacher"].pk).exists()
+            if values["room"]:
+                Room.objects.select_for_update().filter(pk=values["room"].pk).exists()
+            self.check_conflicts(find_conflicts, values)
+            return save()
 
     def update_group_status(self, validated_data):
         """
-        Custom method to update group's active status on each create/update
+        Custom method to update group's active status on each create/update, a group is active from its start date
+        to its end date. Dates a partial update leaves out are read from the instance
         """
-        start_date = validated_data.get("start_date")
-        if start_date and start_date <= timezone.now().date():
-            validated_data["is_active"] = True
-        else:
-            validated_data["is_active"] = False
+        start_date = validated_data.get("start_date", getattr(self.instance, "start_date", None))
+        end_date = validated_data.get("end_date", getattr(self.instance, "end_date", None))
+        today = timezone.localdate()
+        validated_data["is_active"] = bool(start_date and end_date and start_date <= today <= end_date)
         return validated_data
 
 
     def create(self, validated_data):
         validated_data = self.update_group_status(validated_data)
-        return super().create(validated_data)
+        return self.save_checked(partial(super().create, validated_data), validated_data)
 
     def update(self, instance, validated_data):
         validated_data = self.update_group_status(validated_data)
-        return super().update(instance, validated_data)
+        return self.save_checked(partial(super().update, instance, validated_data), validated_data)
 
 
 class StudentSerializer(UserSerializer):
     """
-    Serializer for Student model with password hashing and nested relationships for groups and parents
+    Serializer for Student model with password hashing and the student's groups and parents, ids unless expanded
     """
     student_groups = PrimaryKeyRelatedField(queryset=Group.objects.all(), many=True, required=False)
     student_parents = PrimaryKeyRelatedField(queryset=Parent.objects.all(), many=True, required=False)
+    is_preferential = SerializerMethodField()
+    preferential_amount = SerializerMethodField()
+    expandable_fields = {
+        "student_groups": Expandable("GroupSerializer", many=True),
+        "student_parents": Expandable("StudentParentSerializer", source="parents", many=True),
+    }
 
     class Meta(UserSerializer.Meta):
         model = Student
-        fields = UserSerializer.Meta.fields + ["student_groups", "student_parents"]
+        fields = UserSerializer.Meta.fields + ["student_groups", "student_parents", "is_preferential",
+                                               "preferential_amount"]
 
-    def to_representation(self, instance):
-        """
-        Add nested group and parent data to the serialized representation.
-        """
-        representation = super().to_representation(instance)
-        representation["student_groups"] = GroupSerializer(instance.student_groups.all(), many=True,
-                                                           context=self.context).data
-        representation["student_parents"] = StudentParentSerializer(instance.parents.all(), many=True,
-                                                            context=self.context).data
-        representation["is_preferential"] = "true" if instance.is_preferential else "false"
-        representation["preferential_amount"] = instance.preferential_amount if instance.is_preferential else 0
-        return representation
+    def get_is_preferential(self, instance):
+        return "true" if instance.is_preferential else "false"
+
+    def get_preferential_amount(self, instance):
+        return instance.preferential_amount if instance.is_preferential else 0
 
     def create(self, validated_data):
         """
@@ -250,7 +502,275 @@ class StudentSerializer(UserSerializer):
             student.student_groups.set(student_groups)
 
         if student_parents:
-            for parent in student_parents:
-                parent.parent_students.add(student)
+            student.parents.add(*student_parents)
 
         return student
+
+
+class MonthQuerySerializer(Serializer):
+    """
+    Validates year/month query parameters, defaulting to the current month
+    """
+    year = IntegerField(min_value=2000, max_value=2100, required=False)
+    month = IntegerField(min_value=1, max_value=12, required=False)
+
+    def validate(self, attrs):
+        today = timezone.localdate()
+        attrs.setdefault("year", today.year)
+        attrs.setdefault("month", today.month)
+        return attrs
+
+
+class LessonCalendarSerializer(Serializer):
+    """
+    Parameters of lesson calendar generation, lessons are (re)generated from `since`, today by default
+    """
+    since = DateField(required=False)
+
+
+class ScheduleQuerySerializer(Serializer):
+    """
+    Query parameters of the schedule lookups, `at` defaults to now
+    """
+    at = DateTimeField(required=False)
+
+    def validate(self, attrs):
+        attrs["at"] = timezone.localtime(attrs.get("at") or timezone.now())
+        return attrs
+
+
+class DashboardQuerySerializer(MonthQuerySerializer):
+    """
+    Query parameters of the teacher dashboard
+    """
+    lessons = IntegerField(min_value=1, max_value=100, required=False, default=10)
+
+
+class PaymentReportQuerySerializer(MonthQuerySerializer):
+    """
+    Query parameters of the monthly payment report
+    """
+    group = UUIDField(required=False)
+    teacher = UUIDField(required=False)
+    debtors = BooleanField(required=False, default=False)
+
+
+class FinanceReportQuerySerializer(Serializer):
+    """
+    Query parameters of the finance report, months as YYYY-MM, by default the last 12 months
+    """
+    start = DateField(input_formats=["%Y-%m"], required=False)
+    end = DateField(input_formats=["%Y-%m"], required=False)
+    by = ChoiceField(choices=["month", "group", "subject", "teacher"], required=False, default="month")
+
+    def validate(self, attrs):
+        end = attrs.get("end") or timezone.localdate()
+        start = attrs.get("start") or end.replace(year=end.year - 1 + (end.month == 12), month=end.month % 12 + 1,
+                                                   day=1)
+        if start > end:
+            raise ValidationError({"start": "Start month must not be after the end month"})
+        return {"start": (start.year, start.month), "end": (end.year, end.month), "by": attrs["by"]}
+
+
+class LeaderboardQuerySerializer(Serializer):
+    """
+    Query parameters of the leaderboards, a group's or without `group` the school-wide one
+    """
+    group = UUIDField(required=False, default=None)
+    limit = IntegerField(min_value=1, max_value=100, required=False, default=10)
+
+
+class LeaderboardRankQuerySerializer(Serializer):
+    """
+    Query parameters of a student's rank in a group's or the school-wide leaderboard
+    """
+    student = UUIDField()
+    group = UUIDField(required=False, default=None)
+
+
+class PaymentSerializer(ExpandableFieldsMixin, ModelSerializer):
+    """
+    Serializer for Payment model, student and group names are snapshotted on creation
+    """
+    student = PrimaryKeyRelatedField(queryset=Student.objects.all(), many=False, required=True)
+    group = PrimaryKeyRelatedField(queryset=Group.objects.all(), many=False, required=True)
+    expandable_fields = {
+        "student": Expandable("StudentSerializer"),
+        "group": Expandable("GroupSerializer"),
+    }
+
+    class Meta:
+        model = Payment
+        fields = "__all__"
+        extra_kwargs = {
+            "student_name": {
+                "read_only": True,
+            },
+            "group_name": {
+                "read_only": True,
+            },
+        }
+
+
+class PaymentBulkSerializer(Serializer):
+    """
+    One row of a bulk payment upload, related objects are checked for all rows at once by bulk_create_payments
+    """
+    student = UUIDField()
+    group = UUIDField()
+    year = IntegerField(min_value=2000, max_value=2100)
+    month = IntegerField(min_value=1, max_value=12)
+    amount = DecimalField(max_digits=12, decimal_places=2, min_value=Decimal(0))
+    description = CharField(required=False, allow_blank=True, allow_null=True)
+
+    def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
+        attrs["student_id"] = attrs.pop("student")
+        attrs["group_id"] = attrs.pop("group")
+        return attrs
+
+
+class StudentImportSerializer(Serializer):
+    """
+    One row of a bulk student import, uniqueness and related objects are checked for all rows at once by
+    api.importers.import_students
+    """
+    email = EmailField(max_length=255)
+    first_name = CharField(max_length=255)
+    last_name = CharField(max_length=255)
+    middle_name = CharField(max_length=255)
+    phone_number = PhoneNumberField()
+    password = CharField(required=False, allow_blank=True, write_only=True)
+    is_preferential = BooleanField(required=False, default=False)
+    preferential_amount = DecimalField(max_digits=12, decimal_places=2, min_value=Decimal(0), required=False,
+                                       default=Decimal(0))
+    student_groups = ListField(child=UUIDField(), required=False, default=list)
+    student_parents = ListField(child=UUIDField(), required=False, default=list)
+
+
+class ExportQuerySerializer(Serializer):
+    """
+    Query parameters of the exports
+    """
+    date_from = DateField(required=False)
+    date_to = DateField(required=False)
+    group = UUIDField(required=False)
+    file_type = ChoiceField(choices=["csv", "xlsx"], default="csv")
+
+    def validate(self, attrs):
+        """
+        Reject the filters the export does not accept, `filters` in the context, instead of ignoring them
+        """
+        filters = self.context.get("filters")
+        if filters is not None:
+            unsupported = [name for name in attrs if name != "file_type" and name not in filters]
+            if unsupported:
+                raise ValidationError({name: "This export cannot be filtered by it" for name in unsupported})
+        return attrs
+
+
+class LessonSerializer(ExpandableFieldsMixin, ModelSerializer):
+    """
+    Serializer for Lesson model
+    """
+    group = PrimaryKeyRelatedField(queryset=Group.objects.all(), many=False, required=True)
+    room = PrimaryKeyRelatedField(queryset=Room.objects.all(), many=False, required=False, allow_null=True)
+    expandable_fields = {
+        "group": Expandable("GroupSerializer"),
+        "room": Expandable("RoomSerializer"),
+    }
+
+    class Meta:
+        model = Lesson
+        fields = "__all__"
+        extra_kwargs = {
+            # Only generated lessons are dated, a lesson created by hand may leave it out
+            "date": {"required": False, "default": None},
+        }
+
+
+class StoredFileSerializer(ExpandableFieldsMixin, ModelSerializer):
+    """
+    Serializer for a file stored by content
+    """
+
+    class Meta:
+        model = StoredFile
+        fields = ["id", "content_hash", "size", "content_type"]
+
+
+class UploadSessionSerializer(ExpandableFieldsMixin, ModelSerializer):
+    """
+    Serializer for chunked uploads, `chunk_size` tells the client how to cut the file
+    """
+    chunk_size = SerializerMethodField()
+    expandable_fields = {
+        "stored_file": Expandable("StoredFileSerializer"),
+    }
+
+    class Meta:
+        model = UploadSession
+        fields = ["id", "file_name", "content_type", "size", "received", "chunk_size", "stored_file", "created"]
+        read_only_fields = ["received", "stored_file"]
+
+    def get_chunk_size(self, instance):
+        return settings.UPLOAD_CHUNK_SIZE
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.UPLOAD_MAX_SIZE:
+            raise ValidationError(f"Size must be between 1 and {settings.UPLOAD_MAX_SIZE} bytes")
+        return value
+
+
+class OwnUploadField(PrimaryKeyRelatedField):
+    """
+    A completed chunked upload started by the requesting user
+    """
+
+    def get_queryset(self):
+        user = self.context["request"].user
+        if not user.is_authenticated:
+            return UploadSession.objects.none()
+        return UploadSession.objects.filter(stored_file__isnull=False, created_by=user)
+
+
+class HomeworkSerializer(ExpandableFieldsMixin, ModelSerializer):
+    """
+    Serializer for Homework model, the file is attached by the id of a completed chunked upload
+    """
+    lesson = PrimaryKeyRelatedField(queryset=Lesson.objects.all(), many=False, required=True)
+    upload = OwnUploadField(many=False, required=False, allow_null=True, write_only=True)
+    expandable_fields = {
+        "lesson": Expandable("LessonSerializer"),
+        "stored_file": Expandable("StoredFileSerializer"),
+    }
+
+    class Meta:
+        model = Homework
+        fields = "__all__"
+        extra_kwargs = {
+            "file": {"read_only": True},
+            "file_name": {"read_only": True},
+            "stored_file": {"read_only": True},
+        }
+
+    def attach_upload(self, validated_data):
+        if "upload" in validated_data:
+            upload = validated_data.pop("upload")
+            validated_data["stored_file"] = upload.stored_file if upload else None
+            validated_data["file_name"] = upload.file_name if upload else ""
+        return validated_data
+
+    def create(self, validated_data):
+        return super().create(self.attach_upload(validated_data))
+
+    def update(self, instance, validated_data):
+        return super().update(instance, self.attach_upload(validated_data))
+
+
+class AttendanceMarkSerializer(Serializer):
+    """
+    Attendance of one student in a whole-lesson roster update
+    """
+    student = UUIDField()
+    is_absent = BooleanField()
@@ -1,27 +1,359 @@
-from django.db.models.signals import post_save
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save, post_save, post_delete, post_init, pre_delete, m2m_changed
 from django.dispatch import receiver
+from django.utils import timezone
 
-from .models import Expense, Payment
+from .authentication import user_cache
+from .cache import bump_version
+from .counters import refresh_students_count, refresh_groups_count, change_groups_count
+from .finance import payment_rollup, expense_rollup, apply_deltas, move_group_rollups
+from .leaderboard import move_points
+from .lesson_calendar import generate_lessons
+from .models import Expense, Payment, Group, Subject, Room, Lesson, Point, Homework, Superuser, Admin, Teacher, \
+    Student, Parent
+from .uploads import change_references
+from .utils import UserRoles
 
+User = get_user_model()
 
-@receiver(signal=post_save, sender=Payment)
-def save_payment_extra_details(sender, instance, created, **kwargs):
+# Users are saved through their role proxies too, which send signals with the proxy as the sender
+USER_MODELS = (User, Superuser, Admin, Teacher, Student, Parent)
+# Fields teachers are listed with, besides the role and active flag every save compares. `updated` changes on every
+# save but the ones limited to other fields, e.g. the last_login update of every login
+USER_STATE_FIELDS = ("role", "is_active", "email", "first_name", "last_name", "middle_name", "phone_number",
+                     "updated")
+
+
+def user_receiver(signal):
     """
-    Save payment's extra details if student, or a group attached to a payment is deleted
+    Connect a receiver to `signal` sent for the user model or any of its role proxies
     """
-    if created:
+
+    def connect(func):
+        for model in USER_MODELS:
+            signal.connect(func, sender=model)
+        return func
+
+    return connect
+
+
+@receiver(signal=pre_save, sender=Payment)
+def save_payment_extra_details(sender, instance, raw=False, **kwargs):
+    """
+    Save payment's extra details if student, or a group attached to a payment is deleted. Names are set before
+    the INSERT, so a payment is written with a single statement
+    """
+    if raw or not instance._state.adding:
+        return
+    if instance.student_id:
         instance.student_name = instance.student.full_name
+    if instance.group_id:
         instance.group_name = instance.group.name
-        instance.save()
 
 
-@receiver(signal=post_save, sender=Expense)
-def save_expense_extra_details(sender, instance, created, **kwargs):
+@receiver(signal=pre_save, sender=Expense)
+def save_expense_extra_details(sender, instance, raw=False, **kwargs):
     """
     Set expense's extra details to keep details if user assigned expense or a user, for whom this expense was
     created is deleted
     """
-    if created:
+    if raw or not instance._state.adding:
+        return
+    if instance.assigned_by_id:
         instance.assigned_by_name = instance.assigned_by.full_name
+    if instance.assigned_to_id:
         instance.assigned_to_name = instance.assigned_to.full_name
-        instance.save()
+
+
+ROLLUPS = {Payment: payment_rollup, Expense: expense_rollup}
+ROLLUP_FIELDS = {Payment: ("year", "month", "group_id", "amount"), Expense: ("created", "amount")}
+
+
+@receiver(signal=post_init, sender=Payment)
+@receiver(signal=post_init, sender=Expense)
+def remember_rollup(sender, instance, **kwargs):
+    """
+    Remember the rollup key and amount a payment or an expense was loaded with, unless some of them are deferred
+    or not set yet. A payment's group is None once the group is deleted, which is a loaded value
+    """
+    fields = ROLLUP_FIELDS[sender]
+    loaded = not instance.get_deferred_fields().intersection(fields) and all(
+        instance.__dict__.get(field) is not None for field in fields if not sender._meta.get_field(field).null
+    )
+    instance._loaded_rollup = ROLLUPS[sender](instance) if loaded else None
+
+
+@receiver(signal=pre_save, sender=Payment)
+@receiver(signal=pre_save, sender=Expense)
+def load_rollup(sender, instance, raw=False, **kwargs):
+    """
+    Read the stored key and amount of a payment or an expense loaded with deferred fields before it is updated
+    """
+    if raw or instance._state.adding or instance._loaded_rollup is not None:
+        return
+    stored = sender.objects.filter(pk=instance.pk).only(*ROLLUP_FIELDS[sender]).first()
+    instance._loaded_rollup = stored._loaded_rollup if stored else None
+
+
+@receiver(signal=post_save, sender=Payment)
+@receiver(signal=post_save, sender=Expense)
+def update_rollup(sender, instance, created, raw=False, **kwargs):
+    """
+    Move a payment's or an expense's amount between finance rollups when it is created or changed
+    """
+    if raw:
+        return
+    field = "income" if sender is Payment else "expenses"
+    key, amount = ROLLUPS[sender](instance)
+    deltas = {key: amount}
+    if not created and instance._loaded_rollup is not None:
+        loaded_key, loaded_amount = instance._loaded_rollup
+        deltas[loaded_key] = deltas.get(loaded_key, 0) - loaded_amount
+    apply_deltas(**{field: deltas})
+    instance._loaded_rollup = (key, amount)
+
+
+@receiver(signal=post_delete, sender=Payment)
+@receiver(signal=post_delete, sender=Expense)
+def remove_from_rollup(sender, instance, **kwargs):
+    """
+    Take a deleted payment's or expense's amount out of its finance rollup
+    """
+    field = "income" if sender is Payment else "expenses"
+    key, amount = instance._loaded_rollup or ROLLUPS[sender](instance)
+    apply_deltas(**{field: {key: -amount}})
+
+
+POINT_FIELDS = ("student_id", "homework_id", "amount")
+
+
+@receiver(signal=post_init, sender=Point)
+def remember_point(sender, instance, **kwargs):
+    """
+    Remember the student, homework and amount a point was loaded with, unless some of them are deferred
+    """
+    values = tuple(instance.__dict__.get(field) for field in POINT_FIELDS)
+    instance._loaded_point = values if None not in values else None
+
+
+@receiver(signal=pre_save, sender=Point)
+def load_point(sender, instance, raw=False, **kwargs):
+    """
+    Read the stored student, homework and amount of a point loaded with deferred fields before it is updated
+    """
+    if raw or instance._state.adding or instance._loaded_point is not None:
+        return
+    stored = Point.objects.filter(pk=instance.pk).only(*POINT_FIELDS).first()
+    instance._loaded_point = stored._loaded_point if stored else None
+
+
+@receiver(signal=post_save, sender=Point)
+def update_leaderboard(sender, instance, created, raw=False, **kwargs):
+    """
+    Move a point's amount between leaderboard entries when it is created or changed
+    """
+    if raw:
+        return
+    point = tuple(getattr(instance, field) for field in POINT_FIELDS)
+    if created or point != instance._loaded_point:
+        move_points(added=point, removed=None if created else instance._loaded_point)
+    instance._loaded_point = point
+
+
+@receiver(signal=post_delete, sender=Point)
+def remove_from_leaderboard(sender, instance, **kwargs):
+    """
+    Take a deleted point out of the leaderboards
+    """
+    move_points(removed=instance._loaded_point or tuple(getattr(instance, field) for field in POINT_FIELDS))
+
+
+@receiver(signal=post_init, sender=Homework)
+def remember_homework_file(sender, instance, **kwargs):
+    """
+    Remember the stored file a homework was loaded with, so replacing it moves the reference
+    """
+    instance._loaded_stored_file_id = instance.__dict__.get("stored_file_id")
+
+
+@receiver(signal=post_save, sender=Homework)
+def update_file_references(sender, instance, created, raw=False, **kwargs):
+    """
+    Count a homework's reference to its stored file when it is created or its file is replaced
+    """
+    if raw:
+        return
+    loaded = None if created else instance._loaded_stored_file_id
+    if loaded != instance.stored_file_id:
+        change_references(instance.stored_file_id, 1)
+        change_references(loaded, -1)
+    instance._loaded_stored_file_id = instance.stored_file_id
+
+
+@receiver(signal=post_delete, sender=Homework)
+def remove_file_reference(sender, instance, **kwargs):
+    """
+    Drop a deleted homework's reference to its stored file
+    """
+    change_references(instance.stored_file_id, -1)
+
+
+@receiver(signal=pre_delete, sender=Group)
+def move_deleted_group_rollups(sender, instance, **kwargs):
+    """
+    A deleted group's payments lose their group, so do its rollups before they are deleted with it
+    """
+    move_group_rollups(instance.pk)
+
+
+@receiver(signal=post_init, sender=Group)
+def remember_group_subject(sender, instance, **kwargs):
+    """
+    Remember the subject a group was loaded with, so moving it to another subject fixes both counters
+    """
+    instance._loaded_subject_id = instance.__dict__.get("subject_id")
+
+
+@receiver(signal=post_save, sender=Group)
+def update_subject_groups_count(sender, instance, created, raw=False, **kwargs):
+    """
+    Keep Subject.groups_count in step with created groups and groups moved between subjects, fixtures carry their
+    own counts
+    """
+    if raw:
+        instance._loaded_subject_id = instance.subject_id
+        return
+    if created:
+        change_groups_count(instance.subject_id, 1)
+    elif instance._loaded_subject_id != instance.subject_id:
+        refresh_groups_count([instance.subject_id, instance._loaded_subject_id])
+    instance._loaded_subject_id = instance.subject_id
+
+
+# Group fields the generated lesson calendar depends on
+CALENDAR_FIELDS = ("lesson_days", "start_date", "end_date")
+
+
+@receiver(signal=post_init, sender=Group)
+def remember_group_calendar(sender, instance, **kwargs):
+    """
+    Remember the lesson days, dates and room a group was loaded with, so changing them updates its future lessons
+    """
+    instance._loaded_calendar = tuple(instance.__dict__.get(field) for field in CALENDAR_FIELDS)
+    instance._loaded_room_id = instance.__dict__.get("room_id")
+
+
+@receiver(signal=post_save, sender=Group)
+def update_future_lessons(sender, instance, created, raw=False, **kwargs):
+    """
+    Regenerate the future lessons of a group with a generated calendar when its lesson days or dates change and
+    move the future lessons held in its old room to the new one
+    """
+    calendar = tuple(getattr(instance, field) for field in CALENDAR_FIELDS)
+    loaded_calendar, loaded_room_id = instance._loaded_calendar, instance._loaded_room_id
+    instance._loaded_calendar, instance._loaded_room_id = calendar, instance.room_id
+    if raw or created:
+        return
+
+    today = timezone.localdate()
+    if loaded_room_id != instance.room_id:
+        Lesson.objects.filter(group_id=instance.pk, date__gte=today, room_id=loaded_room_id).update(
+            room_id=instance.room_id)
+    if loaded_calendar != calendar and Lesson.objects.filter(group_id=instance.pk, date__isnull=False).exists():
+        generate_lessons([instance.pk], since=today)
+
+
+@receiver(signal=post_delete, sender=Group)
+def decrease_subject_groups_count(sender, instance, **kwargs):
+    """
+    Keep Subject.groups_count in step with deleted groups
+    """
+    change_groups_count(instance.subject_id, -1)
+
+
+@receiver(signal=m2m_changed, sender=User.student_groups.through)
+def update_group_students_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Recount students of the groups touched by adding, removing or clearing User.student_groups
+    """
+    if reverse:
+        # instance is a group, pk_set holds users
+        if action in ("post_add", "post_remove", "post_clear"):
+            refresh_students_count([instance.pk])
+        return
+
+    if action == "pre_clear":
+        instance._cleared_group_ids = list(instance.student_groups.values_list("pk", flat=True))
+    elif action == "post_clear":
+        refresh_students_count(instance.__dict__.pop("_cleared_group_ids", []))
+    elif action in ("post_add", "post_remove") and pk_set:
+        refresh_students_count(pk_set)
+
+
+@user_receiver(post_init)
+def remember_user_state(sender, instance, **kwargs):
+    """
+    Remember the role, active flag and listed fields a user was loaded with, so saves can tell what changed
+    """
+    instance._loaded_state = tuple(instance.__dict__.get(field) for field in USER_STATE_FIELDS)
+
+
+@user_receiver(post_save)
+def update_user_dependents(sender, instance, created, raw=False, **kwargs):
+    """
+    Recount students of a user's groups when the user is deactivated, reactivated or changes role, invalidate
+    cached teachers when a teacher is created, a field teachers are listed with changes or a user becomes or stops
+    being a teacher, and drop the user from the authentication cache. Saves changing nothing listed, e.g. the
+    last_login update of every login, keep the cached teachers
+    """
+    if raw:
+        return
+
+    user_cache.discard(instance.pk)
+
+    loaded = instance._loaded_state
+    state = instance._loaded_state = tuple(instance.__dict__.get(field) for field in USER_STATE_FIELDS)
+    (loaded_role, loaded_is_active), (role, is_active) = loaded[:2], state[:2]
+
+    if UserRoles.TEACHER in (role, loaded_role) and (created or state != loaded):
+        bump_version("teacher")
+    if not created and (loaded_role, loaded_is_active) != (role, is_active):
+        refresh_students_count(User.student_groups.through.objects.filter(user_id=instance.pk).values("group_id"))
+
+
+@user_receiver(pre_delete)
+def remember_user_groups(sender, instance, **kwargs):
+    """
+    Remember a user's groups before the deletion cascades to their enrollments
+    """
+    instance._deleted_group_ids = list(instance.student_groups.values_list("pk", flat=True))
+
+
+@user_receiver(post_delete)
+def update_deleted_user_dependents(sender, instance, **kwargs):
+    """
+    Recount students of the groups a deleted user was enrolled in and invalidate cached teachers
+    """
+    user_cache.discard(instance.pk)
+    if instance.role == UserRoles.TEACHER:
+        bump_version("teacher")
+    if instance.__dict__.get("_deleted_group_ids"):
+        refresh_students_count(instance._deleted_group_ids)
+
+
+@receiver(signal=post_save, sender=Group)
+@receiver(signal=post_delete, sender=Group)
+def invalidate_groups(sender, **kwargs):
+    bump_version("group")
+
+
+@receiver(signal=post_save, sender=Subject)
+@receiver(signal=post_delete, sender=Subject)
+def invalidate_subjects(sender, **kwargs):
+    bump_version("subject")
+
+
+@receiver(signal=post_save, sender=Room)
+@receiver(signal=post_delete, sender=Room)
+def invalidate_rooms(sender, **kwargs):
+    bump_version("room")
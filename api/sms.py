@@ -0,0 +1,346 @@
+import json
+import time
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+from uuid import UUID
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import SmsMessage
+from .reports import monthly_payment_report
+from .utils import SmsKinds, SmsStatuses
+
+User = get_user_model()
+Family = User.parent_students.through
+
+TOKEN_CACHE_KEY = "sms:eskiz-token"
+# Eskiz tokens are valid for 30 days, an expired one is refreshed when a request is refused
+TOKEN_TIMEOUT = 29 * 24 * 60 * 60
+# Seconds a worker has to send the messages it claimed before another worker may claim them again
+CLAIM_TIMEOUT = 5 * 60
+# Final delivery statuses in Eskiz's delivery reports
+DELIVERY_STATUSES = {
+    "DELIVRD": SmsStatuses.DELIVERED,
+    "UNDELIV": SmsStatuses.FAILED,
+    "EXPIRED": SmsStatuses.FAILED,
+    "REJECTD": SmsStatuses.FAILED,
+}
+
+
+class SmsError(Exception):
+    """
+    A batch the provider did not take. `retry` tells whether sending it again may help, `retry_after` is the
+    number of seconds the provider asked to wait first
+    """
+
+    def __init__(self, message, retry=True, retry_after=0):
+        super().__init__(message)
+        self.retry = retry
+        self.retry_after = retry_after
+
+
+class EskizClient:
+    """
+    Eskiz SMS API client. The auth token is shared by every worker through the cache, refreshed when the API
+    refuses it and requested again when it cannot be refreshed
+    """
+
+    def __init__(self, url=None, email=None, password=None, sender=None, callback_url=None, timeout=30):
+        self.url = (url or settings.ESKIZ_API_URL).rstrip("/")
+        self.email = email or settings.ESKIZ_EMAIL
+        self.password = password or settings.ESKIZ_SECRET_TOKEN
+        self.sender = sender or settings.ESKIZ_SENDER
+        self.callback_url = settings.ESKIZ_CALLBACK_URL if callback_url is None else callback_url
+        self.timeout = timeout
+
+    def call(self, method, path, data=None, token=None):
+        """
+        (status, parsed JSON body, headers) of an API request, SmsError when the API cannot be reached
+        """
+        headers = {"Accept": "application/json"}
+        body = None
+        if data is not None:
+            body = json.dumps(data).encode()
+            headers["Content-Type"] = "application/json"
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        request = Request(f"{self.url}{path}", data=body, headers=headers, method=method)
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                status, content, response_headers = response.status, response.read(), response.headers
+        except HTTPError as error:
+            status, content, response_headers = error.code, error.read(), error.headers
+        except (URLError, OSError) as error:
+            raise SmsError(f"Eskiz is unreachable: {error}")
+        try:
+            payload = json.loads(content or b"{}")
+        except ValueError:
+            payload = {}
+        return status, payload, response_headers
+
+    def token(self, expired=None):
+        """
+        The cached auth token, or a new one when there is none or the API refused `expired`
+        """
+        token = cache.get(TOKEN_CACHE_KEY)
+        if token and token != expired:
+            return token
+
+        status = payload = None
+        if expired:
+            status, payload, _ = self.call("PATCH", "/auth/refresh", token=expired)
+        if status != 200:
+            status, payload, _ = self.call("POST", "/auth/login", {"email": self.email, "password": self.password})
+        token = payload.get("data", {}).get("token") if status == 200 else None
+        if not token:
+            raise SmsError(f"Eskiz login failed with status {status}")
+        cache.set(TOKEN_CACHE_KEY, token, TOKEN_TIMEOUT)
+        return token
+
+    def send_batch(self, messages):
+        """
+        Send SmsMessages in a single request, their ids go along so delivery reports can be matched to them
+        """
+        data = {
+            "messages": [{"user_sms_id": str(message.pk), "to": message.phone_number, "text": message.text}
+                         for message in messages],
+            "from": self.sender,
+            "dispatch_id": int(time.time() * 1000),
+        }
+        if self.callback_url:
+            data["callback_url"] = self.callback_url
+
+        token = self.token()
+        status, payload, headers = self.call("POST", "/message/sms/send-batch", data, token=token)
+        if status == 401:
+            status, payload, headers = self.call("POST", "/message/sms/send-batch", data, token=self.token(token))
+        if status == 200:
+            return payload
+        error = f"Eskiz answered {status}: {payload.get('message', '')}".rstrip(": ")
+        if status == 429 or status >= 500 or status == 401:
+            try:
+                retry_after = int(headers.get("Retry-After") or 0)
+            except ValueError:
+                retry_after = 0
+            raise SmsError(error, retry_after=retry_after)
+        raise SmsError(error, retry=False)
+
+
+class RateLimiter:
+    """
+    Token bucket letting `rate` messages through per second on average, in bursts of up to a second's worth
+    """
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = max(rate, 1)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.last = clock()
+
+    def wait(self, count):
+        """
+        Block until `count` messages may be sent
+        """
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        self.tokens -= count
+        if self.tokens < 0:
+            self.sleep(-self.tokens / self.rate)
+
+
+def claim_batch(size):
+    """
+    Mark up to `size` due messages as being sent by this worker for CLAIM_TIMEOUT seconds and return them.
+    Concurrent workers skip each other's rows where the database supports SKIP LOCKED
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = SmsMessage.objects.filter(
+            status__in=[SmsStatuses.QUEUED, SmsStatuses.SENDING], send_after__lte=now,
+        ).order_by("send_after")
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        batch = list(due[:size])
+        if batch:
+            SmsMessage.objects.filter(pk__in=[message.pk for message in batch]).update(
+                status=SmsStatuses.SENDING, send_after=now + timedelta(seconds=CLAIM_TIMEOUT),
+                attempts=F("attempts") + 1, updated=now,
+            )
+    for message in batch:
+        message.attempts += 1
+    return batch
+
+
+def retry_later(messages, error):
+    """
+    Queue messages again after a delay doubling with every attempt, failing the ones out of attempts
+    """
+    now = timezone.now()
+    failed = [message.pk for message in messages if message.attempts >= settings.SMS_MAX_ATTEMPTS]
+    if failed:
+        SmsMessage.objects.filter(pk__in=failed).update(status=SmsStatuses.FAILED, error=str(error), updated=now)
+
+    by_attempts = {}
+    for message in messages:
+        if message.pk not in failed:
+            by_attempts.setdefault(message.attempts, []).append(message.pk)
+    for attempts, pks in by_attempts.items():
+        delay = max(settings.SMS_RETRY_DELAY * 2 ** (attempts - 1), error.retry_after)
+        SmsMessage.objects.filter(pk__in=pks).update(
+            status=SmsStatuses.QUEUED, send_after=now + timedelta(seconds=delay), error=str(error), updated=now,
+        )
+    return len(failed)
+
+
+def send_queued(client=None, batch_size=None, limiter=None):
+    """
+    Send every due message in batches until none is left or the provider fails. Returns the number of messages
+    sent, queued again for a retry and failed
+    """
+    client = client or EskizClient()
+    batch_size = batch_size or settings.SMS_BATCH_SIZE
+    limiter = limiter or RateLimiter(settings.SMS_RATE_LIMIT)
+    counts = {"sent": 0, "retried": 0, "failed": 0}
+
+    # Claimed by a worker that stopped before it could tell how sending went
+    counts["failed"] += SmsMessage.objects.filter(
+        status=SmsStatuses.SENDING, send_after__lte=timezone.now(), attempts__gte=settings.SMS_MAX_ATTEMPTS,
+    ).update(status=SmsStatuses.FAILED, error="The worker sending it stopped", updated=timezone.now())
+
+    while batch := claim_batch(batch_size):
+        limiter.wait(len(batch))
+        try:
+            client.send_batch(batch)
+        except SmsError as error:
+            if not error.retry:
+                SmsMessage.objects.filter(pk__in=[message.pk for message in batch]).update(
+                    status=SmsStatuses.FAILED, error=str(error), updated=timezone.now(),
+                )
+                counts["failed"] += len(batch)
+                continue
+            failed = retry_later(batch, error)
+            counts["failed"] += failed
+            counts["retried"] += len(batch) - failed
+            # The provider is down or throttling, leave the rest of the queue for the next run
+            break
+        now = timezone.now()
+        # A delivery report may have arrived already
+        SmsMessage.objects.filter(pk__in=[message.pk for message in batch], status=SmsStatuses.SENDING).update(
+            status=SmsStatuses.SENT, sent_at=now, error="", updated=now,
+        )
+        counts["sent"] += len(batch)
+    return counts
+
+
+def record_delivery(message_id, provider_status):
+    """
+    Apply an Eskiz delivery report to the message it is about. Returns whether a message was updated
+    """
+    status = DELIVERY_STATUSES.get(str(provider_status).upper())
+    try:
+        message_id = UUID(str(message_id))
+    except ValueError:
+        return False
+    if status is None:
+        return False
+    now = timezone.now()
+    changes = {"status": status, "updated": now}
+    if status == SmsStatuses.DELIVERED:
+        changes["delivered_at"] = now
+    else:
+        changes["error"] = f"Not delivered: {provider_status}"
+    return bool(SmsMessage.objects.filter(
+        pk=message_id, status__in=[SmsStatuses.SENDING, SmsStatuses.SENT],
+    ).update(**changes))
+
+
+def phone_digits(phone_number):
+    """
+    A phone number the way Eskiz takes it, digits only, e.g. 998901234567
+    """
+    return "".join(character for character in str(phone_number) if character.isdigit())
+
+
+def queue_debt_reminders(year, month, batch_size=1000):
+    """
+    Queue a reminder to the parents of every student owing money for the given month, one per parent and student
+    with the student's debt in all groups. Reminders already queued for the month are skipped, so it can be run
+    again safely. Returns the number of reminders queued
+    """
+    debts = {}
+    names = {}
+    for row in monthly_payment_report(year, month, debtors=True).iterator(chunk_size=batch_size):
+        debts[row["student_id"]] = debts.get(row["student_id"], 0) + row["debt"]
+        names[row["student_id"]] = row["student_name"]
+
+    prefix = f"debt:{year}-{month:02}:"
+    queued = SmsMessage.objects.filter(key__startswith=prefix).count()
+    students = list(debts)
+    with transaction.atomic():
+        for start in range(0, len(students), batch_size):
+            parents = Family.objects.filter(
+                student_id__in=students[start:start + batch_size], user__is_active=True,
+            ).values_list("student_id", "user_id", "user__phone_number")
+            SmsMessage.objects.bulk_create(
+                [
+                    SmsMessage(
+                        kind=SmsKinds.DEBT_REMINDER,
+                        key=f"{prefix}{student_id}:{parent_id}",
+                        phone_number=phone_digits(phone_number),
+                        text=settings.SMS_DEBT_REMINDER_TEXT.format(
+                            student=names[student_id], month=f"{month:02}.{year}",
+                            debt=f"{debts[student_id]:,.0f}".replace(",", " "),
+                        ),
+                    )
+                    for student_id, parent_id, phone_number in parents
+                ],
+                ignore_conflicts=True,
+            )
+    return SmsMessage.objects.filter(key__startswith=prefix).count() - queued
+
+
+def queue_absence_alerts(lesson, marks):
+    """
+    Queue an alert to the parents of the students marked absent from a lesson, and drop the alerts not sent yet
+    of students now marked present. `marks` maps student ids to is_absent. Meant to run in the transaction saving
+    the attendance
+    """
+    present = [student_id for student_id, is_absent in marks.items() if not is_absent]
+    if present:
+        SmsMessage.objects.filter(
+            reduce(or_, (Q(key__startswith=f"absence:{lesson.pk}:{student_id}:") for student_id in present)),
+            status=SmsStatuses.QUEUED,
+        ).delete()
+
+    absent = [student_id for student_id, is_absent in marks.items() if is_absent]
+    if not absent:
+        return
+    parents = Family.objects.filter(student_id__in=absent, user__is_active=True).values_list(
+        "student_id", "student__first_name", "student__last_name", "user_id", "user__phone_number",
+    )
+    day = (lesson.date or timezone.localdate()).strftime("%d.%m.%Y")
+    SmsMessage.objects.bulk_create(
+        [
+            SmsMessage(
+                kind=SmsKinds.ABSENCE_ALERT,
+                key=f"absence:{lesson.pk}:{student_id}:{parent_id}",
+                phone_number=phone_digits(phone_number),
+                text=settings.SMS_ABSENCE_ALERT_TEXT.format(
+                    student=f"{first_name} {last_name}", group=lesson.group.name, date=day,
+                ),
+            )
+            for student_id, first_name, last_name, parent_id, phone_number in parents
+        ],
+        ignore_conflicts=True,
+    )
@@ -0,0 +1,23 @@
+from jobs.queue import task
+
+from .counters import rebuild_counters
+from .finance import rebuild_rollups
+from .importers import run_import
+from .leaderboard import rebuild_leaderboard
+from .lesson_calendar import generate_lessons
+from .lifecycle import update_group_states
+from .sms import queue_debt_reminders, send_queued
+from .tokens import prune_tokens
+from .uploads import prune_uploads
+
+# The batch work of the management commands, to queue from requests or run on JOBS_SCHEDULE
+task(prune_tokens, name="api.prune_tokens")
+task(prune_uploads, name="api.prune_uploads")
+task(update_group_states, name="api.update_group_states")
+task(generate_lessons, name="api.generate_lessons", timeout=60 * 60)
+task(rebuild_counters, name="api.rebuild_counters", timeout=60 * 60)
+task(rebuild_leaderboard, name="api.rebuild_leaderboard", timeout=60 * 60)
+task(rebuild_rollups, name="api.rebuild_finance_rollups", timeout=60 * 60)
+task(queue_debt_reminders, name="api.queue_debt_reminders")
+task(run_import, name="api.import_students", timeout=60 * 60)
+task(send_queued, name="api.send_sms", queue="sms")
@@ -0,0 +1,81 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+
+
+class FakeEskiz:
+    """
+    Local stand-in for the Eskiz API, serving login, token refresh and batch sending on a free port. Queue
+    (status, headers) in `responses` to fail the next batch requests, `expire_tokens()` makes the API refuse the
+    tokens handed out so far until they are refreshed
+    """
+
+    def __init__(self):
+        self.logins = 0
+        self.refreshes = 0
+        self.batches = []
+        self.responses = []
+        self.tokens = set()
+        self.expired = set()
+        self.numbers = count(1)
+
+    def __enter__(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def reply(self, status, payload=None, headers=None):
+                body = json.dumps(payload or {}).encode()
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def token(self):
+                return self.headers.get("Authorization", "").removeprefix("Bearer ")
+
+            def issue(self):
+                token = f"token-{next(fake.numbers)}"
+                fake.tokens.add(token)
+                self.reply(200, {"message": "token_generated", "data": {"token": token}})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                if self.path == "/api/auth/login":
+                    fake.logins += 1
+                    return self.issue()
+                if self.path != "/api/message/sms/send-batch":
+                    return self.reply(404)
+                if self.token() not in fake.tokens:
+                    return self.reply(401, {"message": "Expired"})
+                if fake.responses:
+                    status, headers = fake.responses.pop(0)
+                    return self.reply(status, {"message": "Failed"}, headers)
+                fake.batches.append(body)
+                self.reply(200, {"id": str(body["dispatch_id"]), "message": "Waiting for SMS provider",
+                                 "status": ["waiting"]})
+
+            def do_PATCH(self):
+                if self.path != "/api/auth/refresh" or self.token() not in fake.expired:
+                    return self.reply(401)
+                fake.refreshes += 1
+                self.issue()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def expire_tokens(self):
+        self.expired |= self.tokens
+        self.tokens.clear()
@@ -0,0 +1,76 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.test import APIClient
+
+from api.serializers import MyTokenObtainPairSerializer
+from api.urls import ASYNC_VIEWSETS
+from api.views import StudentViewSet
+from api.utils import UserRoles
+from .utils import make_users, make_groups, make_rooms, enroll, attach_parents
+
+
+class AsyncReadViewTest(TestCase):
+    """
+    Test async list/retrieve endpoints return exactly what their sync counterparts return
+    """
+
+    def setUp(self):
+        self.enterContext(self.settings(RESPONSE_CACHE_TIMEOUT=0))
+        self.client = APIClient()
+        groups = make_groups(3)
+        students = make_users(UserRoles.STUDENT, 4)
+        enroll(students, groups)
+        attach_parents(make_users(UserRoles.PARENT, 2), students)
+        make_users(UserRoles.ADMIN, 2)
+        make_users(UserRoles.SUPERUSER, 2)
+        make_rooms(3)
+
+    def test_same_as_sync(self):
+        for prefix in ASYNC_VIEWSETS:
+            with self.subTest(prefix):
+                expected = self.client.get(reverse(f"{prefix}-list"), {"page_size": 2}).json()
+                response = self.client.get(reverse(f"async-{prefix}-list"), {"page_size": 2})
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                self.assertEqual(data["results"], expected["results"])
+                self.assertEqual(data["count"], expected["count"])
+                self.assertEqual(bool(data["next"]), bool(expected["next"]))
+
+                pk = expected["results"][0]["id"]
+                detail = self.client.get(reverse(f"async-{prefix}-detail", args=[pk])).json()
+                self.assertEqual(detail, self.client.get(reverse(f"{prefix}-detail", args=[pk])).json())
+
+    def test_next_page(self):
+        first = self.client.get(reverse("async-students-list"), {"page_size": 3}).json()
+        second = self.client.get(first["next"]).json()
+        self.assertEqual(len(first["results"]) + len(second["results"]), 4)
+        self.assertIsNone(second["next"])
+
+    def test_not_found(self):
+        for pk in ("not-a-uuid", "6f1c1b5e-0000-4000-8000-000000000000"):
+            self.assertEqual(self.client.get(reverse("async-groups-detail", args=[pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("async-rooms-list"), {"cursor": "broken"}).status_code, 404)
+
+    def test_authentication_and_permissions(self):
+        self.addCleanup(setattr, StudentViewSet, "permission_classes", StudentViewSet.permission_classes)
+        StudentViewSet.permission_classes = [IsAuthenticated]
+        token = MyTokenObtainPairSerializer.get_token(make_users(UserRoles.ADMIN, 1, start=10)[0]).access_token
+        for prefix in ("students", "async-students"):
+            with self.subTest(prefix):
+                url = reverse(f"{prefix}-list")
+                self.client.credentials()
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 401)
+                self.assertIn("Bearer", response["WWW-Authenticate"])
+
+                self.client.credentials(HTTP_AUTHORIZATION="Bearer broken")
+                self.assertEqual(self.client.get(url).status_code, 401)
+
+                self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    async def test_async_client(self):
+        response = await self.async_client.get(reverse("async-rooms-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 3)
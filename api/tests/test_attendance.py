@@ -0,0 +1,59 @@
+from uuid import uuid4
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.models import Attendance, Lesson
+from api.utils import UserRoles
+from .utils import make_users, make_groups, enroll
+
+
+class LessonAttendanceTest(TestCase):
+    """
+    Test a whole lesson's attendance is marked with one upsert
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.group = make_groups(1)[0]
+        self.students = make_users(UserRoles.STUDENT, 20)
+        enroll(self.students, [self.group])
+        self.lesson = Lesson.objects.create(group=self.group, theme="Fractions")
+        self.url = reverse("lessons-attendance", args=[self.lesson.id])
+
+    def put(self, marks):
+        return self.client.put(self.url, [{"student": str(student.id), "is_absent": is_absent}
+                                          for student, is_absent in marks], format="json")
+
+    def test_mark_and_remark(self):
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 20)
+        self.assertTrue(all(row["is_absent"] is None for row in response.data))
+
+        response = self.put([(student, i % 4 == 0) for i, student in enumerate(self.students)])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(row["is_absent"] for row in response.data), 5)
+
+        # The last one drops the absence alerts not sent yet
+        with self.assertNumQueries(7):
+            response = self.put([(student, False) for student in self.students])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Attendance.objects.filter(lesson=self.lesson).count(), 20)
+        self.assertFalse(Attendance.objects.filter(lesson=self.lesson, is_absent=True).exists())
+
+    def test_partial_roster(self):
+        self.put([(self.students[0], True)])
+        response = self.put([(self.students[1], True)])
+        marked = {row["id"]: row["is_absent"] for row in response.data}
+        self.assertTrue(marked[self.students[0].id])
+        self.assertTrue(marked[self.students[1].id])
+        self.assertIsNone(marked[self.students[2].id])
+
+    def test_students_outside_group(self):
+        outsider = make_users(UserRoles.STUDENT, 1, start=100)[0]
+        response = self.client.put(self.url, [{"student": str(outsider.id), "is_absent": True},
+                                              {"student": str(uuid4()), "is_absent": True}], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data["student"]), 2)
+        self.assertFalse(Attendance.objects.exists())
@@ -0,0 +1,71 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import ClaimsJWTAuthentication, CachedJWTAuthentication, ClaimsUser, user_cache
+from api.serializers import MyTokenObtainPairSerializer
+from api.utils import UserRoles
+from .utils import make_users
+
+
+class AuthenticationTest(TestCase):
+    """
+    Test claims and cached JWT authentication skip the user lookup and see deactivation and role changes
+    """
+
+    def setUp(self):
+        user_cache.clear()
+        self.teacher = make_users(UserRoles.TEACHER, 1)[0]
+
+    def request(self, token):
+        return APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def token(self, user):
+        return MyTokenObtainPairSerializer.get_token(user).access_token
+
+    def test_claims(self):
+        request = self.request(self.token(self.teacher))
+        with self.assertNumQueries(0):
+            user, _ = ClaimsJWTAuthentication().authenticate(request)
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual(user.id, str(self.teacher.id))
+        self.assertEqual(user.role, UserRoles.TEACHER)
+        self.assertEqual(user.email, self.teacher.email)
+        self.assertTrue(user.is_authenticated)
+
+    def test_claims_without_role_code(self):
+        request = self.request(AccessToken.for_user(self.teacher))
+        with self.assertNumQueries(1):
+            user, _ = ClaimsJWTAuthentication().authenticate(request)
+        self.assertEqual(user, self.teacher)
+
+    def test_cached(self):
+        request = self.request(self.token(self.teacher))
+        with self.assertNumQueries(1):
+            CachedJWTAuthentication().authenticate(request)
+        with self.assertNumQueries(0):
+            user, _ = CachedJWTAuthentication().authenticate(request)
+        self.assertEqual(user, self.teacher)
+
+        self.teacher.role = UserRoles.ADMIN
+        self.teacher.save()
+        user, _ = CachedJWTAuthentication().authenticate(request)
+        self.assertEqual(user.role, UserRoles.ADMIN)
+
+        self.teacher.is_active = False
+        self.teacher.save()
+        with self.assertRaises(AuthenticationFailed):
+            CachedJWTAuthentication().authenticate(request)
+
+    def test_cache_size_and_timeout(self):
+        students = make_users(UserRoles.STUDENT, 3)
+        with override_settings(USER_CACHE_SIZE=2):
+            for student in students:
+                CachedJWTAuthentication().authenticate(self.request(self.token(student)))
+            self.assertEqual(list(user_cache.entries), [str(student.id) for student in students[1:]])
+
+        user_cache.clear()
+        with override_settings(USER_CACHE_TIMEOUT=0):
+            CachedJWTAuthentication().authenticate(self.request(self.token(self.teacher)))
+        self.assertEqual(len(user_cache.entries), 0)
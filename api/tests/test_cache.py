@@ -0,0 +1,97 @@
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.cache import get_versions
+from api.models import Room, Subject, Teacher
+from api.utils import UserRoles
+from .utils import make_users, make_groups, make_rooms
+
+
+@override_settings(CACHE_SHARED=True)
+class CachedResponseTest(TestCase):
+    """
+    Test catalog responses are served from the cache until a save bumps the version they depend on
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.room = make_rooms(1)[0]
+        self.group = make_groups(1)[0]
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(context.captured_queries)
+
+    def test_hit_until_save(self):
+        url = reverse("rooms-detail", args=[self.room.id])
+        data, queries = self.get(url)
+        self.assertGreater(queries, 0)
+        self.assertEqual(self.get(url), (data, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Room.objects.get(pk=self.room.pk).save()
+        _, queries = self.get(url)
+        self.assertGreater(queries, 0)
+
+    def test_related_changes_invalidate_groups(self):
+        url = reverse("groups-list") + "?expand=subject"
+        self.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            subject = Subject.objects.get(pk=self.group.subject_id)
+            subject.name = "Renamed"
+            subject.save()
+        data, queries = self.get(url)
+        self.assertGreater(queries, 0)
+        self.assertEqual(data["results"][0]["subject"]["name"], "Renamed")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            student = make_users(UserRoles.STUDENT, 1)[0]
+            student.student_groups.add(self.group)
+        data, _ = self.get(url)
+        self.assertEqual(data["results"][0]["students_count"], 1)
+
+    def test_teacher_role_change_invalidates_teachers(self):
+        versions = get_versions("teacher")
+        with self.captureOnCommitCallbacks(execute=True):
+            teacher = self.group.teacher
+            teacher.role = UserRoles.ADMIN
+            teacher.save()
+        self.assertNotEqual(get_versions("teacher"), versions)
+
+    def test_login_keeps_teachers(self):
+        teacher = Teacher.objects.get(pk=self.group.teacher_id)
+        versions = get_versions("teacher")
+        with self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, teacher)
+        self.assertEqual(get_versions("teacher"), versions)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            teacher.first_name = "Renamed"
+            teacher.save()
+        self.assertNotEqual(get_versions("teacher"), versions)
+
+    def test_password_change_drops_teachers(self):
+        teacher = Teacher.objects.get(pk=self.group.teacher_id)
+        versions = get_versions("teacher")
+        with self.captureOnCommitCallbacks(execute=True):
+            teacher.set_password("changed")
+            teacher.save()
+        # The listed teacher's updated time changed
+        self.assertNotEqual(get_versions("teacher"), versions)
+
+    def test_disabled(self):
+        url = reverse("rooms-list")
+        for disabled in ({"RESPONSE_CACHE_TIMEOUT": 0}, {"CACHE_SHARED": False}):
+            with self.subTest(**disabled), self.settings(**disabled):
+                self.get(url)
+                _, queries = self.get(url)
+                self.assertGreater(queries, 0)
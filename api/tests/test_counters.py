@@ -0,0 +1,94 @@
+from io import StringIO
+
+from django.core import serializers
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.models import Subject, Group
+from api.utils import UserRoles
+from .utils import make_users, make_subjects, make_groups
+
+
+class CounterSignalsTest(TestCase):
+    """
+    Test Subject.groups_count and Group.students_count are kept in step by signals
+    """
+
+    def setUp(self):
+        self.subject, self.other_subject = make_subjects(2)
+        self.teacher = make_users(UserRoles.TEACHER, 1)[0]
+        self.group = Group.objects.create(subject=self.subject, teacher=self.teacher, name="Group", price=100,
+                                          lesson_days="1-3-5", start_time="09:00", end_time="10:00",
+                                          start_date="2025-01-01", end_date="2025-06-01")
+        self.students = make_users(UserRoles.STUDENT, 3)
+
+    def assertCounts(self, groups_count, students_count):
+        self.subject.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.subject.groups_count, groups_count)
+        self.assertEqual(self.group.students_count, students_count)
+
+    def test_fixtures_keep_their_counts(self):
+        fixture = serializers.serialize("json", Group.objects.filter(pk=self.group.pk))
+        Group.objects.filter(pk=self.group.pk).delete()
+        Subject.objects.filter(pk=self.subject.pk).update(groups_count=7)
+        for obj in serializers.deserialize("json", fixture):
+            obj.save()
+        self.subject.refresh_from_db()
+        self.assertEqual(self.subject.groups_count, 7)
+
+    def test_drifted_count_allows_delete(self):
+        Subject.objects.filter(pk=self.subject.pk).update(groups_count=0)
+        self.group.delete()
+        self.subject.refresh_from_db()
+        self.assertEqual(self.subject.groups_count, 0)
+
+    def test_group_create_move_and_delete(self):
+        self.assertCounts(groups_count=1, students_count=0)
+
+        self.group.subject = self.other_subject
+        self.group.save()
+        self.other_subject.refresh_from_db()
+        self.assertEqual(self.other_subject.groups_count, 1)
+        self.subject.refresh_from_db()
+        self.assertEqual(self.subject.groups_count, 0)
+
+        self.group.delete()
+        self.other_subject.refresh_from_db()
+        self.assertEqual(self.other_subject.groups_count, 0)
+
+    def test_enrollment_changes(self):
+        for student in self.students:
+            student.student_groups.add(self.group)
+        self.assertCounts(groups_count=1, students_count=3)
+
+        self.students[0].student_groups.remove(self.group)
+        self.assertCounts(groups_count=1, students_count=2)
+
+        self.students[1].student_groups.clear()
+        self.assertCounts(groups_count=1, students_count=1)
+
+        self.group.user_set.add(self.students[0], self.students[1])
+        self.assertCounts(groups_count=1, students_count=3)
+
+    def test_only_active_students_are_counted(self):
+        self.group.user_set.add(*self.students)
+
+        self.students[0].is_active = False
+        self.students[0].save()
+        self.assertCounts(groups_count=1, students_count=2)
+
+        self.students[1].delete()
+        self.assertCounts(groups_count=1, students_count=1)
+
+    def test_rebuild_counters_command(self):
+        self.group.user_set.add(*self.students)
+        Subject.objects.update(groups_count=42)
+        Group.objects.update(students_count=42)
+        make_groups(5, start=10, subject=self.other_subject)
+
+        call_command("rebuild_counters", batch_size=1, stdout=StringIO())
+
+        self.assertCounts(groups_count=1, students_count=3)
+        self.other_subject.refresh_from_db()
+        self.assertEqual(self.other_subject.groups_count, 5)
@@ -0,0 +1,91 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.counters import refresh_students_count
+from api.models import Attendance, Homework, Lesson, Payment, Point
+from api.utils import UserRoles
+from .utils import make_users, make_groups, enroll
+
+
+class TeacherDashboardTest(TestCase):
+    """
+    Test the teacher dashboard aggregates revenue, attendance and points of every group in a fixed number of queries
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        today = timezone.localdate()
+        self.year, self.month = today.year, today.month
+        self.group, self.other_group = make_groups(2)
+        self.teacher = self.group.teacher
+        self.students = make_users(UserRoles.STUDENT, 4)
+        enroll(self.students, [self.group])
+        refresh_students_count([self.group.pk])
+
+        Payment.objects.create(student=self.students[0], group=self.group, year=self.year, month=self.month,
+                               amount=300000)
+        Payment.objects.create(student=self.students[1], group=self.group, year=self.year, month=self.month,
+                               amount=100000)
+
+        # Only the last two lessons count: one with everybody present, one with half of them absent
+        old, previous, last = (Lesson.objects.create(group=self.group, theme=f"Theme {i}") for i in range(3))
+        Lesson.objects.filter(pk=old.pk).update(created=timezone.now() - timedelta(days=30))
+        Attendance.objects.bulk_create(Attendance(lesson=old, student=student, is_absent=True)
+                                       for student in self.students)
+        Attendance.objects.bulk_create(Attendance(lesson=previous, student=student, is_absent=False)
+                                       for student in self.students)
+        Attendance.objects.bulk_create(Attendance(lesson=last, student=student, is_absent=index % 2 == 0)
+                                       for index, student in enumerate(self.students))
+
+        deadline = timezone.now() + timedelta(days=1)
+        self.homework = Homework.objects.create(lesson=last, description="Exercises", deadline=deadline)
+        old_homework = Homework.objects.create(lesson=old, description="Old", deadline=deadline)
+        Point.objects.bulk_create([
+            Point(student=self.students[0], homework=self.homework, amount=80),
+            Point(student=self.students[1], homework=self.homework, amount=60),
+            Point(student=self.students[0], homework=old_homework, amount=100),
+        ])
+        self.url = reverse("teachers-dashboard", args=[self.teacher.pk])
+
+    def get(self, **params):
+        response = self.client.get(self.url, {"lessons": 2, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def test_dashboard(self):
+        with self.assertNumQueries(3):
+            data = self.get()
+
+        self.assertEqual(len(data["groups"]), 2)
+        group = data["groups"][0]
+        self.assertEqual(group["id"], self.group.id)
+        self.assertEqual(group["students"], 4)
+        self.assertEqual(group["expected"], Decimal(1200000))
+        self.assertEqual(group["collected"], Decimal(400000))
+        self.assertEqual(group["debt"], Decimal(800000))
+        self.assertEqual(group["attendance_rate"], 0.75)
+        self.assertEqual(group["average_point"], 80)
+        self.assertEqual([homework["id"] for homework in group["homework"]], [self.homework.id])
+        self.assertEqual(group["homework"][0]["average_point"], 70)
+
+        empty = data["groups"][1]
+        self.assertEqual(empty["expected"], 0)
+        self.assertIsNone(empty["attendance_rate"])
+        self.assertEqual(data["total_collected"], Decimal(400000))
+
+    def test_cache(self):
+        self.get()
+        with self.assertNumQueries(1):
+            self.get()
+        with self.settings(DASHBOARD_CACHE_TIMEOUT=0), self.assertNumQueries(3):
+            self.get()
+
+    def test_invalid_query(self):
+        self.assertEqual(self.client.get(self.url, {"lessons": 0}).status_code, 400)
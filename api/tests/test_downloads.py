@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from api.models import Homework, Lesson, StoredFile
+from api.utils import UserRoles
+from .utils import make_users, make_groups, enroll, attach_parents
+
+CONTENT = b"0123456789"
+
+
+class HomeworkDownloadTest(TestCase):
+    """
+    Test homework files are downloaded by the people of the homework's group only, handed to the front server or
+    streamed with range and conditional request support
+    """
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.media = media
+        self.enterContext(override_settings(MEDIA_ROOT=media, MEDIA_ACCEL=""))
+        os.makedirs(os.path.join(media, "files"))
+        with open(os.path.join(media, "files", "abc"), "wb") as file:
+            file.write(CONTENT)
+        self.mtime = os.stat(os.path.join(media, "files", "abc")).st_mtime
+
+        self.group = make_groups(1)[0]
+        stored = StoredFile.objects.create(content_hash="abc", file="files/abc", size=len(CONTENT),
+                                           content_type="application/pdf")
+        homework = Homework.objects.create(lesson=Lesson.objects.create(group=self.group, theme="Theme"),
+                                           description="Read", deadline=timezone.now(), stored_file=stored,
+                                           file_name="task one.pdf")
+        self.url = reverse("homework-detail", args=[homework.pk]) + "download/"
+        self.student, self.other_student = make_users(UserRoles.STUDENT, 2)
+        enroll([self.student], [self.group])
+        self.parent = make_users(UserRoles.PARENT, 1)[0]
+        attach_parents([self.parent], [self.student])
+        self.client = APIClient()
+
+    def get(self, user=None, **headers):
+        self.client.force_authenticate(user or self.student)
+        return self.client.get(self.url, **headers)
+
+    def test_access(self):
+        other_teacher = make_users(UserRoles.TEACHER, 1, start=1)[0]
+        admin = make_users(UserRoles.ADMIN, 1)[0]
+        for user in (self.student, self.parent, self.group.teacher, admin):
+            with self.subTest(role=user.role):
+                self.assertEqual(self.get(user).status_code, 200)
+        for user in (self.other_student, other_teacher):
+            with self.subTest(role=user.role):
+                self.assertEqual(self.get(user).status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_stream(self):
+        response = self.get()
+        self.assertEqual(b"".join(response.streaming_content), CONTENT)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertEqual(response["Content-Disposition"], "attachment; filename*=UTF-8''task%20one.pdf")
+        self.assertEqual(response["ETag"], '"abc"')
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    def test_ranges(self):
+        response = self.get(HTTP_RANGE="bytes=2-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), b"2345")
+        self.assertEqual((response["Content-Range"], response["Content-Length"]), ("bytes 2-5/10", "4"))
+
+        self.assertEqual(b"".join(self.get(HTTP_RANGE="bytes=-3").streaming_content), b"789")
+        self.assertEqual(b"".join(self.get(HTTP_RANGE="bytes=8-").streaming_content), b"89")
+        self.assertEqual(self.get(HTTP_RANGE="bytes=0-1,4-5").status_code, 200)
+        response = self.get(HTTP_RANGE="bytes=20-")
+        self.assertEqual((response.status_code, response["Content-Range"]), (416, "bytes */10"))
+
+    def test_conditional(self):
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"abc"').status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=http_date(self.mtime)).status_code, 304)
+        earlier = http_date(self.mtime - timedelta(days=1).total_seconds())
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=earlier).status_code, 200)
+
+    def test_offloaded(self):
+        with self.settings(MEDIA_ACCEL="x-accel-redirect"):
+            response = self.get()
+        self.assertEqual(response["X-Accel-Redirect"], "/media/files/abc")
+        self.assertEqual(response.content, b"")
+        with self.settings(MEDIA_ACCEL="x-sendfile"):
+            response = self.get()
+        self.assertEqual(response["X-Sendfile"], os.path.join(self.media, "files", "abc"))
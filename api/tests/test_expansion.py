@@ -0,0 +1,72 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.utils import UserRoles
+from .utils import make_users, make_groups, enroll, attach_parents
+
+
+class ExpansionTest(TestCase):
+    """
+    Test relations render as ids unless expanded and ?fields= trims responses down to the requested fields
+    """
+
+    def setUp(self):
+        self.enterContext(self.settings(RESPONSE_CACHE_TIMEOUT=0))
+        self.client = APIClient()
+        self.groups = make_groups(2)
+        self.students = make_users(UserRoles.STUDENT, 3)
+        enroll(self.students, self.groups)
+        self.parent = make_users(UserRoles.PARENT, 1)[0]
+        attach_parents([self.parent], self.students)
+        self.url = reverse("students-detail", args=[self.students[0].id])
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(context.captured_queries)
+
+    def test_ids_by_default(self):
+        data, _ = self.get(self.url)
+        self.assertCountEqual(data["student_groups"], [str(group.id) for group in self.groups])
+        self.assertEqual(len(data["student_parents"]), 1)
+        self.assertIn("is_preferential", data)
+
+    def test_fields(self):
+        data, queries = self.get(self.url, fields="id,first_name")
+        self.assertEqual(data, {"id": str(self.students[0].id), "first_name": self.students[0].first_name})
+        # Relations left out are not read at all
+        self.assertLess(queries, self.get(self.url)[1])
+
+    def test_dotted_paths(self):
+        data, _ = self.get(self.url, expand="student_groups.subject",
+                           fields="id,student_groups.name,student_groups.subject")
+        self.assertEqual(set(data), {"id", "student_groups"})
+        group = data["student_groups"][0]
+        self.assertEqual(set(group), {"name", "subject"})
+        self.assertIn(group["subject"]["id"], {str(group.subject_id) for group in self.groups})
+
+        # Relations unknown to a serializer are ignored
+        data, _ = self.get(self.url, expand="missing,student_groups.missing")
+        self.assertIsInstance(data["student_groups"][0], dict)
+
+    def test_nested_lists_read_up_front(self):
+        list_url = reverse("parents-list")
+        expand = "students.student_groups.subject,students.student_groups.teacher"
+        data, queries = self.get(list_url, expand=expand)
+        self.assertEqual(data["results"][0]["students"][0]["student_groups"][0]["teacher"]["role"],
+                         UserRoles.TEACHER)
+
+        more = make_users(UserRoles.STUDENT, 5, start=10)
+        enroll(more, self.groups)
+        attach_parents(make_users(UserRoles.PARENT, 5, start=10), more)
+        self.assertEqual(self.get(list_url, expand=expand)[1], queries)
+
+    def test_async_parity(self):
+        params = {"expand": "student_groups.subject,student_parents", "fields": "id,student_groups,student_parents"}
+        expected, _ = self.get(reverse("students-list"), **params)
+        data, _ = self.get(reverse("async-students-list"), **params)
+        self.assertEqual(data["results"], expected["results"])
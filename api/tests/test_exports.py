@@ -0,0 +1,74 @@
+import csv
+import io
+import zipfile
+
+from django.http import StreamingHttpResponse
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.models import Payment, Expense, Lesson, Attendance
+from api.utils import UserRoles
+from .utils import make_users, make_groups, enroll
+
+
+class ExportTest(TestCase):
+    """
+    Test exports stream CSV and XLSX files built from denormalized columns
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.group = make_groups(1)[0]
+        self.other_group = make_groups(1, start=1)[0]
+        self.students = make_users(UserRoles.STUDENT, 3)
+        enroll(self.students, [self.group])
+        Payment.objects.bulk_create(
+            Payment(student=student, group=group, student_name=student.full_name, group_name=group.name,
+                    year=2025, month=1, amount=300000, description='Cash, "January"')
+            for student in self.students for group in (self.group, self.other_group)
+        )
+        Expense.objects.create(assigned_by=self.students[0], assigned_to=self.students[1], amount=1000)
+        lesson = Lesson.objects.create(group=self.group, theme="Fractions")
+        Attendance.objects.bulk_create(Attendance(student_id=student.id, lesson=lesson, is_absent=False)
+                                       for student in self.students)
+
+    def get(self, name, **params):
+        response = self.client.get(reverse(f"exports-{name}"), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return b"".join(response.streaming_content)
+
+    def read_csv(self, name, **params):
+        return list(csv.reader(io.StringIO(self.get(name, **params).decode("utf-8-sig"))))
+
+    def test_payments_csv(self):
+        rows = self.read_csv("payments", group=self.group.id)
+        self.assertEqual(rows[0], ["Created", "Year", "Month", "Student", "Group", "Amount", "Description"])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][4], self.group.name)
+        self.assertEqual(rows[1][6], 'Cash, "January"')
+
+        self.assertEqual(len(self.read_csv("payments", date_from="2100-01-01")), 1)
+
+    def test_other_exports(self):
+        self.assertEqual(len(self.read_csv("expenses")), 2)
+        attendance = self.read_csv("attendance", group=self.group.id)
+        self.assertEqual(len(attendance), 4)
+        self.assertEqual(attendance[1][2], "Fractions")
+        self.assertEqual(len(self.read_csv("rosters", group=self.group.id)), 4)
+        self.assertEqual(len(self.read_csv("rosters", group=self.other_group.id)), 1)
+
+    def test_xlsx(self):
+        content = self.get("payments", file_type="xlsx")
+        with zipfile.ZipFile(io.BytesIO(content)) as workbook:
+            self.assertIsNone(workbook.testzip())
+            sheet = workbook.read("xl/worksheets/sheet1.xml").decode()
+        self.assertEqual(sheet.count("<row>"), 7)
+        self.assertIn('Cash, "January"', sheet)
+
+    def test_invalid_query(self):
+        response = self.client.get(reverse("exports-payments"), {"file_type": "pdf"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("exports-expenses"), {"group": self.group.id})
+        self.assertEqual(list(response.json()), ["group"])
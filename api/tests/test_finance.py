@@ -0,0 +1,130 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.counters import refresh_groups_count
+from api.finance import rebuild_rollups
+from api.models import Expense, FinanceRollup, Payment
+from api.payments import bulk_create_payments
+from api.utils import UserRoles
+from .utils import make_users, make_groups
+
+
+def rollups():
+    return {(rollup.year, rollup.month, rollup.group_id): (rollup.income, rollup.expenses)
+            for rollup in FinanceRollup.objects.all()}
+
+
+class FinanceRollupTest(TestCase):
+    """
+    Test finance rollups follow payment and expense changes and match a rebuild from scratch
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.group = make_groups(1)[0]
+        self.other_group = make_groups(1, start=1)[0]
+        self.students = make_users(UserRoles.STUDENT, 3)
+        self.admin = make_users(UserRoles.ADMIN, 1)[0]
+        today = timezone.localdate()
+        self.this_month = (today.year, today.month, None)
+
+    def pay(self, student, group, month, amount):
+        return Payment.objects.create(student=student, group=group, year=2025, month=month, amount=amount)
+
+    def assert_matches_rebuild(self):
+        incremental = {key: value for key, value in rollups().items() if any(value)}
+        rebuild_rollups()
+        self.assertEqual(incremental, rollups())
+
+    def test_payments_and_expenses(self):
+        first = self.pay(self.students[0], self.group, 1, 300000)
+        second = self.pay(self.students[1], self.group, 1, 200000)
+        self.pay(self.students[2], self.other_group, 2, 100000)
+        expense = Expense.objects.create(assigned_by=self.admin, assigned_to=self.students[0], amount=50000)
+        self.assertEqual(rollups()[2025, 1, self.group.id], (Decimal(500000), 0))
+        self.assertEqual(rollups()[self.this_month], (0, Decimal(50000)))
+
+        first.amount = 250000
+        first.save()
+        second = Payment.objects.only("amount").get(pk=second.pk)
+        second.month = 3
+        second.save()
+        expense.amount = 70000
+        expense.save()
+        self.assertEqual(rollups()[2025, 1, self.group.id], (Decimal(250000), 0))
+        self.assertEqual(rollups()[2025, 3, self.group.id], (Decimal(200000), 0))
+        self.assertEqual(rollups()[self.this_month], (0, Decimal(70000)))
+
+        Payment.objects.get(pk=first.pk).delete()
+        self.assertEqual(rollups()[2025, 1, self.group.id], (0, 0))
+        self.assert_matches_rebuild()
+
+    def test_bulk_payments(self):
+        self.pay(self.students[0], self.group, 1, 100000)
+        rows = [{"student_id": student.id, "group_id": self.group.id, "year": 2025, "month": month,
+                 "amount": Decimal(100000)} for student in self.students for month in (1, 2)]
+        _, errors = bulk_create_payments(rows)
+        self.assertEqual(errors, {})
+        self.assertEqual(rollups()[2025, 1, self.group.id], (Decimal(400000), 0))
+        self.assertEqual(rollups()[2025, 2, self.group.id], (Decimal(300000), 0))
+        self.assert_matches_rebuild()
+
+    def test_group_delete(self):
+        self.pay(self.students[0], self.other_group, 1, 100000)
+        # make_groups skips the signals that count the subject's groups
+        refresh_groups_count([self.other_group.subject_id])
+        self.other_group.delete()
+        self.assertEqual(rollups()[2025, 1, None], (Decimal(100000), 0))
+        self.assert_matches_rebuild()
+
+    def test_payment_without_group(self):
+        payment = self.pay(self.students[0], self.other_group, 1, 100)
+        refresh_groups_count([self.other_group.subject_id])
+        self.other_group.delete()
+
+        payment = Payment.objects.get(pk=payment.pk)
+        payment.description = "Cash"
+        payment.save()
+        self.assertEqual(rollups()[2025, 1, None], (Decimal(100), 0))
+        payment.amount = 150
+        payment.save()
+        self.assertEqual(rollups()[2025, 1, None], (Decimal(150), 0))
+        self.assert_matches_rebuild()
+
+    def test_report(self):
+        self.pay(self.students[0], self.group, 1, 300000)
+        self.pay(self.students[1], self.other_group, 1, 100000)
+        self.pay(self.students[2], self.group, 12, 200000)
+        Payment.objects.create(student=self.students[2], group=self.group, year=2024, month=12, amount=900000)
+        FinanceRollup.objects.create(year=2025, month=1, expenses=150000)
+
+        url = reverse("finance-report-list")
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"start": "2025-01", "end": "2025-12"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row["year"], row["month"], row["net"]) for row in response.data["results"]],
+                         [(2025, 1, Decimal(250000)), (2025, 12, Decimal(200000))])
+        self.assertEqual(response.data["total_income"], Decimal(600000))
+
+        by_teacher = self.client.get(url, {"start": "2025-01", "end": "2025-12", "by": "teacher"}).data["results"]
+        self.assertEqual(len(by_teacher), 3)
+        by_group = {row["id"]: row for row in
+                    self.client.get(url, {"start": "2025-01", "end": "2025-12", "by": "group"}).data["results"]}
+        self.assertEqual(by_group[self.group.id]["income"], Decimal(500000))
+        self.assertEqual(by_group[None]["expenses"], Decimal(150000))
+
+        self.assertEqual(self.client.get(url, {"start": "2025-12", "end": "2025-01"}).status_code, 400)
+
+    def test_command(self):
+        self.pay(self.students[0], self.group, 1, 300000)
+        FinanceRollup.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_finance_rollups", stdout=out)
+        self.assertIn("Rebuilt 1", out.getvalue())
+        self.assertEqual(rollups(), {(2025, 1, self.group.id): (Decimal(300000), 0)})
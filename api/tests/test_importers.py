@@ -0,0 +1,123 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.hashers import check_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.importers import POOL_THRESHOLD, import_students, hash_passwords
+from api.models import Student
+from api.utils import UserRoles
+from jobs.models import Job
+from jobs.queue import Worker
+from .utils import make_users, make_groups
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class StudentImportTest(TestCase):
+    """
+    Test bulk student import validates every row up front and links groups and parents in bulk
+    """
+
+    def setUp(self):
+        self.groups = make_groups(2)
+        self.parent = make_users(UserRoles.PARENT, 1)[0]
+
+    def rows(self, count, start=0):
+        return [
+            {"email": f"imported{i}@example.com", "first_name": f"Imported{i}", "last_name": "Doe",
+             "middle_name": "Black", "phone_number": "+998996937308", "password": f"password{i}",
+             "student_groups": [str(group.id) for group in self.groups],
+             "student_parents": [str(self.parent.id)]}
+            for i in range(start, start + count)
+        ]
+
+    def count_queries(self, rows):
+        with CaptureQueriesContext(connection) as context:
+            students, errors = import_students(rows, processes=2)
+        self.assertEqual(errors, {})
+        # INSERTs are batched by the backend's parameter limit, everything else must not depend on the row count
+        return students, len([query for query in context.captured_queries if not query["sql"].startswith("INSERT")])
+
+    def test_import(self):
+        _, queries = self.count_queries(self.rows(5, start=1000))
+        students, bulk_queries = self.count_queries(self.rows(200))
+        self.assertEqual(bulk_queries, queries)
+        self.assertEqual(len(students), 200)
+
+        student = Student.objects.get(email="imported7@example.com")
+        self.assertTrue(student.check_password("password7"))
+        self.assertEqual(student.student_groups.count(), 2)
+        self.assertEqual(self.parent.parent_students.count(), 205)
+        self.groups[0].refresh_from_db()
+        self.assertEqual(self.groups[0].students_count, 205)
+
+    def test_errors_per_row(self):
+        make_users(UserRoles.STUDENT, 1)
+        rows = self.rows(4)
+        rows[0]["email"] = "student0@example.com"
+        rows[1]["email"] = "not an email"
+        rows[2]["student_groups"].append("6f1c1b5e-0000-4000-8000-000000000000")
+        rows[3]["first_name"] = rows[0]["first_name"]
+
+        students, errors = import_students(rows)
+        self.assertEqual(students, [])
+        self.assertEqual(sorted(errors), [0, 1, 2, 3])
+        self.assertIn("student_groups", errors[2])
+        self.assertIn("first_name", errors[3])
+        self.assertFalse(Student.objects.filter(email__startswith="imported").exists())
+
+    def test_hash_passwords_keeps_order(self):
+        hashes = hash_passwords([f"password{i}" for i in range(60)], processes=3)
+        self.assertEqual(len(hashes), 60)
+        self.assertTrue(all(check_password(f"password{i}", hashed) for i, hashed in enumerate(hashes)))
+
+    def test_csv_endpoint(self):
+        header = "email,first_name,last_name,middle_name,phone_number,password,student_groups,student_parents\n"
+        groups = ";".join(str(group.id) for group in self.groups)
+        content = header + "".join(
+            f"csv{i}@example.com,Csv{i},Doe,Black,+998996937308,password,{groups},{self.parent.id}\n"
+            for i in range(3)
+        )
+        upload = SimpleUploadedFile("students.csv", content.encode(), content_type="text/csv")
+        response = APIClient().post(reverse("students-import-students"), {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data["created"], 3)
+        self.assertEqual(Student.objects.get(email="csv1@example.com").student_groups.count(), 2)
+
+    def test_large_import_queued(self):
+        client = APIClient()
+        url = reverse("students-import-students")
+        rows = self.rows(POOL_THRESHOLD)
+        rows[3]["email"] = "not an email"
+        self.assertEqual(list(client.post(url, rows, format="json").data["errors"]), [3])
+
+        rows = self.rows(POOL_THRESHOLD)
+        response = client.post(url, rows, format="json")
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertFalse(Student.objects.filter(email__startswith="imported").exists())
+        self.assertEqual(client.get(response.data["status"]).data["status"], "queued")
+        self.assertNotIn("password1", json.dumps(Job.objects.get().args))
+
+        with self.settings(JOBS_SCHEDULE={}):
+            Worker(name="worker").run_next()
+        status = client.get(response.data["status"]).data
+        self.assertEqual((status["status"], status["result"]), ("done", {"created": POOL_THRESHOLD}))
+        self.assertEqual(Student.objects.filter(email__startswith="imported").count(), POOL_THRESHOLD)
+        self.assertTrue(Student.objects.get(email="imported1@example.com").check_password("password1"))
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as file:
+            file.write(str(self.rows(2)).replace("'", '"'))
+            file.flush()
+            call_command("import_students", file.name, stdout=StringIO())
+            with self.assertRaises(CommandError):
+                call_command("import_students", file.name, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(Student.objects.filter(email__startswith="imported").count(), 2)
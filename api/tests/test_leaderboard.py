@@ -0,0 +1,113 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.counters import refresh_groups_count
+from api.leaderboard import rebuild_leaderboard, student_rank, top_students
+from api.models import Homework, LeaderboardEntry, Lesson, Point
+from api.utils import UserRoles
+from .utils import make_users, make_groups
+
+
+def entries():
+    return {(entry.student_id, entry.group_id): (entry.points, entry.homeworks)
+            for entry in LeaderboardEntry.objects.all()}
+
+
+@override_settings(CACHE_SHARED=True)
+class LeaderboardTest(TestCase):
+    """
+    Test leaderboard entries follow point changes, match a rebuild from scratch and serve ranks from the cache
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.group, self.other_group = make_groups(2)
+        self.students = make_users(UserRoles.STUDENT, 3)
+        deadline = timezone.now() + timedelta(days=1)
+        self.homework, self.other_homework = (
+            Homework.objects.create(lesson=Lesson.objects.create(group=group, theme="Theme"), description="Task",
+                                    deadline=deadline)
+            for group in (self.group, self.other_group)
+        )
+
+    def point(self, student, amount, homework=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Point.objects.create(student=student, homework=homework or self.homework, amount=amount)
+
+    def assert_matches_rebuild(self):
+        incremental = {key: value for key, value in entries().items() if any(value)}
+        rebuild_leaderboard()
+        self.assertEqual(incremental, entries())
+
+    def test_points_follow_changes(self):
+        first = self.point(self.students[0], 80)
+        self.point(self.students[0], 50, self.other_homework)
+        self.point(self.students[1], 90)
+        self.assertEqual(entries()[self.students[0].id, self.group.id], (80, 1))
+        self.assertEqual(entries()[self.students[0].id, None], (130, 2))
+
+        first.amount = 100
+        first.save()
+        self.assertEqual(entries()[self.students[0].id, None], (150, 2))
+        first = Point.objects.only("amount").get(pk=first.pk)
+        first.homework = self.other_homework
+        first.save()
+        self.assertEqual(entries()[self.students[0].id, self.group.id], (0, 0))
+        self.assertEqual(entries()[self.students[0].id, self.other_group.id], (150, 2))
+
+        Point.objects.get(pk=first.pk).delete()
+        self.assertEqual(entries()[self.students[0].id, None], (50, 1))
+        self.assert_matches_rebuild()
+
+    def test_group_delete(self):
+        self.point(self.students[0], 80)
+        self.point(self.students[0], 50, self.other_homework)
+        # make_groups skips the signals that count the subject's groups
+        refresh_groups_count([self.group.subject_id])
+        self.group.delete()
+        self.assertEqual(entries(), {(self.students[0].id, self.other_group.id): (50, 1),
+                                     (self.students[0].id, None): (50, 1)})
+
+    def test_ranks(self):
+        self.point(self.students[0], 70)
+        self.point(self.students[1], 90)
+        self.point(self.students[2], 70)
+
+        with self.assertNumQueries(1):
+            top = top_students(self.group.id, limit=2)
+        # Students with as many points share a rank and are listed by id
+        tied = min(self.students[0].id, self.students[2].id)
+        self.assertEqual([(row["student_id"], row["rank"]) for row in top], [(self.students[1].id, 1), (tied, 2)])
+        with self.assertNumQueries(0):
+            self.assertEqual(top_students(self.group.id, limit=2), top)
+
+        rank = student_rank(self.students[2].id, self.group.id)
+        self.assertEqual((rank["rank"], rank["total"]), (2, 3))
+        self.assertIsNone(student_rank(self.students[2].id, self.other_group.id))
+
+        self.point(self.students[2], 40, self.other_homework)
+        self.assertEqual(student_rank(self.students[2].id)["rank"], 1)
+        self.assertEqual(top_students()[0]["points"], 110)
+
+    def test_endpoints_and_command(self):
+        self.point(self.students[0], 70)
+        client = APIClient()
+        response = client.get(reverse("leaderboard-list"), {"group": self.group.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["points"], 70)
+        url = reverse("leaderboard-rank")
+        self.assertEqual(client.get(url, {"student": self.students[0].id}).data["rank"], 1)
+        self.assertEqual(client.get(url, {"student": self.students[1].id}).status_code, 404)
+        self.assertEqual(client.get(url).status_code, 400)
+
+        LeaderboardEntry.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_leaderboard", stdout=out)
+        self.assertIn("Rebuilt 2", out.getvalue())
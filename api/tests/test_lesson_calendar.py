@@ -0,0 +1,111 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.lesson_calendar import generate_lessons, holidays, lesson_dates
+from api.models import Homework, Lesson
+from api.utils import LessonDays
+from .utils import make_groups, make_rooms
+
+
+class LessonDatesTest(TestCase):
+    """
+    Test lesson days expand into dates without holidays
+    """
+
+    def test_dates(self):
+        # 2025-03-03 is a Monday
+        dates = lesson_dates(LessonDays.ODD, date(2025, 3, 3), date(2025, 3, 14))
+        self.assertEqual([day.day for day in dates], [3, 5, 7, 10, 12, 14])
+        dates = lesson_dates(LessonDays.EVEN, date(2025, 3, 5), date(2025, 3, 11))
+        self.assertEqual([day.day for day in dates], [6, 8, 11])
+
+    @override_settings(LESSON_HOLIDAYS=["2025-03-05", "03-10"])
+    def test_holidays(self):
+        dates = lesson_dates(LessonDays.ODD, date(2025, 3, 3), date(2025, 3, 14), holidays())
+        self.assertEqual([day.day for day in dates], [3, 7, 12, 14])
+
+    @override_settings(LESSON_HOLIDAYS=["March 8"])
+    def test_invalid_holidays(self):
+        with self.assertRaises(ImproperlyConfigured):
+            holidays()
+
+
+class GenerateLessonsTest(TestCase):
+    """
+    Test lesson calendars are generated for many groups at once and regenerated from today when a schedule changes
+    """
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.monday = self.today - timedelta(days=self.today.weekday())
+        self.room, self.other_room = make_rooms(2)
+        self.group = make_groups(1, room=self.room, start_date=self.monday - timedelta(days=7),
+                                 end_date=self.monday + timedelta(days=27))[0]
+
+    def dates(self, group=None):
+        return sorted(Lesson.objects.filter(group=group or self.group).values_list("date", flat=True))
+
+    def test_fixed_queries(self):
+        groups = make_groups(20, start=1, start_date=self.monday, end_date=self.monday + timedelta(days=90))
+        with CaptureQueriesContext(connection) as context:
+            created, deleted = generate_lessons(since=self.monday)
+        # Reading the groups and their lessons and the savepoint around the inserts, however many lessons
+        queries = [query["sql"] for query in context.captured_queries if not query["sql"].startswith("INSERT")]
+        self.assertEqual(len(queries), 4, queries)
+        self.assertEqual((created, deleted), (12 + 20 * 39, 0))
+        self.assertEqual(len(self.dates(groups[-1])), 39)
+        self.assertEqual(generate_lessons(since=self.monday), (0, 0))
+
+    def test_regenerate_future_lessons(self):
+        generate_lessons(since=self.group.start_date)
+        past = Lesson.objects.filter(date__lt=self.today).count()
+        used = Lesson.objects.filter(date__gt=self.monday + timedelta(days=7)).order_by("date").first()
+        Homework.objects.create(lesson=used, description="Read", deadline=timezone.now())
+
+        self.group.lesson_days = LessonDays.EVEN
+        self.group.save()
+        dates = self.dates()
+        self.assertEqual(Lesson.objects.filter(date__lt=self.today).count(), past)
+        self.assertIn(used.date, dates)
+        self.assertTrue(all(day.weekday() in (1, 3, 5) for day in dates if day >= self.today and day != used.date))
+
+        self.group.room = self.other_room
+        self.group.save()
+        rooms = set(Lesson.objects.filter(date__gte=self.today).values_list("room_id", flat=True))
+        self.assertEqual(rooms, {self.other_room.id})
+        self.assertEqual(set(Lesson.objects.filter(date__lt=self.today).values_list("room_id", flat=True)),
+                         {self.room.id})
+
+    def test_shortened_term(self):
+        generate_lessons(since=self.group.start_date)
+        self.assertTrue(Lesson.objects.filter(date__gte=self.today).exists())
+
+        self.group.end_date = self.today - timedelta(days=1)
+        self.group.save()
+        self.assertFalse(Lesson.objects.filter(date__gte=self.today).exists())
+        self.assertTrue(Lesson.objects.filter(date__lt=self.today).exists())
+
+    def test_untouched_without_calendar(self):
+        self.group.lesson_days = LessonDays.EVEN
+        self.group.save()
+        self.assertEqual(self.dates(), [])
+
+    def test_action_and_command(self):
+        url = reverse("groups-generate-lessons", args=[self.group.pk])
+        response = APIClient().post(url, {"since": str(self.monday)}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data, {"created": 12, "deleted": 0})
+
+        out = StringIO()
+        call_command("generate_lessons", "--group", str(self.group.pk), "--since", str(self.group.start_date),
+                     stdout=out)
+        self.assertIn("Created 3 lessons and deleted 0", out.getvalue())
@@ -0,0 +1,56 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from api.counters import refresh_students_count
+from api.lifecycle import update_group_states
+from api.models import Group
+from api.utils import UserRoles
+from .utils import make_users, make_groups, enroll
+
+
+class GroupLifecycleTest(TestCase):
+    """
+    Test the lifecycle job activates started groups, deactivates finished ones and detaches their students in
+    batches
+    """
+
+    def setUp(self):
+        today = timezone.localdate()
+        self.started = make_groups(3, start=0, start_date=today - timedelta(days=10))
+        self.finished = make_groups(3, start=3, start_date=today - timedelta(days=100),
+                                    end_date=today - timedelta(days=1), is_active=True)
+        self.upcoming = make_groups(1, start=6, start_date=today + timedelta(days=5), is_active=True)
+        self.students = make_users(UserRoles.STUDENT, 2)
+        enroll(self.students, self.started[:1] + self.finished)
+        refresh_students_count([group.pk for group in self.started + self.finished])
+
+    def active_names(self):
+        return set(Group.objects.filter(is_active=True).values_list("name", flat=True))
+
+    def test_update_in_batches(self):
+        # 3 groups to activate take two batches, 4 to deactivate take two and an empty one
+        with self.assertNumQueries(5):
+            changes = update_group_states(batch_size=2)
+        self.assertEqual(changes, {"activated": 3, "deactivated": 4, "detached": 0})
+        self.assertEqual(self.active_names(), {"Group 0", "Group 1", "Group 2"})
+        self.assertEqual(update_group_states(), {"activated": 0, "deactivated": 0, "detached": 0})
+
+    def test_detach_students(self):
+        changes = update_group_states(detach_students=True, batch_size=4)
+        self.assertEqual(changes["detached"], 6)
+        self.assertEqual(list(self.students[0].student_groups.all()), self.started[:1])
+        self.assertEqual(set(Group.objects.filter(students_count__gt=0).values_list("pk", flat=True)),
+                         {self.started[0].pk})
+
+    def test_command(self):
+        out = StringIO()
+        call_command("update_group_states", "--dry-run", "--detach-students", stdout=out)
+        self.assertIn("Would activate 3 groups, deactivate 4 groups and detach 6 students", out.getvalue())
+        self.assertEqual(self.active_names(), {"Group 3", "Group 4", "Group 5", "Group 6"})
+
+        call_command("update_group_states", stdout=out)
+        self.assertIn("Activated 3 groups, deactivated 4 groups and detached 0 students", out.getvalue())
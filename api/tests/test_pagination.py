@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import User
+from api.utils import UserRoles
+from .utils import make_users, make_rooms
+
+
+class KeysetPaginationTest(TestCase):
+    """
+    Test keyset pagination walks every row exactly once in both directions
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.teachers = make_users(UserRoles.TEACHER, 25)
+        # Ties on `created` must be broken by `id`
+        User.objects.filter(pk__in=[teacher.pk for teacher in self.teachers[:10]]).update(created=timezone.now())
+        self.expected = list(User.objects.filter(role=UserRoles.TEACHER).order_by("-created", "-id")
+                             .values_list("id", flat=True))
+
+    def walk(self, url, direction):
+        ids = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row["id"] for row in response.json()["results"])
+            url = response.json()[direction]
+            pages += 1
+        return ids, pages
+
+    def test_forward_and_backward(self):
+        ids, pages = self.walk(reverse("teachers-list") + "?page_size=4", "next")
+        self.assertEqual(pages, 7)
+        self.assertEqual(ids, [str(pk) for pk in self.expected])
+
+        last_page = self.client.get(reverse("teachers-list") + "?page_size=4")
+        while last_page.json()["next"]:
+            last_page = self.client.get(last_page.json()["next"])
+
+        backward = []
+        url = last_page.json()["previous"]
+        while url:
+            response = self.client.get(url)
+            backward = [row["id"] for row in response.json()["results"]] + backward
+            url = response.json()["previous"]
+        self.assertEqual(backward, [str(pk) for pk in self.expected[:24]])
+
+    def test_count_and_page_size(self):
+        response = self.client.get(reverse("teachers-list") + "?page_size=10")
+        self.assertEqual(response.json()["count"], 25)
+        self.assertFalse(response.json()["count_is_estimate"])
+        self.assertEqual(len(response.json()["results"]), 10)
+        self.assertIsNone(response.json()["previous"])
+
+    def test_viewset_ordering(self):
+        make_rooms(5)
+        ids, _ = self.walk(reverse("rooms-list") + "?page_size=2", "next")
+        numbers = [self.client.get(reverse("rooms-detail", args=[pk])).json()["number"] for pk in ids]
+        self.assertEqual(numbers, [0, 1, 2, 3, 4])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("teachers-list") + "?cursor=garbage")
+        self.assertEqual(response.status_code, 404)
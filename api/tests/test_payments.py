@@ -0,0 +1,88 @@
+from uuid import uuid4
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.models import Payment, Expense
+from api.utils import UserRoles
+from .utils import make_users, make_groups
+
+
+class PaymentSnapshotTest(TestCase):
+    """
+    Test payment and expense names are snapshotted within the INSERT itself
+    """
+
+    def setUp(self):
+        self.group = make_groups(1)[0]
+        self.student = make_users(UserRoles.STUDENT, 1)[0]
+        self.admin = make_users(UserRoles.ADMIN, 1)[0]
+
+    def table_queries(self, context, table):
+        return [query["sql"] for query in context.captured_queries if f'"{table}"' in query["sql"]]
+
+    def test_payment_single_insert(self):
+        with CaptureQueriesContext(connection) as context:
+            payment = Payment.objects.create(student=self.student, group=self.group, year=2025, month=1,
+                                             amount=300000)
+        # The finance rollup is maintained separately
+        self.assertEqual(len(self.table_queries(context, "api_payment")), 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.student_name, self.student.full_name)
+        self.assertEqual(payment.group_name, self.group.name)
+
+    def test_expense_single_insert(self):
+        with CaptureQueriesContext(connection) as context:
+            expense = Expense.objects.create(assigned_by=self.admin, assigned_to=self.student, amount=1000)
+        self.assertEqual(len(self.table_queries(context, "api_expense")), 1)
+        expense.refresh_from_db()
+        self.assertEqual(expense.assigned_by_name, self.admin.full_name)
+        self.assertEqual(expense.assigned_to_name, self.student.full_name)
+
+
+class PaymentBulkTest(TestCase):
+    """
+    Test bulk payment ingestion fills snapshot names with a constant number of queries
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.groups = make_groups(2)
+        self.students = make_users(UserRoles.STUDENT, 50)
+        self.url = reverse("payments-bulk")
+
+    def rows(self, count):
+        return [
+            {"student": str(self.students[i % 50].id), "group": str(self.groups[i % 2].id), "year": 2025,
+             "month": i % 12 + 1, "amount": "300000.00"}
+            for i in range(count)
+        ]
+
+    def post(self, rows):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, rows, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], len(rows))
+        # INSERTs are batched by the backend's parameter limit and finance rollups are only updated once they
+        # exist, everything else must not depend on the row count
+        return [query["sql"] for query in context.captured_queries
+                if not query["sql"].startswith(("INSERT", 'UPDATE "api_financerollup"'))]
+
+    def test_constant_queries(self):
+        self.assertEqual(len(self.post(self.rows(10))), len(self.post(self.rows(2500))))
+
+        self.assertEqual(Payment.objects.filter(student_name__isnull=True).count(), 0)
+        payment = Payment.objects.filter(student=self.students[3]).first()
+        self.assertEqual(payment.student_name, self.students[3].full_name)
+        self.assertEqual(payment.group_name, self.groups[1].name)
+
+    def test_unknown_ids(self):
+        rows = self.rows(3)
+        rows[1]["group"] = str(uuid4())
+        response = self.client.post(self.url, rows, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data["errors"]), [1])
+        self.assertFalse(Payment.objects.exists())
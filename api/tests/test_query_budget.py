@@ -0,0 +1,276 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.finance import add_payments
+from api.models import Subject, Group, Room, Payment, Lesson
+from api.schedule import get_schedule
+from api.utils import UserRoles
+from .utils import make_users, make_subjects, make_groups, make_rooms, enroll, attach_parents
+
+
+class QueryBudgetMixin:
+    """
+    Seeds an endpoint with a growing number of rows and asserts that the number of SQL queries spent on
+    list/retrieve/create/update does not grow with it, so any N+1 in the serializers fails the build.
+    The response cache is disabled, it would only hide the queries
+    """
+
+    sizes = (10, 100, 1000)
+    basename = None
+    # Query parameters of list and retrieve, e.g. relations to expand
+    params = {}
+
+    def setUp(self):
+        self.enterContext(self.settings(RESPONSE_CACHE_TIMEOUT=0))
+        self.client = APIClient()
+        self.seeded = 0
+        self.created = 0
+
+    def seed(self, count):
+        """
+        Create `count` more rows for the endpoint, numbered from `self.seeded`
+        """
+        raise NotImplementedError
+
+    def get_object_id(self):
+        """
+        Id of an object to retrieve and update
+        """
+        raise NotImplementedError
+
+    def create_payload(self, n):
+        raise NotImplementedError
+
+    def update_payload(self):
+        raise NotImplementedError
+
+    def count_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data=data, format="json")
+        self.assertLess(response.status_code, 300, msg=f"{method.upper()} {url}: {response.content[:500]}")
+        return len(context.captured_queries)
+
+    def measure(self):
+        list_url = reverse(f"{self.basename}-list")
+        detail_url = reverse(f"{self.basename}-detail", args=[self.get_object_id()])
+        self.created += 1
+        return {
+            "list": self.count_queries("get", list_url, self.params),
+            "retrieve": self.count_queries("get", detail_url, self.params),
+            "create": self.count_queries("post", list_url, self.create_payload(self.created)),
+            "update": self.count_queries("patch", detail_url, self.update_payload()),
+        }
+
+    def test_query_count_is_constant(self):
+        budgets = {}
+        for size in self.sizes:
+            self.seed(size - self.seeded)
+            self.seeded = size
+            budgets[size] = self.measure()
+
+        baseline = budgets[self.sizes[0]]
+        for size, budget in budgets.items():
+            with self.subTest(size=size):
+                self.assertEqual(budget, baseline, msg=f"Query count grows with data on /{self.basename}/")
+
+
+class UserQueryBudgetMixin(QueryBudgetMixin):
+    role = None
+
+    def seed(self, count):
+        self.users = make_users(self.role, count, start=self.seeded)
+
+    def get_object_id(self):
+        return self.users[0].id
+
+    def create_payload(self, n):
+        return {
+            "email": f"new-{self.role}{n}@example.com",
+            "first_name": f"New{n}",
+            "last_name": "Doe",
+            "middle_name": "Black",
+            "phone_number": "+998996937308",
+            "password": "password",
+        }
+
+    def update_payload(self):
+        return {"last_name": "Smith"}
+
+
+class SuperuserQueryBudgetTest(UserQueryBudgetMixin, TestCase):
+    basename = "superusers"
+    role = UserRoles.SUPERUSER
+
+
+class AdminQueryBudgetTest(UserQueryBudgetMixin, TestCase):
+    basename = "admins"
+    role = UserRoles.ADMIN
+
+
+class TeacherQueryBudgetTest(UserQueryBudgetMixin, TestCase):
+    basename = "teachers"
+    role = UserRoles.TEACHER
+
+
+class StudentQueryBudgetTest(UserQueryBudgetMixin, TestCase):
+    basename = "students"
+    role = UserRoles.STUDENT
+    params = {"expand": "student_groups.subject,student_groups.teacher,student_groups.room,student_parents"}
+
+    def setUp(self):
+        super().setUp()
+        self.groups = make_groups(2)
+        self.parent = make_users(UserRoles.PARENT, 1)[0]
+
+    def seed(self, count):
+        super().seed(count)
+        enroll(self.users, self.groups)
+        attach_parents([self.parent], self.users)
+
+    def create_payload(self, n):
+        return {
+            **super().create_payload(n),
+            "student_groups": [group.id for group in self.groups],
+            "student_parents": [self.parent.id],
+        }
+
+
+class ParentQueryBudgetTest(UserQueryBudgetMixin, TestCase):
+    basename = "parents"
+    role = UserRoles.PARENT
+    params = {"expand": "students.student_groups.subject,students.student_parents"}
+
+    def setUp(self):
+        super().setUp()
+        self.groups = make_groups(2)
+
+    def seed(self, count):
+        super().seed(count)
+        students = make_users(UserRoles.STUDENT, count * 2, start=self.seeded * 2)
+        enroll(students, self.groups)
+        for i, parent in enumerate(self.users):
+            attach_parents([parent], students[i * 2:i * 2 + 2])
+        self.students = students[:2]
+
+    def create_payload(self, n):
+        return {**super().create_payload(n), "students": [student.id for student in self.students]}
+
+
+class GroupQueryBudgetTest(QueryBudgetMixin, TestCase):
+    basename = "groups"
+
+    def setUp(self):
+        super().setUp()
+        self.subject = make_subjects(1, start=10000)[0]
+        self.teacher = make_users(UserRoles.TEACHER, 1, start=10000)[0]
+        # Build the schedule index up front, it is only rebuilt after a committed save bumps the versions
+        get_schedule()
+
+    def seed(self, count):
+        # A teacher per group, groups of one teacher must not overlap in time
+        teachers = make_users(UserRoles.TEACHER, count, start=self.seeded)
+        for i, teacher in enumerate(teachers, start=self.seeded):
+            make_groups(1, start=i, subject=self.subject, teacher=teacher)
+
+    def get_object_id(self):
+        return Group.objects.order_by("name").first().id
+
+    def create_payload(self, n):
+        return {
+            "subject": self.subject.id,
+            "teacher": self.teacher.id,
+            "name": f"New group {n}",
+            "price": 300000,
+            "lesson_days": "1-3-5",
+            "start_time": f"{8 + n:02}:00",
+            "end_time": f"{8 + n:02}:45",
+            "start_date": "2025-01-01",
+            "end_date": "2025-06-01",
+        }
+
+    def update_payload(self):
+        return {"price": 350000}
+
+
+class SubjectQueryBudgetTest(QueryBudgetMixin, TestCase):
+    basename = "subjects"
+
+    def seed(self, count):
+        for i, subject in enumerate(make_subjects(count, start=self.seeded)):
+            make_groups(1, start=20000 + self.seeded + i, subject=subject)
+
+    def get_object_id(self):
+        return Subject.objects.order_by("name").first().id
+
+    def create_payload(self, n):
+        return {"name": f"New subject {n}"}
+
+    def update_payload(self):
+        return {"name": f"Renamed subject {self.created}"}
+
+
+class RoomQueryBudgetTest(QueryBudgetMixin, TestCase):
+    basename = "rooms"
+
+    def seed(self, count):
+        make_rooms(count, start=self.seeded)
+
+    def get_object_id(self):
+        return Room.objects.first().id
+
+    def create_payload(self, n):
+        return {"number": 100000 + n}
+
+    def update_payload(self):
+        return {"floor": 2}
+
+
+class PaymentQueryBudgetTest(QueryBudgetMixin, TestCase):
+    basename = "payments"
+    params = {"expand": "student.student_groups,group.teacher"}
+
+    def setUp(self):
+        super().setUp()
+        self.group = make_groups(1)[0]
+
+    def seed(self, count):
+        self.students = make_users(UserRoles.STUDENT, count, start=self.seeded)
+        add_payments(Payment.objects.bulk_create(
+            Payment(student=student, group=self.group, year=2025, month=1, amount=300000)
+            for student in self.students
+        ))
+
+    def get_object_id(self):
+        return Payment.objects.first().id
+
+    def create_payload(self, n):
+        return {"student": self.students[0].id, "group": self.group.id, "year": 2025, "month": 2 + n,
+                "amount": "300000.00"}
+
+    def update_payload(self):
+        return {"amount": "250000.00"}
+
+
+class LessonQueryBudgetTest(QueryBudgetMixin, TestCase):
+    basename = "lessons"
+
+    def setUp(self):
+        super().setUp()
+        self.group = make_groups(1)[0]
+        self.room = make_rooms(1)[0]
+
+    def seed(self, count):
+        Lesson.objects.bulk_create(Lesson(group=self.group, room=self.room, theme=f"Lesson {self.seeded + i}")
+                                   for i in range(count))
+
+    def get_object_id(self):
+        return Lesson.objects.first().id
+
+    def create_payload(self, n):
+        return {"group": self.group.id, "room": self.room.id, "theme": f"New lesson {n}"}
+
+    def update_payload(self):
+        return {"theme": "Renamed lesson"}
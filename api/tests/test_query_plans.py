@@ -0,0 +1,78 @@
+import re
+
+from django.db import connection, transaction
+from django.test import TestCase
+
+from api.models import Student, Lesson, Payment, Attendance, Point, Expense, Homework
+from api.reports import monthly_payment_report
+from api.utils import UserRoles
+from .utils import make_users, make_groups, enroll
+
+# A plain table scan in SQLite's EXPLAIN QUERY PLAN, index scans read "SCAN table USING INDEX ..."
+SQLITE_TABLE_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+class QueryPlanTest(TestCase):
+    """
+    Run EXPLAIN on the hot viewset queries against seeded data and fail when one needs a sequential scan
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.groups = make_groups(20)
+        for role in (UserRoles.TEACHER, UserRoles.PARENT, UserRoles.ADMIN):
+            make_users(role, 200, start=1000)
+        cls.students = make_users(UserRoles.STUDENT, 500)
+        enroll(cls.students[:50], cls.groups[:2])
+        cls.lessons = Lesson.objects.bulk_create(Lesson(group=group, theme=f"Lesson {i}")
+                                                 for group in cls.groups for i in range(20))
+        cls.lesson = cls.lessons[0]
+        Attendance.objects.bulk_create(Attendance(lesson=lesson, student=student)
+                                       for lesson in cls.lessons[:20] for student in cls.students[:50])
+        Payment.objects.bulk_create(Payment(student=student, group=cls.groups[0], year=2025, month=month,
+                                            amount=300000)
+                                    for student in cls.students for month in range(1, 7))
+        cls.homework = Homework.objects.create(lesson=cls.lesson, description="Exercises", deadline="2025-01-01T00:00Z")
+        Point.objects.bulk_create(Point(student=student, homework=cls.homework, amount=50) for student in cls.students)
+        Expense.objects.bulk_create(Expense(assigned_to=student, amount=1000) for student in cls.students[:100])
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # Small test tables are cheaper to scan, make the planner show whether an index can be used
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute(f"EXPLAIN {sql}", params)
+                return [row[0] for row in cursor.fetchall()]
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertNoSequentialScan(self, queryset):
+        plan = self.explain(queryset)
+        scans = [line for line in plan if "Seq Scan" in line or SQLITE_TABLE_SCAN.match(line.strip())]
+        self.assertEqual(scans, [], msg="\n".join(plan))
+
+    def test_active_users_per_role(self):
+        self.assertNoSequentialScan(Student.objects.filter(is_active=True).order_by("-created", "-id")[:51])
+
+    def test_lessons_of_group(self):
+        self.assertNoSequentialScan(Lesson.objects.filter(group=self.groups[0]).order_by("-created", "-id")[:51])
+
+    def test_attendance_of_lesson(self):
+        self.assertNoSequentialScan(Attendance.objects.filter(lesson=self.lesson))
+        self.assertNoSequentialScan(Attendance.objects.filter(lesson=self.lesson, student=self.students[0]))
+
+    def test_payments_of_month(self):
+        self.assertNoSequentialScan(Payment.objects.filter(year=2025, month=3))
+        self.assertNoSequentialScan(Payment.objects.filter(student=self.students[0], year=2025, month=3))
+
+    def test_monthly_payment_report(self):
+        self.assertNoSequentialScan(monthly_payment_report(2025, 3, group=self.groups[0].id))
+
+    def test_points_of_student(self):
+        self.assertNoSequentialScan(Point.objects.filter(student=self.students[0], homework=self.homework))
+
+    def test_expenses_of_user(self):
+        self.assertNoSequentialScan(Expense.objects.filter(assigned_to=self.students[0]).order_by("created"))
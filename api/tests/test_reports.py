@@ -0,0 +1,73 @@
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Payment, Student
+from api.reports import monthly_payment_report
+from api.utils import UserRoles
+from .utils import make_users, make_groups, enroll
+
+
+class MonthlyPaymentReportTest(TestCase):
+    """
+    Test the monthly payment report computes paid, expected and debt amounts for every student at once
+    """
+
+    def setUp(self):
+        today = timezone.localdate()
+        self.year, self.month = today.year, today.month
+        self.group = make_groups(1)[0]
+        self.other_group = make_groups(1, start=1)[0]
+        self.paid, self.partial, self.preferential, self.unpaid = make_users(UserRoles.STUDENT, 4)
+        Student.objects.filter(pk=self.preferential.pk).update(is_preferential=True, preferential_amount=100000)
+        enroll([self.paid, self.partial, self.preferential, self.unpaid], [self.group])
+        enroll([self.paid], [self.other_group])
+
+        for student, amount in [(self.paid, 300000), (self.partial, 120000), (self.preferential, 100000)]:
+            Payment.objects.create(student=student, group=self.group, year=self.year, month=self.month,
+                                   amount=amount)
+        Payment.objects.create(student=self.paid, group=self.other_group, year=self.year, month=self.month,
+                               amount=300000)
+        # Another month must not count
+        Payment.objects.create(student=self.unpaid, group=self.group, year=self.year - 1, month=self.month,
+                               amount=300000)
+
+    def report(self, **kwargs):
+        return {(row["student_id"], row["group_id"]): row
+                for row in monthly_payment_report(self.year, self.month, **kwargs)}
+
+    def test_amounts(self):
+        with self.assertNumQueries(1):
+            rows = self.report()
+
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[self.paid.id, self.group.id]["debt"], 0)
+        self.assertEqual(rows[self.partial.id, self.group.id]["debt"], Decimal(180000))
+        self.assertEqual(rows[self.preferential.id, self.group.id]["expected"], Decimal(100000))
+        self.assertEqual(rows[self.preferential.id, self.group.id]["debt"], 0)
+        self.assertEqual(rows[self.unpaid.id, self.group.id]["paid"], 0)
+        self.assertEqual(rows[self.unpaid.id, self.group.id]["debt"], Decimal(300000))
+
+    def test_filters(self):
+        debtors = self.report(debtors=True)
+        self.assertEqual({student for student, _ in debtors}, {self.partial.id, self.unpaid.id})
+
+        self.assertEqual(len(self.report(group=self.other_group.id)), 1)
+        self.assertEqual(len(self.report(teacher=self.other_group.teacher_id)), 1)
+
+    def test_is_fully_paid(self):
+        self.assertEqual(self.paid.is_fully_paid, (True, Decimal(600000)))
+        self.assertEqual(self.partial.is_fully_paid, (False, Decimal(120000)))
+
+    def test_endpoint(self):
+        response = APIClient().get(reverse("payment-report-list"),
+                                   {"year": self.year, "month": self.month, "debtors": "true"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertEqual(response.data["total_debt"], Decimal(480000))
+
+        response = APIClient().get(reverse("payment-report-list"), {"month": 13})
+        self.assertEqual(response.status_code, 400)
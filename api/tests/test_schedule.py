@@ -0,0 +1,112 @@
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Group
+from api.schedule import clear_schedule, get_schedule
+from api.utils import LessonDays, UserRoles
+from .utils import make_users, make_groups, make_rooms
+
+
+@override_settings(CACHE_SHARED=True)
+class ScheduleTest(TestCase):
+    """
+    Test the schedule index rejects overlapping groups and answers which groups run and which rooms are free
+    """
+
+    def setUp(self):
+        cache.clear()
+        clear_schedule()
+        self.client = APIClient()
+        self.rooms = make_rooms(3)
+        self.group = make_groups(1, room=self.rooms[0])[0]
+        self.other_teacher = make_users(UserRoles.TEACHER, 1, start=1)[0]
+        today = timezone.localdate()
+        self.monday = today + timedelta(days=7 - today.weekday())
+
+    def create(self, **fields):
+        payload = {
+            "subject": self.group.subject_id,
+            "teacher": self.other_teacher.id,
+            "room": self.rooms[0].id,
+            "name": f"Group {Group.objects.count()}",
+            "price": 300000,
+            "lesson_days": LessonDays.ODD,
+            "start_time": "10:00",
+            "end_time": "11:00",
+            "start_date": str(self.group.start_date),
+            "end_date": str(self.group.end_date),
+            **fields,
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse("groups-list"), payload, format="json")
+
+    def at(self, hour, minute=0, day=None):
+        return timezone.make_aware(datetime.combine(day or self.monday, time(hour, minute))).isoformat()
+
+    def test_conflicts(self):
+        response = self.create()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data), ["room"])
+        self.assertIn("Group 0", response.data["room"][0])
+
+        response = self.create(room=self.rooms[1].id, teacher=self.group.teacher_id)
+        self.assertEqual(list(response.data), ["teacher"])
+
+        self.assertEqual(self.create(lesson_days=LessonDays.EVEN).status_code, 201)
+        self.assertEqual(self.create(start_time="10:30", end_time="12:00").status_code, 201)
+        later = self.group.end_date + timedelta(days=1)
+        self.assertEqual(self.create(start_date=str(later), end_date=str(later + timedelta(days=30)),
+                                     start_time="09:00").status_code, 201)
+        self.assertEqual(self.create(start_time="11:00", end_time="10:00").status_code, 400)
+
+    def test_stale_index(self):
+        # Another process saved a group this process' index has not seen
+        get_schedule()
+        Group.objects.filter(pk=self.group.pk).update(room=self.rooms[1])
+        response = self.create(room=self.rooms[1].id)
+        self.assertEqual(list(response.data), ["room"])
+
+        with self.settings(CACHE_SHARED=False):
+            self.assertEqual(list(self.create(room=self.rooms[1].id).data), ["room"])
+            self.assertEqual(self.create(room=self.rooms[0].id).status_code, 201)
+
+    def test_update_ignores_itself(self):
+        url = reverse("groups-detail", args=[self.group.id])
+        response = self.client.patch(url, {"start_time": "09:30", "end_time": "11:00"}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()["room"], str(self.rooms[0].id))
+
+        self.assertEqual(self.create(room=self.rooms[1].id, start_time="11:00", end_time="12:00").status_code, 201)
+        response = self.client.patch(url, {"room": self.rooms[1].id, "end_time": "11:30"}, format="json")
+        self.assertEqual(list(response.json()), ["room"])
+
+    def test_running_and_free_rooms(self):
+        self.create(room=self.rooms[1].id, lesson_days=LessonDays.EVEN)
+        running_url, free_url = reverse("groups-running"), reverse("rooms-free")
+        self.client.get(running_url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(running_url, {"at": self.at(9, 30)})
+        self.assertEqual([group["id"] for group in response.data], [self.group.id])
+        self.assertEqual(response.data[0]["room"]["number"], self.rooms[0].number)
+        self.assertEqual(self.client.get(running_url, {"at": self.at(10, 30)}).data, [])
+        tuesday = self.at(10, 30, day=self.monday + timedelta(days=1))
+        self.assertEqual(len(self.client.get(running_url, {"at": tuesday}).data), 1)
+
+        rooms = self.client.get(free_url, {"at": self.at(9, 30)}).data
+        self.assertEqual([room["id"] for room in rooms], [self.rooms[1].id, self.rooms[2].id])
+        self.assertEqual(len(self.client.get(free_url, {"at": self.at(12)}).data), 3)
+        self.assertEqual(self.client.get(free_url, {"at": "soon"}).status_code, 400)
+
+    def test_rebuilt_after_save(self):
+        running_url = reverse("groups-running")
+        self.assertEqual(len(self.client.get(running_url, {"at": self.at(9, 30)}).data), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.lesson_days = LessonDays.EVEN
+            self.group.save()
+        self.assertEqual(self.client.get(running_url, {"at": self.at(9, 30)}).data, [])
@@ -0,0 +1,150 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Lesson, Payment, SmsMessage
+from api.sms import EskizClient, RateLimiter, queue_debt_reminders, send_queued
+from api.utils import UserRoles, SmsKinds, SmsStatuses
+from .fake_eskiz import FakeEskiz
+from .utils import make_users, make_groups, enroll, attach_parents
+
+
+def statuses():
+    return sorted(SmsMessage.objects.values_list("status", flat=True))
+
+
+class SmsOutboxTest(TestCase):
+    """
+    Test reminders and alerts are queued in the outbox and sent in rate-limited batches with retries
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.group = make_groups(1)[0]
+        self.students = make_users(UserRoles.STUDENT, 3)
+        enroll(self.students, [self.group])
+        self.parents = make_users(UserRoles.PARENT, 2)
+        attach_parents(self.parents, self.students[:1])
+        attach_parents(self.parents[1:], self.students[1:2])
+        self.eskiz = self.enterContext(FakeEskiz())
+        self.enterContext(override_settings(ESKIZ_API_URL=self.eskiz.url, ESKIZ_CALLBACK_URL="",
+                                            ESKIZ_CALLBACK_SECRET="secret", SMS_MAX_ATTEMPTS=3,
+                                            SMS_RETRY_DELAY=60))
+        self.waits = []
+
+    def send(self, batch_size=2):
+        limiter = RateLimiter(1000, clock=lambda: 0, sleep=self.waits.append)
+        return send_queued(EskizClient(), batch_size=batch_size, limiter=limiter)
+
+    def queue(self, count):
+        SmsMessage.objects.bulk_create(
+            SmsMessage(kind=SmsKinds.DEBT_REMINDER, phone_number="998901234567", text=f"Message {i}")
+            for i in range(count)
+        )
+
+    def make_due(self):
+        SmsMessage.objects.update(send_after=timezone.now())
+
+    def test_debt_reminders(self):
+        today = timezone.localdate()
+        Payment.objects.create(student=self.students[1], group=self.group, amount=100000, year=today.year,
+                               month=today.month)
+        self.assertEqual(queue_debt_reminders(today.year, today.month), 3)
+        messages = SmsMessage.objects.all()
+        self.assertEqual({message.phone_number for message in messages}, {"998996937308"})
+        self.assertIn("200 000 UZS", messages.filter(key__contains=str(self.students[1].id)).first().text)
+        self.assertIn("300 000 UZS", messages.filter(key__contains=str(self.students[0].id)).first().text)
+
+        # Queueing the month again adds nothing
+        out = StringIO()
+        call_command("queue_debt_reminders", stdout=out)
+        self.assertIn("Queued 0 reminders", out.getvalue())
+
+    def test_absence_alerts(self):
+        client = APIClient()
+        lesson = Lesson.objects.create(group=self.group, theme="Fractions")
+        url = reverse("lessons-attendance", args=[lesson.id])
+        client.put(url, [{"student": str(student.id), "is_absent": True} for student in self.students],
+                   format="json")
+        alerts = SmsMessage.objects.filter(kind=SmsKinds.ABSENCE_ALERT)
+        self.assertEqual(alerts.count(), 3)
+        self.assertIn(self.group.name, alerts.first().text)
+
+        client.put(url, [{"student": str(self.students[0].id), "is_absent": False}], format="json")
+        self.assertEqual(alerts.count(), 1)
+
+    def test_batches_and_token(self):
+        self.queue(5)
+        self.assertEqual(self.send(), {"sent": 5, "retried": 0, "failed": 0})
+        self.assertEqual([len(batch["messages"]) for batch in self.eskiz.batches], [2, 2, 1])
+        self.assertEqual(self.eskiz.batches[0]["messages"][0]["to"], "998901234567")
+        self.assertEqual(statuses(), [SmsStatuses.SENT] * 5)
+        self.assertEqual(self.send(), {"sent": 0, "retried": 0, "failed": 0})
+
+        # The token is cached, and refreshed once the API refuses it
+        self.eskiz.expire_tokens()
+        self.queue(1)
+        self.send()
+        self.assertEqual((self.eskiz.logins, self.eskiz.refreshes), (1, 1))
+        self.assertEqual(len(self.eskiz.batches), 4)
+
+    def test_rate_limit(self):
+        clock = [0]
+        limiter = RateLimiter(10, clock=lambda: clock[0], sleep=self.waits.append)
+        limiter.wait(10)
+        limiter.wait(5)
+        self.assertEqual(self.waits, [0.5])
+        clock[0] = 2
+        limiter.wait(10)
+        self.assertEqual(self.waits, [0.5])
+
+    def test_retries(self):
+        self.queue(3)
+        self.eskiz.responses = [(503, {})]
+        self.assertEqual(self.send(), {"sent": 0, "retried": 2, "failed": 0})
+        retried = SmsMessage.objects.filter(attempts=1).first()
+        self.assertEqual(retried.status, SmsStatuses.QUEUED)
+        self.assertGreater(retried.send_after, timezone.now() + timedelta(seconds=50))
+        self.assertIn("503", retried.error)
+
+        # Throttled: the provider's Retry-After wins over a shorter backoff
+        self.make_due()
+        self.eskiz.responses = [(429, {"Retry-After": "600"})]
+        self.send(batch_size=3)
+        self.assertGreater(SmsMessage.objects.filter(attempts=2).first().send_after,
+                           timezone.now() + timedelta(seconds=590))
+
+        self.make_due()
+        self.eskiz.responses = [(500, {})]
+        self.assertEqual(self.send(batch_size=3), {"sent": 0, "retried": 1, "failed": 2})
+        self.make_due()
+        self.assertEqual(self.send(), {"sent": 1, "retried": 0, "failed": 0})
+        self.assertEqual(statuses(), [SmsStatuses.FAILED] * 2 + [SmsStatuses.SENT])
+
+        # Refused batches are not sent again
+        self.queue(1)
+        self.eskiz.responses = [(400, {})]
+        self.assertEqual(self.send(), {"sent": 0, "retried": 0, "failed": 1})
+
+    def test_delivery_reports(self):
+        self.queue(2)
+        self.send()
+        first, second = SmsMessage.objects.all()
+        url = reverse("sms-status-list")
+        client = APIClient()
+        response = client.post(f"{url}?secret=secret", {"user_sms_id": str(first.id), "status": "DELIVRD"})
+        self.assertEqual(response.status_code, 204)
+        client.post(f"{url}?secret=secret", {"user_sms_id": str(second.id), "status": "UNDELIV"})
+        self.assertEqual(client.post(f"{url}?secret=wrong", {"user_sms_id": str(first.id)}).status_code, 404)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, SmsStatuses.DELIVERED)
+        self.assertIsNotNone(first.delivered_at)
+        self.assertEqual((second.status, second.error), (SmsStatuses.FAILED, "Not delivered: UNDELIV"))
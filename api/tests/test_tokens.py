@@ -0,0 +1,104 @@
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
+
+from api.authentication import user_cache
+from api.serializers import MyTokenObtainPairSerializer
+from api.tokens import BloomFilter, blacklist_prefilter, is_blacklisted, refreshed_key
+from api.utils import UserRoles
+from .utils import make_users
+
+
+@override_settings(TOKEN_BLACKLIST_SYNC_INTERVAL=3600, JWT_AUTH_MODE="cached")
+class TokenRefreshTest(TestCase):
+    """
+    Test refreshes check the blacklist without queries, reuse a refresh within the grace window and prune tokens
+    """
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        blacklist_prefilter.reset()
+        self.client = APIClient()
+        self.user = make_users(UserRoles.STUDENT, 1)[0]
+        self.url = reverse("token_refresh")
+
+    def refresh_token(self):
+        token = MyTokenObtainPairSerializer.get_token(self.user)
+        return str(token), token["jti"]
+
+    def refresh(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, {"refresh": token}, format="json")
+
+    def test_rotation_and_grace(self):
+        token, jti = self.refresh_token()
+        first = self.refresh(token)
+        self.assertEqual(first.status_code, 200)
+        self.assertNotEqual(first.data["refresh"], token)
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=jti).exists())
+
+        with self.assertNumQueries(0):
+            again = self.refresh(token)
+        self.assertEqual(again.data, first.data)
+
+        cache.delete(refreshed_key(token))
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+        # A fresh token is ruled out by the Bloom filter, the user comes from the user cache, the blacklist insert
+        # runs in a savepoint to tell whether the token was rotated before
+        with self.assertNumQueries(5):
+            self.assertEqual(self.refresh(first.data["refresh"]).status_code, 200)
+
+    def test_blacklist_found_after_cache_eviction(self):
+        token, jti = self.refresh_token()
+        self.refresh(token)
+        cache.clear()
+        blacklist_prefilter.reset()
+        self.assertTrue(is_blacklisted(jti, (timezone.now() + timedelta(days=1)).timestamp()))
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_replay_on_another_worker(self):
+        token, _ = self.refresh_token()
+        self.assertEqual(self.refresh(token).status_code, 200)
+
+        # Another worker: nothing cached, a Bloom filter synced before the rotation
+        cache.clear()
+        blacklist_prefilter.bloom = BloomFilter(blacklist_prefilter.min_capacity)
+        blacklist_prefilter.synced_at = blacklist_prefilter.built_at = time.monotonic()
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_inactive_user(self):
+        token, _ = self.refresh_token()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000)
+        for i in range(1000):
+            bloom.add(f"jti{i}")
+        self.assertTrue(all(f"jti{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"other{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_prune(self):
+        now = timezone.now()
+        for i in range(5):
+            token = OutstandingToken.objects.create(jti=f"expired{i}", token="", expires_at=now - timedelta(days=1))
+            BlacklistedToken.objects.create(token=token)
+        OutstandingToken.objects.create(jti="active", token="", expires_at=now + timedelta(days=1))
+
+        out = StringIO()
+        call_command("prune_tokens", batch_size=2, stdout=out)
+        self.assertIn("Deleted 5", out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list("jti", flat=True)), ["active"])
+        self.assertFalse(BlacklistedToken.objects.exists())
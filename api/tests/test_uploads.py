@@ -0,0 +1,147 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Homework, Lesson, StoredFile, UploadSession
+from api.uploads import UploadError, part_path, write_chunk
+from api.utils import UserRoles
+from .utils import make_groups, make_users
+
+CONTENT = b"0123456789"
+
+
+class ChunkedUploadTest(TestCase):
+    """
+    Test files are uploaded in resumable chunks straight to disk and stored once per content
+    """
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        # A request body larger than DATA_UPLOAD_MAX_MEMORY_SIZE would be rejected if it were read into memory
+        self.enterContext(override_settings(MEDIA_ROOT=media, UPLOAD_CHUNK_SIZE=4, DATA_UPLOAD_MAX_MEMORY_SIZE=2))
+        self.media = media
+        self.client = APIClient()
+        self.lesson = Lesson.objects.create(group=make_groups(1)[0], theme="Theme")
+        self.owner, self.other = make_users(UserRoles.TEACHER, 2, start=100)
+        self.client.force_authenticate(self.owner)
+
+    def start(self, size=len(CONTENT)):
+        response = self.client.post(reverse("uploads-list"), {"file_name": "task.pdf", "size": size,
+                                                              "content_type": "application/pdf"}, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data["chunk_size"], 4)
+        return response.data["id"]
+
+    def put(self, upload_id, start, data, **headers):
+        return self.client.put(reverse("uploads-detail", args=[upload_id]) + "?expand=stored_file", data,
+                               content_type="application/octet-stream",
+                               HTTP_CONTENT_RANGE=f"bytes {start}-{start + len(data) - 1}/{len(CONTENT)}", **headers)
+
+    def upload(self, content=CONTENT):
+        upload_id = self.start()
+        for start in range(0, len(content), 4):
+            response = self.put(upload_id, start, content[start:start + 4])
+            self.assertEqual(response.status_code, 200, response.content)
+        return upload_id, response.data
+
+    def test_resumable_upload(self):
+        upload_id = self.start()
+        self.assertEqual(self.put(upload_id, 0, b"0123").data["received"], 4)
+        self.assertEqual(self.put(upload_id, 8, b"89").status_code, 409)
+        self.assertEqual(self.put(upload_id, 4, b"45").status_code, 400)
+        response = self.put(upload_id, 4, b"4567", HTTP_X_CHUNK_SHA256=hashlib.sha256(b"other").hexdigest())
+        self.assertEqual((response.status_code, response.data["received"]), (400, 4))
+
+        # Resume from where the server says
+        received = self.client.get(reverse("uploads-detail", args=[upload_id])).data["received"]
+        self.assertEqual(received, 4)
+        self.put(upload_id, 4, b"4567", HTTP_X_CHUNK_SHA256=hashlib.sha256(b"4567").hexdigest())
+        data = self.put(upload_id, 8, b"89").data
+        self.assertEqual(data["received"], 10)
+        self.assertEqual(data["stored_file"]["size"], 10)
+
+        stored = StoredFile.objects.get()
+        with stored.file.open("rb") as file:
+            self.assertEqual(file.read(), CONTENT)
+        self.assertFalse(os.path.exists(part_path(UploadSession.objects.get())))
+        self.assertEqual(self.put(upload_id, 8, b"89").status_code, 409)
+
+    def test_racing_chunks(self):
+        upload_id = self.start()
+        first, second = UploadSession.objects.get(pk=upload_id), UploadSession.objects.get(pk=upload_id)
+        write_chunk(first, 0, BytesIO(b"0123"), 4)
+        with self.assertRaises(UploadError):
+            write_chunk(second, 0, BytesIO(b"xxxx"), 4)
+        with open(part_path(first), "rb") as part:
+            self.assertEqual(part.read(), b"0123")
+
+        # A part file changed behind the recorded chunk hashes is never stored
+        with open(part_path(first), "r+b") as part:
+            part.write(b"x")
+        self.assertEqual(self.put(upload_id, 4, b"4567").status_code, 200)
+        response = self.put(upload_id, 8, b"89")
+        self.assertEqual((response.status_code, response.data["received"]), (409, 0))
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_identical_files_stored_once(self):
+        _, first = self.upload()
+        _, second = self.upload()
+        _, other = self.upload(b"9876543210")
+        self.assertEqual(first["stored_file"]["id"], second["stored_file"]["id"])
+        self.assertNotEqual(first["stored_file"]["id"], other["stored_file"]["id"])
+        stored_files = [name for _, _, names in os.walk(os.path.join(self.media, "files")) for name in names]
+        self.assertEqual(len(stored_files), 2)
+        self.assertEqual(os.listdir(os.path.join(self.media, "uploads")), [])
+
+    def test_homework_references(self):
+        upload_id, data = self.upload()
+        other_id, _ = self.upload(b"9876543210")
+        url = reverse("homework-list")
+        payload = {"lesson": self.lesson.id, "description": "Read", "deadline": timezone.now().isoformat(),
+                   "upload": upload_id}
+        first = self.client.post(url, payload, format="json")
+        self.assertEqual(first.status_code, 201, first.content)
+        self.assertEqual(first.data["file_name"], "task.pdf")
+        self.client.post(url, payload, format="json")
+        stored = StoredFile.objects.get(pk=data["stored_file"]["id"])
+        self.assertEqual(StoredFile.objects.get(pk=stored.pk).references, 2)
+
+        self.client.patch(reverse("homework-detail", args=[first.data["id"]]), {"upload": other_id}, format="json")
+        self.assertEqual(StoredFile.objects.get(pk=stored.pk).references, 1)
+        Homework.objects.exclude(pk=first.data["id"]).delete()
+        self.assertEqual(StoredFile.objects.get(pk=stored.pk).references, 0)
+
+        # Unused files and idle uploads are pruned once they are old enough
+        StoredFile.objects.update(updated=timezone.now() - timedelta(days=2))
+        UploadSession.objects.update(updated=timezone.now() - timedelta(days=2))
+        out = StringIO()
+        call_command("prune_uploads", stdout=out)
+        self.assertIn("Deleted 2 uploads and 1 unused files", out.getvalue())
+        self.assertFalse(os.path.exists(stored.file.path))
+        self.assertEqual(StoredFile.objects.get().references, 1)
+
+    def test_uploads_of_other_users(self):
+        upload_id, _ = self.upload()
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(reverse("uploads-detail", args=[upload_id])).status_code, 404)
+        response = self.client.post(reverse("homework-list"), {"lesson": self.lesson.id, "description": "Read",
+                                                               "deadline": timezone.now().isoformat(),
+                                                               "upload": upload_id}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("upload", response.data)
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(reverse("uploads-detail", args=[upload_id])).status_code, 401)
+        response = self.client.post(reverse("uploads-list"), {"file_name": "task.pdf", "size": len(CONTENT),
+                                                              "content_type": "application/pdf"}, format="json")
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,84 @@
+from datetime import time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from api.models import Subject, Group, Room
+from api.utils import UserRoles, LessonDays
+
+User = get_user_model()
+
+
+def make_users(role, count, start=0, **extra_fields):
+    """
+    Bulk create `count` users of the given role, numbered from `start`
+    """
+    password = make_password(None)
+    users = [
+        User(email=f"{role}{i}@example.com",
+             first_name=f"{role.capitalize()}{i}",
+             last_name="Doe",
+             middle_name="Black",
+             phone_number="+998996937308",
+             password=password,
+             role=role,
+             **extra_fields)
+        for i in range(start, start + count)
+    ]
+    return User.objects.bulk_create(users)
+
+
+def make_subjects(count, start=0):
+    """
+    Bulk create `count` subjects, numbered from `start`
+    """
+    return Subject.objects.bulk_create(Subject(name=f"Subject {i}") for i in range(start, start + count))
+
+
+def make_groups(count, start=0, subject=None, teacher=None, **extra_fields):
+    """
+    Bulk create `count` groups, numbered from `start`, creating a subject and a teacher if none are given
+    """
+    subject = subject or make_subjects(1, start=start)[0]
+    teacher = teacher or make_users(UserRoles.TEACHER, 1, start=start)[0]
+    today = timezone.localdate()
+    fields = {
+        "price": 300000,
+        "lesson_days": LessonDays.ODD,
+        "start_time": time(9, 0),
+        "end_time": time(10, 30),
+        "start_date": today,
+        "end_date": today + timedelta(days=90),
+        **extra_fields,
+    }
+    return Group.objects.bulk_create(
+        Group(subject=subject, teacher=teacher, name=f"Group {i}", **fields) for i in range(start, start + count)
+    )
+
+
+def make_rooms(count, start=0):
+    """
+    Bulk create `count` rooms, numbered from `start`
+    """
+    return Room.objects.bulk_create(Room(number=i) for i in range(start, start + count))
+
+
+def enroll(students, groups):
+    """
+    Add every student to every group with a single insert
+    """
+    through = User.student_groups.through
+    through.objects.bulk_create(
+        through(user_id=student.id, group_id=group.id) for student in students for group in groups
+    )
+
+
+def attach_parents(parents, students):
+    """
+    Attach every student to every parent with a single insert
+    """
+    through = User.parent_students.through
+    through.objects.bulk_create(
+        through(user_id=parent.id, student_id=student.id) for parent in parents for student in students
+    )
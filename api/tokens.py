@@ -0,0 +1,185 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+
+def blacklisted_key(jti):
+    return f"jwt:blacklisted:{jti}"
+
+
+def refreshed_key(raw_token):
+    return f"jwt:refreshed:{hashlib.sha256(raw_token.encode()).hexdigest()}"
+
+
+class BloomFilter:
+    """
+    Set of strings with no false negatives and about `error_rate` false positives at `capacity` items
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big")
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
+
+
+class BlacklistPrefilter:
+    """
+    In-process Bloom filter of blacklisted token ids. A token it does not contain was not blacklisted when the
+    filter last synced, at most TOKEN_BLACKLIST_SYNC_INTERVAL seconds ago, so most refreshes skip the blacklist
+    query. Tokens blacklisted since then are found through the cache, which every worker shares when a shared
+    cache backend is configured
+    """
+
+    min_capacity = 10000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.bloom = None
+        self.last_id = 0
+        self.synced_at = self.built_at = 0
+
+    def rebuild(self):
+        rows = list(BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+                    .order_by("pk").values_list("pk", "token__jti"))
+        bloom = BloomFilter(max(self.min_capacity, 2 * len(rows)), settings.TOKEN_BLACKLIST_ERROR_RATE)
+        for _, jti in rows:
+            bloom.add(jti)
+        self.bloom = bloom
+        self.last_id = max((pk for pk, _ in rows), default=0)
+        self.built_at = time.monotonic()
+
+    def update(self):
+        rows = BlacklistedToken.objects.filter(pk__gt=self.last_id).order_by("pk").values_list("pk", "token__jti")
+        for pk, jti in rows:
+            self.bloom.add(jti)
+            self.last_id = pk
+
+    def sync(self):
+        now = time.monotonic()
+        with self.lock:
+            if self.bloom is not None and now - self.synced_at < settings.TOKEN_BLACKLIST_SYNC_INTERVAL:
+                return
+            # Ids are assigned before commit, a row committed late behind a newer id is only seen by a rebuild
+            if (self.bloom is None or self.bloom.count > self.bloom.capacity
+                    or now - self.built_at >= settings.TOKEN_BLACKLIST_REBUILD_INTERVAL):
+                self.rebuild()
+            else:
+                self.update()
+            self.synced_at = now
+
+    def add(self, jti):
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def __contains__(self, jti):
+        self.sync()
+        return jti in self.bloom
+
+
+blacklist_prefilter = BlacklistPrefilter()
+
+
+def remember_blacklisted(jti, exp):
+    """
+    Cache a blacklisted token id until the token expires
+    """
+    timeout = max(1, int(exp - time.time()))
+    transaction.on_commit(lambda: cache.set(blacklisted_key(jti), True, timeout))
+    blacklist_prefilter.add(jti)
+
+
+def is_blacklisted(jti, exp):
+    """
+    Cached blacklist membership check, the database is only asked when the Bloom filter cannot rule the token out
+    """
+    if cache.get(blacklisted_key(jti)):
+        return True
+    if jti not in blacklist_prefilter:
+        return False
+    if BlacklistedToken.objects.filter(token__jti=jti).exists():
+        remember_blacklisted(jti, exp)
+        return True
+    return False
+
+
+class CachedRefreshToken(RefreshToken):
+    """
+    Refresh token whose blacklist check goes through the cache and the Bloom filter
+    """
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM], self.payload["exp"]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        """
+        Same rows as RefreshToken.blacklist, the outstanding token written with a conflict-ignoring insert. The
+        blacklist insert is the authority on rotation: the cache and the Bloom filter of another worker may not know
+        the token is blacklisted yet, so a token whose row already exists was rotated before and is refused
+        """
+        jti, exp = self.payload[api_settings.JTI_CLAIM], self.payload["exp"]
+        OutstandingToken.objects.bulk_create([OutstandingToken(
+            jti=jti,
+            user_id=self.payload.get(api_settings.USER_ID_CLAIM),
+            created_at=self.current_time,
+            token=str(self),
+            expires_at=datetime_from_epoch(exp),
+        )], ignore_conflicts=True)
+        token_id = OutstandingToken.objects.filter(jti=jti).values_list("pk", flat=True).get()
+        try:
+            with transaction.atomic():
+                BlacklistedToken.objects.create(token_id=token_id)
+        except IntegrityError:
+            remember_blacklisted(jti, exp)
+            raise TokenError(_("Token is blacklisted"))
+        remember_blacklisted(jti, exp)
+
+
+def prune_tokens(batch_size=1000):
+    """
+    Delete expired outstanding tokens and their blacklist entries in batches, so no statement holds locks on
+    the whole table. Returns the number of outstanding tokens deleted
+    """
+    now = timezone.now()
+    deleted = 0
+    while True:
+        # Tokens expire in the order they were issued, so the expired ones come first by primary key
+        ids = list(OutstandingToken.objects.filter(expires_at__lt=now).order_by("pk")
+                   .values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
@@ -0,0 +1,204 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import StoredFile, UploadSession
+
+# Bytes read from the request and written to disk at a time
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """
+    A chunk that does not fit the upload, `status` is the HTTP status to answer with
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def part_path(session):
+    return default_storage.path(f"uploads/{session.pk}.part")
+
+
+def content_name(content_hash):
+    return f"files/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}"
+
+
+def content_hash(chunk_hashes):
+    """
+    Hash of a file's content from the hashes of its UPLOAD_CHUNK_SIZE chunks. Every upload of the same content is
+    cut into the same chunks, so identical files get the same hash without reading them again
+    """
+    return hashlib.sha256(bytes.fromhex(chunk_hashes)).hexdigest()
+
+
+def parse_content_range(value, size):
+    """
+    (start, length) of a chunk from its Content-Range header, e.g. "bytes 0-8388607/20000000"
+    """
+    try:
+        unit, _, rest = (value or "").partition(" ")
+        span, _, total = rest.partition("/")
+        first, _, last = span.partition("-")
+        start, end = int(first), int(last)
+        if unit != "bytes" or int(total) != size or not 0 <= start <= end < size:
+            raise ValueError
+    except ValueError:
+        raise UploadError(f"Content-Range must be bytes <first>-<last>/{size}")
+    return start, end - start + 1
+
+
+def file_chunk_hashes(path, size):
+    """
+    Hashes of the UPLOAD_CHUNK_SIZE chunks of the first `size` bytes of a file, None when the file is not `size`
+    bytes long
+    """
+    if os.path.getsize(path) != size:
+        return None
+    chunk_size = settings.UPLOAD_CHUNK_SIZE
+    hashes = []
+    with open(path, "rb") as file:
+        for start in range(0, size, chunk_size):
+            digest = hashlib.sha256()
+            remaining = min(chunk_size, size - start)
+            while remaining:
+                data = file.read(min(COPY_BUFFER_SIZE, remaining))
+                digest.update(data)
+                remaining -= len(data)
+            hashes.append(digest.hexdigest())
+    return "".join(hashes)
+
+
+def write_chunk(session, start, stream, length, expected_hash=None):
+    """
+    Stream `length` bytes from `stream` into the session's part file at `start`, hashing them on the way, and
+    complete the upload with the last chunk. Chunks must arrive in order and be UPLOAD_CHUNK_SIZE bytes long
+    except the last one. The chunk is spooled to a temporary file and only written into the part file once its
+    offset is claimed, so a request losing a race for the same offset never touches the part file. Returns the
+    updated session
+    """
+    chunk_size = settings.UPLOAD_CHUNK_SIZE
+    if session.stored_file_id:
+        raise UploadError("The upload is already complete", status=409)
+    if start != session.received:
+        raise UploadError(f"Expected the chunk starting at byte {session.received}", status=409)
+    if length != min(chunk_size, session.size - start):
+        raise UploadError(f"Chunks must be {chunk_size} bytes long, except the last one")
+
+    path = part_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    digest = hashlib.sha256()
+    with tempfile.TemporaryFile(dir=os.path.dirname(path)) as spool:
+        remaining = length
+        while remaining:
+            data = stream.read(min(COPY_BUFFER_SIZE, remaining))
+            if not data:
+                raise UploadError("The request body is shorter than its Content-Range")
+            digest.update(data)
+            spool.write(data)
+            remaining -= len(data)
+
+        chunk_hash = digest.hexdigest()
+        if expected_hash and expected_hash.lower() != chunk_hash:
+            raise UploadError("The chunk does not match its SHA-256 hash")
+
+        # Only one request may append a chunk at a given offset
+        updated = UploadSession.objects.filter(pk=session.pk, received=start).update(
+            received=start + length, chunk_hashes=session.chunk_hashes + chunk_hash, updated=timezone.now(),
+        )
+        if not updated:
+            raise UploadError("Another request is uploading this chunk", status=409)
+        session.received, session.chunk_hashes = start + length, session.chunk_hashes + chunk_hash
+
+        spool.seek(0)
+        with open(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), "r+b") as part:
+            part.seek(start)
+            shutil.copyfileobj(spool, part, COPY_BUFFER_SIZE)
+
+    if session.received == session.size:
+        complete(session)
+    return session
+
+
+def complete(session):
+    """
+    Store a fully received upload under its content hash, or drop it when the same content is stored already.
+    The part file is hashed again first, other uploads of the same content share the stored file on the strength
+    of its hash. An upload whose file does not match the chunks it received starts over
+    """
+    if file_chunk_hashes(part_path(session), session.size) != session.chunk_hashes:
+        os.remove(part_path(session))
+        UploadSession.objects.filter(pk=session.pk).update(received=0, chunk_hashes="", updated=timezone.now())
+        session.received, session.chunk_hashes = 0, ""
+        raise UploadError("The received file does not match its chunks, upload it again", status=409)
+
+    digest = content_hash(session.chunk_hashes)
+    name = content_name(digest)
+    stored = StoredFile.objects.filter(content_hash=digest).first()
+    if stored is None:
+        path = default_storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A rename within the media directory, the bytes are never copied
+        os.replace(part_path(session), path)
+        try:
+            with transaction.atomic():
+                stored = StoredFile.objects.create(content_hash=digest, file=name, size=session.size,
+                                                   content_type=session.content_type)
+        except IntegrityError:
+            # Stored by a concurrent upload of the same content in the meantime, under the same name
+            stored = StoredFile.objects.get(content_hash=digest)
+    else:
+        os.remove(part_path(session))
+        # Keeps the file from being pruned before a homework references it
+        StoredFile.objects.filter(pk=stored.pk).update(updated=timezone.now())
+
+    UploadSession.objects.filter(pk=session.pk).update(stored_file=stored)
+    session.stored_file = stored
+    return stored
+
+
+def change_references(stored_file_id, delta):
+    """
+    Shift a stored file's reference count by `delta` without reading it first
+    """
+    if stored_file_id:
+        StoredFile.objects.filter(pk=stored_file_id).update(references=F("references") + delta)
+
+
+def prune_uploads(batch_size=1000):
+    """
+    Delete upload sessions idle for UPLOAD_SESSION_TIMEOUT seconds with their part files, and stored files no
+    homework has referenced for as long. Returns the number of (sessions, files) deleted
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.UPLOAD_SESSION_TIMEOUT)
+    sessions = files = 0
+    while True:
+        batch = list(UploadSession.objects.filter(updated__lt=cutoff).order_by("pk")[:batch_size])
+        if not batch:
+            break
+        for session in batch:
+            if not session.stored_file_id and os.path.exists(part_path(session)):
+                os.remove(part_path(session))
+        UploadSession.objects.filter(pk__in=[session.pk for session in batch]).delete()
+        sessions += len(batch)
+
+    while True:
+        batch = list(StoredFile.objects.filter(references=0, updated__lt=cutoff).order_by("pk")[:batch_size])
+        if not batch:
+            break
+        for stored in batch:
+            # A homework may have taken it since it was read
+            if StoredFile.objects.filter(pk=stored.pk, references=0).delete()[0]:
+                stored.file.delete(save=False)
+                files += 1
+    return sessions, files
@@ -1,6 +1,8 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 
 from . import views
+from .async_views import AsyncReadView
 
 router = DefaultRouter()
 router.register(prefix="parents", viewset=views.ParentViewSet, basename="parents")
@@ -11,5 +13,33 @@ router.register(prefix="subjects", viewset=views.SubjectViewSet, basename="subje
 router.register(prefix="rooms", viewset=views.RoomViewSet, basename="rooms")
 router.register(prefix="admins", viewset=views.AdminViewSet, basename="admins")
 router.register(prefix="superusers", viewset=views.SuperuserViewSet, basename="superusers")
+router.register(prefix="lessons", viewset=views.LessonViewSet, basename="lessons")
+router.register(prefix="homework", viewset=views.HomeworkViewSet, basename="homework")
+router.register(prefix="uploads", viewset=views.UploadViewSet, basename="uploads")
+router.register(prefix="payments", viewset=views.PaymentViewSet, basename="payments")
+router.register(prefix="reports/payments", viewset=views.PaymentReportViewSet, basename="payment-report")
+router.register(prefix="reports/finance", viewset=views.FinanceReportViewSet, basename="finance-report")
+router.register(prefix="leaderboard", viewset=views.LeaderboardViewSet, basename="leaderboard")
+router.register(prefix="sms/status", viewset=views.SmsStatusViewSet, basename="sms-status")
+router.register(prefix="exports", viewset=views.ExportViewSet, basename="exports")
 
-urlpatterns = router.urls
+# Async read-only twins of the user, group, subject and room endpoints, meant to be served over ASGI
+ASYNC_VIEWSETS = {
+    "parents": views.ParentViewSet,
+    "students": views.StudentViewSet,
+    "teachers": views.TeacherViewSet,
+    "admins": views.AdminViewSet,
+    "superusers": views.SuperuserViewSet,
+    "groups": views.GroupViewSet,
+    "subjects": views.SubjectViewSet,
+    "rooms": views.RoomViewSet,
+}
+
+urlpatterns = router.urls + [
+    url
+    for prefix, viewset in ASYNC_VIEWSETS.items()
+    for url in (
+        path(f"async/{prefix}/", AsyncReadView.as_view(viewset=viewset), name=f"async-{prefix}-list"),
+        path(f"async/{prefix}/<str:pk>/", AsyncReadView.as_view(viewset=viewset), name=f"async-{prefix}-detail"),
+    )
+]
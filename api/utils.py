@@ -12,3 +12,16 @@ class UserRoles(models.TextChoices):
 class LessonDays(models.TextChoices):
     ODD = "1-3-5"
     EVEN = "2-4-6"
+
+
+class SmsKinds(models.TextChoices):
+    DEBT_REMINDER = "debt_reminder"
+    ABSENCE_ALERT = "absence_alert"
+
+
+class SmsStatuses(models.TextChoices):
+    QUEUED = "queued"
+    SENDING = "sending"
+    SENT = "sent"
+    DELIVERED = "delivered"
+    FAILED = "failed"
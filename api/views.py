@@ -1,48 +1,396 @@
-from rest_framework.viewsets import ModelViewSet
+import os
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotAuthenticated, NotFound, PermissionDenied
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.mixins import CreateModelMixin, DestroyModelMixin, RetrieveModelMixin
+from rest_framework.viewsets import GenericViewSet, ModelViewSet, ViewSet
 from django.contrib.auth import get_user_model
 
-from .models import Parent, Student, Teacher, Group, Subject, Room, Admin, Superuser
+from jobs.models import Job
+from jobs.queue import enqueue
+from .attendance import lesson_roster, mark_attendance
+from .cache import CachedResponseMixin
+from .dashboard import teacher_dashboard
+from .downloads import can_access_group, file_response
+from .models import Parent, Student, Teacher, Group, Subject, Room, Admin, Superuser, Payment, Lesson, Homework, \
+    UploadSession
+from .exports import export_filters, stream_export
+from .finance import finance_report
+from .importers import POOL_THRESHOLD, import_students, read_csv, validate_rows, with_hashed_passwords
+from .leaderboard import student_rank, top_students
+from .lesson_calendar import generate_lessons
+from .payments import bulk_create_payments
+from .reports import monthly_payment_report
+from .schedule import get_schedule
+from .sms import record_delivery
+from .uploads import UploadError, parse_content_range, part_path, write_chunk
 from .serializers import ParentSerializer, StudentSerializer, TeacherSerializer, GroupSerializer, SubjectSerializer, \
-    RoomSerializer, AdminSerializer, SuperuserSerializer
+    RoomSerializer, AdminSerializer, SuperuserSerializer, PaymentReportQuerySerializer, \
+    PaymentSerializer, PaymentBulkSerializer, ExportQuerySerializer, LessonSerializer, AttendanceMarkSerializer, \
+    DashboardQuerySerializer, FinanceReportQuerySerializer, ScheduleQuerySerializer, LessonCalendarSerializer, \
+    LeaderboardQuerySerializer, LeaderboardRankQuerySerializer, HomeworkSerializer, UploadSessionSerializer
 
 User = get_user_model()
 
 
-class SuperuserViewSet(ModelViewSet):
+class ExpandableQuerysetMixin:
+    """
+    Loads what the serializer renders for the request's ?fields= and ?expand= up front, and nothing else
+    """
+
+    def get_queryset(self):
+        return self.get_serializer_class().load_requested(super().get_queryset(), self.request)
+
+
+class SuperuserViewSet(ExpandableQuerysetMixin, ModelViewSet):
     queryset = Superuser.objects.filter(is_active=True)
     serializer_class = SuperuserSerializer
 
 
-class ParentViewSet(ModelViewSet):
+class ParentViewSet(ExpandableQuerysetMixin, ModelViewSet):
     queryset = Parent.objects.filter(is_active=True)
     serializer_class = ParentSerializer
 
 
-class StudentViewSet(ModelViewSet):
+class StudentViewSet(ExpandableQuerysetMixin, ModelViewSet):
     queryset = Student.objects.filter(is_active=True)
     serializer_class = StudentSerializer
 
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_students(self, request):
+        """
+        Create students in bulk from an uploaded CSV `file` or a JSON list of rows. Rows are validated right
+        away, a large import is then queued as a job creating the students, follow it at the returned `status`
+        URL. Passwords are hashed before the rows are queued, no plaintext password is ever stored in a job
+        """
+        if "file" in request.FILES:
+            rows = read_csv(request.FILES["file"])
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            return Response({"detail": "Upload a CSV file or send a list of students"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if len(rows) >= POOL_THRESHOLD:
+            _, errors = validate_rows(rows)
+            if not errors:
+                job = enqueue("api.import_students", [with_hashed_passwords(rows)])
+                url = reverse("students-import-status", args=[job.pk], request=request)
+                return Response({"job": job.pk, "status": url}, status=status.HTTP_202_ACCEPTED)
+        else:
+            students, errors = import_students(rows, processes=1)
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"created": len(students)}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["get"], url_path=r"import/(?P<job_id>\d+)", url_name="import-status")
+    def import_status(self, request, job_id=None):
+        """
+        Status of a queued import, with what the import answered once it is done
+        """
+        job = Job.objects.filter(pk=job_id, name="api.import_students").first()
+        if job is None:
+            raise NotFound()
+        return Response({"job": job.pk, "status": job.status, "result": job.result})
+
 
-class TeacherViewSet(ModelViewSet):
+class TeacherViewSet(CachedResponseMixin, ExpandableQuerysetMixin, ModelViewSet):
     queryset = Teacher.objects.filter(is_active=True)
     serializer_class = TeacherSerializer
+    cache_versions = ("teacher",)
 
+    @action(detail=True, methods=["get"])
+    def dashboard(self, request, pk=None):
+        """
+        Students, this month's expected and collected revenue, attendance rate over the last lessons and average
+        points of each of the teacher's groups, e.g. ?year=2025&month=3&lessons=10
+        """
+        teacher = self.get_object()
+        query = DashboardQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response(teacher_dashboard(teacher.pk, **query.validated_data))
 
-class GroupViewSet(ModelViewSet):
+
+class GroupViewSet(CachedResponseMixin, ExpandableQuerysetMixin, ModelViewSet):
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
+    cache_versions = ("group", "subject", "teacher", "room")
+
+    @action(detail=False, methods=["get"])
+    def running(self, request):
+        """
+        Groups having a lesson now or at ?at=<datetime>, with their room and teacher
+        """
+        query = ScheduleQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        groups = get_schedule().running(query.validated_data["at"])
+        return Response([
+            {
+                "id": group["id"],
+                "name": group["name"],
+                "start_time": group["start_time"],
+                "end_time": group["end_time"],
+                "room": {"id": group["room_id"], "number": group["room__number"]} if group["room_id"] else None,
+                "teacher": {"id": group["teacher_id"], "first_name": group["teacher__first_name"],
+                            "last_name": group["teacher__last_name"]},
+            }
+            for group in groups
+        ])
+
+    @action(detail=True, methods=["post"], url_path="generate-lessons")
+    def generate_lessons(self, request, pk=None):
+        """
+        Create the group's lessons for every lesson day from `since` (today by default) to its end date and drop
+        unused future lessons that no longer fit its schedule
+        """
+        group = self.get_object()
+        serializer = LessonCalendarSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        created, deleted = generate_lessons([group.pk], **serializer.validated_data)
+        return Response({"created": created, "deleted": deleted})
 
 
-class SubjectViewSet(ModelViewSet):
+class SubjectViewSet(CachedResponseMixin, ExpandableQuerysetMixin, ModelViewSet):
     queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
+    cache_versions = ("subject",)
+    keyset_ordering = ("name", "id")
 
 
-class RoomViewSet(ModelViewSet):
+class RoomViewSet(CachedResponseMixin, ExpandableQuerysetMixin, ModelViewSet):
     queryset = Room.objects.all()
     serializer_class = RoomSerializer
+    cache_versions = ("room",)
+    keyset_ordering = ("number", "id")
 
+    @action(detail=False, methods=["get"])
+    def free(self, request):
+        """
+        Rooms no group has a lesson in now or at ?at=<datetime>
+        """
+        query = ScheduleQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response(get_schedule().free_rooms(query.validated_data["at"]))
 
-class AdminViewSet(ModelViewSet):
+
+class AdminViewSet(ExpandableQuerysetMixin, ModelViewSet):
     queryset = Admin.objects.filter(is_active=True)
     serializer_class = AdminSerializer
+
+
+class LessonViewSet(ExpandableQuerysetMixin, ModelViewSet):
+    queryset = Lesson.objects.all()
+    serializer_class = LessonSerializer
+
+    @action(detail=True, methods=["get", "put"])
+    def attendance(self, request, pk=None):
+        """
+        GET returns the lesson's roster, PUT marks the whole roster at once with a list of
+        {"student": id, "is_absent": bool}
+        """
+        lesson = self.get_object()
+        if request.method == "GET":
+            return Response(lesson_roster(lesson))
+
+        serializer = AttendanceMarkSerializer(data=request.data, many=True, allow_empty=False)
+        serializer.is_valid(raise_exception=True)
+        marks = {mark["student"]: mark["is_absent"] for mark in serializer.validated_data}
+        roster, unknown = mark_attendance(lesson, marks)
+        if unknown:
+            return Response({"student": [f"Student {pk} is not in the lesson's group" for pk in unknown]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(roster)
+
+
+class HomeworkViewSet(ExpandableQuerysetMixin, ModelViewSet):
+    queryset = Homework.objects.select_related("stored_file", "lesson")
+    serializer_class = HomeworkSerializer
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        """
+        The homework's file, for staff and the teacher, students and parents of its group
+        """
+        homework = self.get_object()
+        if not request.user.is_authenticated:
+            raise NotAuthenticated()
+        if not can_access_group(request.user, homework.lesson.group_id):
+            raise PermissionDenied("You have no access to this group's homework")
+
+        stored = homework.stored_file
+        if stored is not None:
+            return file_response(request, stored.file.name, homework.file_name or stored.content_hash,
+                                 stored.content_type, etag=f'"{stored.content_hash}"')
+        if homework.file:
+            return file_response(request, homework.file.name, os.path.basename(homework.file.name))
+        raise NotFound("The homework has no file")
+
+
+class UploadViewSet(CreateModelMixin, RetrieveModelMixin, DestroyModelMixin, GenericViewSet):
+    """
+    Chunked, resumable uploads. POST {"file_name", "size", "content_type"} starts one, PUT sends the next chunk
+    as the raw request body with a Content-Range header (and optionally its X-Chunk-SHA256), GET tells where to
+    resume. The last chunk stores the file, attach it to homework by the upload's id
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = UploadSession.objects.filter(created_by=self.request.user)
+        return self.get_serializer_class().load_requested(queryset, self.request)
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+    def update(self, request, *args, **kwargs):
+        session = self.get_object()
+        try:
+            start, length = parse_content_range(request.headers.get("Content-Range"), session.size)
+            # The body is streamed to disk as it is read, never parsed into memory
+            write_chunk(session, start, request.stream, length, request.headers.get("X-Chunk-SHA256"))
+        except UploadError as exc:
+            return Response({"detail": str(exc), "received": session.received}, status=exc.status)
+        return Response(self.get_serializer(session).data)
+
+    def perform_destroy(self, instance):
+        if not instance.stored_file_id and os.path.exists(part_path(instance)):
+            os.remove(part_path(instance))
+        instance.delete()
+
+
+class PaymentViewSet(ExpandableQuerysetMixin, ModelViewSet):
+    queryset = Payment.objects.all()
+    serializer_class = PaymentSerializer
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """
+        Create thousands of payments in one request with a constant number of queries
+        """
+        serializer = PaymentBulkSerializer(data=request.data, many=True, allow_empty=False)
+        serializer.is_valid(raise_exception=True)
+        payments, errors = bulk_create_payments(serializer.validated_data)
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"created": len(payments)}, status=status.HTTP_201_CREATED)
+
+
+class PaymentReportViewSet(ViewSet):
+    """
+    Paid amount, expected amount and debt of every student for a month, e.g. ?year=2025&month=3&debtors=true
+    """
+
+    def list(self, request):
+        query = PaymentReportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        rows = list(monthly_payment_report(**query.validated_data))
+        return Response({
+            **query.validated_data,
+            "total_expected": sum(row["expected"] for row in rows),
+            "total_paid": sum(row["paid"] for row in rows),
+            "total_debt": sum(row["debt"] for row in rows),
+            "results": rows,
+        })
+
+
+class LeaderboardViewSet(ViewSet):
+    """
+    Students ranked by their points in a group, or school-wide without ?group=, e.g. ?group=<id>&limit=10
+    """
+
+    def list(self, request):
+        query = LeaderboardQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response({
+            "group": query.validated_data["group"],
+            "results": top_students(query.validated_data["group"], query.validated_data["limit"]),
+        })
+
+    @action(detail=False, methods=["get"])
+    def rank(self, request):
+        """
+        A student's rank, e.g. ?student=<id>&group=<id>
+        """
+        query = LeaderboardRankQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        entry = student_rank(query.validated_data["student"], query.validated_data["group"])
+        if entry is None:
+            raise NotFound("The student has no points in this leaderboard")
+        return Response(entry)
+
+
+class SmsStatusViewSet(ViewSet):
+    """
+    Delivery reports Eskiz posts to ESKIZ_CALLBACK_URL, which carries ESKIZ_CALLBACK_SECRET as ?secret=
+    """
+    authentication_classes = []
+
+    def create(self, request):
+        secret = settings.ESKIZ_CALLBACK_SECRET
+        if not secret or not constant_time_compare(request.query_params.get("secret", ""), secret):
+            raise NotFound()
+        record_delivery(request.data.get("user_sms_id"), request.data.get("status"))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FinanceReportViewSet(ViewSet):
+    """
+    Income, expenses and net profit read from monthly rollups, e.g. ?start=2024-01&end=2025-12&by=teacher
+    """
+
+    def list(self, request):
+        query = FinanceReportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        rows = finance_report(**query.validated_data)
+        start, end = query.validated_data["start"], query.validated_data["end"]
+        return Response({
+            "start": f"{start[0]}-{start[1]:02}",
+            "end": f"{end[0]}-{end[1]:02}",
+            "by": query.validated_data["by"],
+            "total_income": sum(row["income"] for row in rows),
+            "total_expenses": sum(row["expenses"] for row in rows),
+            "total_net": sum(row["net"] for row in rows),
+            "results": rows,
+        })
+
+
+class ExportViewSet(ViewSet):
+    """
+    Streams full exports as CSV or XLSX, e.g. /exports/payments/?date_from=2025-01-01&file_type=xlsx
+    """
+
+    def export(self, request, name):
+        query = ExportQuerySerializer(data=request.query_params, context={"filters": export_filters(name)})
+        query.is_valid(raise_exception=True)
+        filters = dict(query.validated_data)
+        file_type = filters.pop("file_type")
+
+        chunks, content_type = stream_export(name, file_type, **filters)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        filename = f"{name}-{timezone.localdate().isoformat()}.{file_type}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False)
+    def payments(self, request):
+        return self.export(request, "payments")
+
+    @action(detail=False)
+    def expenses(self, request):
+        return self.export(request, "expenses")
+
+    @action(detail=False)
+    def attendance(self, request):
+        return self.export(request, "attendance")
+
+    @action(detail=False)
+    def rosters(self, request):
+        return self.export(request, "rosters")
@@ -0,0 +1,36 @@
+"""
+Gunicorn settings, every value can be overridden from the environment.
+
+    gunicorn -c gunicorn.conf.py
+
+Send HUP to the master process to reload the code gracefully: new workers are started and old ones finish the
+requests they are serving first.
+"""
+import multiprocessing
+import os
+
+wsgi_app = os.environ.get("GUNICORN_APP", "PROJECT.wsgi:application")
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Processes, each one holds its own database connection per thread
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# More than one thread switches to the gthread worker, which overlaps requests waiting on the database
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread" if threads > 1 else "sync")
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Restart workers now and then so a slow leak cannot grow forever, jitter keeps them from restarting together
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 5000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 500))
+
+# Not preloaded, so HUP loads new code and no connection opened in the master is shared by forked workers
+preload_app = False
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+# Trust X-Forwarded-* from the nginx container in front of the app
+forwarded_allow_ips = os.environ.get("GUNICORN_FORWARDED_ALLOW_IPS", "*")
@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from . import models
+from .queue import requeue
+
+
+@admin.register(models.Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ["id", "name", "queue", "priority", "status", "attempts", "run_at", "finished_at"]
+    list_filter = ["status", "queue", "name"]
+    actions = ["requeue_jobs"]
+
+    @admin.action(description="Queue selected failed jobs again")
+    def requeue_jobs(self, request, queryset):
+        self.message_user(request, f"Queued {requeue(queryset)} jobs again")
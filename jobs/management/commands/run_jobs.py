@@ -0,0 +1,53 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.queue import Worker, recover_expired
+from jobs.utils import JobStatuses
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs, keeps running and polling the queue by default. Start as many as needed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queue", action="append", dest="queues",
+                            help="Queue to take jobs from, repeat for more, every queue by default")
+        parser.add_argument("--interval", type=float, default=1, help="Seconds to wait when nothing is due")
+        parser.add_argument("--burst", action="store_true", help="Run the jobs due now and exit")
+        parser.add_argument("--max-jobs", type=int, help="Exit after running this many jobs")
+
+    def handle(self, *args, **options):
+        worker = Worker(queues=options["queues"])
+        self.stopping = False
+        # Finish the running job before stopping
+        handlers = {signum: signal.signal(signum, self.stop) for signum in (signal.SIGINT, signal.SIGTERM)}
+        try:
+            ran = self.work(worker, options)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write(f"Ran {ran} jobs")
+
+    def work(self, worker, options):
+        ran = 0
+        while not self.stopping:
+            # Like at the start of a request, drop connections that broke or are too old
+            close_old_connections()
+            job = worker.run_next()
+            if job is not None:
+                ran += 1
+                style = self.style.SUCCESS if job.status == JobStatuses.DONE else self.style.WARNING
+                self.stdout.write(style(f"{job.name} #{job.pk}: {job.status}"))
+                if options["max_jobs"] and ran >= options["max_jobs"]:
+                    break
+                continue
+            if options["burst"]:
+                break
+            recover_expired()
+            time.sleep(options["interval"])
+        return ran
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,44 @@
+from django.db import models
+from django.utils import timezone
+
+from .utils import JobStatuses
+
+
+class Job(models.Model):
+    """
+    A call of a registered task waiting to run, running or finished. Workers take queued jobs whose run_at has come,
+    highest priority first. A job out of attempts stays FAILED as a dead letter until it is requeued
+    """
+
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    name = models.CharField(max_length=255)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    queue = models.CharField(max_length=50, default="default")
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=JobStatuses.choices, default=JobStatuses.QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    # Keeps a job from being queued twice for as long as the first one exists, finished or not, until it is pruned.
+    # Scheduled runs rely on it so a run finished by one worker is not queued again by another
+    key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    # The worker running the job and when its claim ends, a job still running after that is taken as crashed
+    locked_by = models.CharField(max_length=255, blank=True, default="")
+    locked_until = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created"]
+        indexes = [
+            # The order workers take queued jobs in
+            models.Index(fields=["queue", "-priority", "run_at", "id"], condition=models.Q(status="queued"),
+                         name="job_queued"),
+            models.Index(fields=["locked_until"], condition=models.Q(status="running"), name="job_running"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} - {self.status}"
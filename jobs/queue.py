@@ -0,0 +1,258 @@
+import json
+import os
+import socket
+import traceback
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import update_wrapper
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .utils import JobStatuses
+
+# Registered tasks by name
+TASKS = {}
+# Queued jobs looked at per attempt to claim one without SKIP LOCKED
+CLAIM_CANDIDATES = 10
+
+
+class Task:
+    """
+    A function that can run as a job. Calling it runs it right away, `enqueue` queues a job running it
+    """
+
+    def __init__(self, func, name, queue, priority, max_attempts, timeout):
+        update_wrapper(self, func)
+        self.func = func
+        self.name = name
+        self.queue = queue
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, *args, **kwargs):
+        return enqueue(self.name, args, kwargs)
+
+
+def task(func=None, *, name=None, queue="default", priority=0, max_attempts=None, timeout=None):
+    """
+    Register a function as a task, named after its module and name by default. Arguments must be JSON
+    serializable. `timeout` is the seconds a job may run before it is taken as crashed, JOBS_TIMEOUT by default
+    """
+
+    def register(func):
+        registered = Task(func, name or f"{func.__module__}.{func.__name__}", queue, priority, max_attempts, timeout)
+        TASKS[registered.name] = registered
+        return registered
+
+    return register(func) if func else register
+
+
+def enqueue(name, args=(), kwargs=None, *, queue=None, priority=None, run_at=None, delay=None, key=None,
+            max_attempts=None):
+    """
+    Queue a job running the task `name`, at `run_at` or in `delay` seconds, right away by default. The job is
+    saved in the current transaction, so it only runs if the transaction commits. With a `key`, a job already
+    saved under it is kept and None is returned, whether it is still queued or finished, until it is pruned
+    """
+    registered = TASKS.get(name)
+    if registered is None:
+        raise LookupError(f"No task is registered as {name}")
+    if delay is not None:
+        run_at = timezone.now() + timedelta(seconds=delay)
+    job = Job(
+        name=name,
+        args=list(args),
+        kwargs=kwargs or {},
+        queue=queue or registered.queue,
+        priority=registered.priority if priority is None else priority,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or registered.max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        key=key,
+    )
+    if key is None:
+        job.save()
+        return job
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return None
+    return job
+
+
+def timeout_of(job):
+    registered = TASKS.get(job.name)
+    return (registered and registered.timeout) or settings.JOBS_TIMEOUT
+
+
+def start(job, worker):
+    """
+    Mark a queued job as running in `worker`, False when another worker started it first
+    """
+    now = timezone.now()
+    locked_until = now + timedelta(seconds=timeout_of(job))
+    started = Job.objects.filter(pk=job.pk, status=JobStatuses.QUEUED).update(
+        status=JobStatuses.RUNNING, attempts=F("attempts") + 1, locked_by=worker, locked_until=locked_until,
+        updated=now,
+    )
+    if started:
+        job.status, job.attempts, job.locked_by, job.locked_until = (JobStatuses.RUNNING, job.attempts + 1, worker,
+                                                                     locked_until)
+    return bool(started)
+
+
+def claim(worker, queues=None):
+    """
+    Start the next due job of the given queues (every queue by default) in `worker` and return it, None when
+    nothing is due. Postgres hands every worker a different job with SKIP LOCKED, databases without it (SQLite)
+    fall back to starting the first job no other worker has started in the meantime
+    """
+    due = Job.objects.filter(status=JobStatuses.QUEUED, run_at__lte=timezone.now())
+    if queues:
+        due = due.filter(queue__in=queues)
+    due = due.order_by("-priority", "run_at", "id")
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = due.select_for_update(skip_locked=True).first()
+            if job is not None:
+                start(job, worker)
+            return job
+
+    while True:
+        candidates = list(due[:CLAIM_CANDIDATES])
+        if not candidates:
+            return None
+        for job in candidates:
+            if start(job, worker):
+                return job
+
+
+def json_result(result):
+    """
+    A task's return value the way it is stored, its repr when it is not JSON serializable
+    """
+    try:
+        return json.loads(json.dumps(result, cls=DjangoJSONEncoder))
+    except (TypeError, ValueError):
+        return repr(result)
+
+
+def retry_delay(attempts):
+    return settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def run(job):
+    """
+    Run a started job and record how it went. A failed job is queued again after a delay doubling with every
+    attempt, and stays FAILED once it is out of attempts. Returns whether it succeeded
+    """
+    registered = TASKS.get(job.name)
+    try:
+        if registered is None:
+            raise LookupError(f"No task is registered as {job.name}")
+        result = registered.func(*job.args, **job.kwargs)
+    except Exception:
+        job.error = traceback.format_exc()
+    else:
+        job.status, job.result, job.error = JobStatuses.DONE, json_result(result), ""
+
+    now = timezone.now()
+    if job.status == JobStatuses.DONE:
+        changes = {"status": JobStatuses.DONE, "result": job.result, "error": "", "finished_at": now}
+    elif job.attempts >= job.max_attempts:
+        job.status = JobStatuses.FAILED
+        changes = {"status": JobStatuses.FAILED, "error": job.error, "finished_at": now}
+    else:
+        job.status, job.run_at = JobStatuses.QUEUED, now + timedelta(seconds=retry_delay(job.attempts))
+        changes = {"status": JobStatuses.QUEUED, "error": job.error, "run_at": job.run_at}
+    # The job may have been taken as crashed and started again by another worker meanwhile
+    Job.objects.filter(pk=job.pk, status=JobStatuses.RUNNING, locked_by=job.locked_by).update(
+        locked_by="", locked_until=None, updated=now, **changes,
+    )
+    return job.status == JobStatuses.DONE
+
+
+def recover_expired():
+    """
+    Queue again the jobs running past their timeout, whose worker is taken as crashed, or fail them when they are
+    out of attempts. Returns the number of jobs (queued again, failed)
+    """
+    now = timezone.now()
+    expired = Job.objects.filter(status=JobStatuses.RUNNING, locked_until__lt=now)
+    error = "The job ran past its timeout or its worker stopped"
+    failed = expired.filter(attempts__gte=F("max_attempts")).update(
+        status=JobStatuses.FAILED, error=error, finished_at=now, locked_by="", locked_until=None, updated=now,
+    )
+    requeued = expired.update(status=JobStatuses.QUEUED, error=error, run_at=now, locked_by="", locked_until=None,
+                              updated=now)
+    return requeued, failed
+
+
+def requeue(jobs):
+    """
+    Give failed jobs, the dead letters, a fresh set of attempts. Returns the number of jobs queued again
+    """
+    return jobs.filter(status=JobStatuses.FAILED).update(
+        status=JobStatuses.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None, updated=timezone.now(),
+    )
+
+
+def prune_jobs(batch_size=1000):
+    """
+    Delete jobs done more than JOBS_KEEP_FINISHED seconds ago, failed jobs are kept until they are requeued or
+    deleted by hand. Returns the number of jobs deleted
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.JOBS_KEEP_FINISHED)
+    deleted = 0
+    while True:
+        batch = list(Job.objects.filter(status=JobStatuses.DONE, finished_at__lt=cutoff)
+                     .order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += Job.objects.filter(pk__in=batch).delete()[0]
+
+
+class Worker:
+    """
+    Takes due jobs one at a time and runs them. It also queues the runs of JOBS_SCHEDULE tasks as their time comes
+    and recovers jobs of crashed workers. Any number of workers may run at once
+    """
+
+    def __init__(self, queues=None, name=None):
+        self.queues = queues
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        # Last scheduled run queued per task, so each worker tries to queue a run once
+        self.scheduled = {}
+
+    def schedule(self, now=None):
+        """
+        Queue the current run of every JOBS_SCHEDULE task ({name: seconds between runs}). Runs start at multiples
+        of their interval since the epoch and their key keeps workers from queueing the same run twice
+        """
+        now = now or timezone.now()
+        for name, interval in settings.JOBS_SCHEDULE.items():
+            slot = int(now.timestamp() // interval)
+            if self.scheduled.get(name) == slot:
+                continue
+            run_at = datetime.fromtimestamp(slot * interval, tz=dt_timezone.utc)
+            enqueue(name, run_at=run_at, key=f"schedule:{name}:{slot}")
+            self.scheduled[name] = slot
+
+    def run_next(self):
+        """
+        Run the next due job and return it, None when nothing is due
+        """
+        self.schedule()
+        job = claim(self.name, self.queues)
+        if job is not None:
+            run(job)
+        return job
@@ -0,0 +1,3 @@
+from .queue import prune_jobs, task
+
+task(prune_jobs, name="jobs.prune_jobs")
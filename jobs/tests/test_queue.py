@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import Worker, claim, enqueue, prune_jobs, recover_expired, requeue, run, task
+from jobs.utils import JobStatuses
+
+calls = []
+
+
+@task(name="tests.record")
+def record(value):
+    calls.append(value)
+    return {"value": value}
+
+
+@task(name="tests.fail", max_attempts=2)
+def fail():
+    raise RuntimeError("Broken")
+
+
+def make_due():
+    Job.objects.update(run_at=timezone.now())
+
+
+@override_settings(JOBS_RETRY_DELAY=30, JOBS_TIMEOUT=60, JOBS_SCHEDULE={})
+class JobQueueTest(TestCase):
+    """
+    Test workers take due jobs by priority, retry failed ones and leave them as dead letters when out of attempts
+    """
+
+    def setUp(self):
+        calls.clear()
+
+    def test_priority_and_delay(self):
+        enqueue("tests.record", ["low"])
+        enqueue("tests.record", ["high"], priority=10)
+        enqueue("tests.record", ["later"], priority=20, delay=60)
+        record.enqueue("default")
+
+        self.assertEqual([claim("worker").args[0] for _ in range(3)], ["high", "low", "default"])
+        self.assertIsNone(claim("worker"))
+        make_due()
+        job = claim("worker")
+        self.assertEqual((job.args, job.status, job.attempts, job.locked_by), (["later"], "running", 1, "worker"))
+
+        self.assertTrue(run(job))
+        job = Job.objects.get(pk=job.pk)
+        self.assertEqual((job.status, job.result, job.locked_by), (JobStatuses.DONE, {"value": "later"}, ""))
+        self.assertEqual(calls, ["later"])
+
+    def test_transactions_and_keys(self):
+        with transaction.atomic():
+            enqueue("tests.record", ["rolled back"])
+            transaction.set_rollback(True)
+        self.assertFalse(Job.objects.exists())
+
+        self.assertIsNotNone(enqueue("tests.record", ["once"], key="once"))
+        self.assertIsNone(enqueue("tests.record", ["once"], key="once"))
+        self.assertEqual(Job.objects.count(), 1)
+        with self.assertRaises(LookupError):
+            enqueue("tests.missing")
+
+    def test_retries_and_dead_letters(self):
+        enqueue("tests.fail", queue="other")
+        self.assertIsNone(claim("worker", queues=["default"]))
+        job = claim("worker", queues=["other"])
+        self.assertFalse(run(job))
+        job = Job.objects.get(pk=job.pk)
+        self.assertEqual((job.status, job.attempts), (JobStatuses.QUEUED, 1))
+        self.assertIn("RuntimeError: Broken", job.error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=25))
+
+        make_due()
+        run(claim("worker"))
+        job = Job.objects.get(pk=job.pk)
+        self.assertEqual((job.status, job.attempts), (JobStatuses.FAILED, 2))
+        self.assertIsNone(claim("worker"))
+
+        self.assertEqual(requeue(Job.objects.all()), 1)
+        self.assertEqual(claim("worker").attempts, 1)
+
+    def test_crashed_workers(self):
+        enqueue("tests.record", ["crashed"])
+        enqueue("tests.fail")
+        first, second = claim("first"), claim("first")
+        Job.objects.filter(pk=second.pk).update(attempts=2)
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(recover_expired(), (1, 1))
+        self.assertEqual(Job.objects.get(pk=second.pk).status, JobStatuses.FAILED)
+
+        # The first worker finishing late does not overwrite the job taken over by another one
+        taken = claim("second")
+        self.assertEqual(taken.pk, first.pk)
+        run(first)
+        self.assertEqual(Job.objects.get(pk=first.pk).locked_by, "second")
+
+    def test_schedule(self):
+        now = datetime(2026, 1, 1, 10, 0, 30, tzinfo=dt_timezone.utc)
+        with self.settings(JOBS_SCHEDULE={"tests.record": 60}):
+            Worker(name="first").schedule(now)
+            Worker(name="second").schedule(now + timedelta(seconds=20))
+            self.assertEqual(Job.objects.get().run_at, datetime(2026, 1, 1, 10, 0, tzinfo=dt_timezone.utc))
+            Worker(name="first").schedule(now + timedelta(seconds=40))
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_command_and_pruning(self):
+        enqueue("tests.record", ["first"])
+        enqueue("tests.fail")
+        out = StringIO()
+        call_command("run_jobs", "--burst", stdout=out)
+        self.assertIn("tests.record", out.getvalue())
+        self.assertIn("Ran 2 jobs", out.getvalue())
+
+        Job.objects.filter(status=JobStatuses.DONE).update(finished_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(prune_jobs(), 1)
+        self.assertEqual(Job.objects.get().name, "tests.fail")
@@ -0,0 +1,8 @@
+from django.db import models
+
+
+class JobStatuses(models.TextChoices):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
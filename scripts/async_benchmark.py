@@ -0,0 +1,91 @@
+"""
+Compare sync and async read endpoints under many concurrent connections, standard library only.
+
+    python scripts/async_benchmark.py http://127.0.0.1:8000 --prefix rooms --concurrency 200 --duration 20
+
+Each client keeps one HTTP/1.1 connection open and requests /api/v1/<prefix>/ or /api/v1/async/<prefix>/ in a
+loop, optionally reading the response slowly (--read-delay) like a client on a bad network. Serve the app over
+WSGI (gunicorn sync workers) for the sync numbers and over ASGI (gunicorn with the uvicorn worker) for the async
+ones, see the README.
+"""
+import argparse
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from loadtest import percentile
+
+
+async def client(host, port, path, headers, deadline, read_delay, latencies, errors):
+    request = (f"GET {path} HTTP/1.1\r\nHost: {host}\r\n{headers}\r\n").encode()
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            await writer.drain()
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = next(
+                int(line.split(b":", 1)[1]) for line in head.split(b"\r\n") if line.lower().startswith(b"content-length")
+            )
+            while length > 0:
+                length -= len(await reader.read(min(length, 4096)))
+                if read_delay:
+                    await asyncio.sleep(read_delay)
+            if not head.startswith(b"HTTP/1.1 200"):
+                errors.append(head.split(b"\r\n", 1)[0])
+                continue
+            if b"connection: close" in head.lower():
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, StopIteration) as exc:
+            errors.append(exc)
+            if writer is not None:
+                writer.close()
+            writer = None
+            continue
+        latencies.append(time.perf_counter() - started)
+    if writer is not None:
+        writer.close()
+
+
+async def run(url, path, args):
+    parts = urlsplit(url)
+    headers = f"Authorization: Bearer {args.token}\r\n" if args.token else ""
+    latencies, errors = [], []
+    deadline = time.perf_counter() + args.duration
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(parts.hostname, parts.port or 80, path, headers, deadline, args.read_delay, latencies, errors)
+        for _ in range(args.concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies), len(errors), len(latencies) / elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url", help="Server root, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--prefix", default="rooms", help="Endpoint to compare, e.g. students, groups, rooms")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per endpoint")
+    parser.add_argument("--read-delay", type=float, default=0, help="Seconds to wait between 4 KiB reads")
+    parser.add_argument("--token", help="JWT access token sent as a Bearer authorization header")
+    parser.add_argument("--only", choices=["sync", "async"], help="Benchmark one of the two endpoints")
+    args = parser.parse_args()
+
+    paths = {"sync": f"/api/v1/{args.prefix}/", "async": f"/api/v1/async/{args.prefix}/"}
+    print(f"{'endpoint':<28}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, path in paths.items():
+        if args.only and args.only != name:
+            continue
+        count, errors, throughput, latencies = asyncio.run(run(args.url, path, args))
+        p50, p95, p99 = (percentile(latencies, p) * 1000 if latencies else 0 for p in (50, 95, 99))
+        print(f"{path:<28}{count:>10}{errors:>8}{throughput:>10.1f}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
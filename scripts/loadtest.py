@@ -0,0 +1,71 @@
+"""
+Small HTTP load generator, standard library only.
+
+    python scripts/loadtest.py http://127.0.0.1:8000/api/v1/groups/ --concurrency 32 --duration 30 --token <access>
+
+Prints requests per second, error count and latency percentiles, run it against each setup with the same arguments
+to compare them.
+"""
+import argparse
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def worker(url, headers, deadline, latencies, errors, lock):
+    local_latencies, local_errors = [], 0
+    while time.perf_counter() < deadline:
+        request = urllib.request.Request(url, headers=headers)
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+        except (urllib.error.URLError, OSError):
+            local_errors += 1
+            continue
+        local_latencies.append(time.perf_counter() - started)
+    with lock:
+        latencies.extend(local_latencies)
+        errors.append(local_errors)
+
+
+def percentile(values, percent):
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run")
+    parser.add_argument("--token", help="JWT access token sent as a Bearer authorization header")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    latencies, errors, lock = [], [], threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(args.url, headers, deadline, latencies, errors, lock))
+        for _ in range(args.concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"requests: {len(latencies)}, errors: {sum(errors)}, elapsed: {elapsed:.1f}s")
+    print(f"throughput: {len(latencies) / elapsed:.1f} req/s")
+    if latencies:
+        print("latency ms: mean {:.1f}, p50 {:.1f}, p95 {:.1f}, p99 {:.1f}, max {:.1f}".format(
+            statistics.mean(latencies) * 1000, percentile(latencies, 50) * 1000,
+            percentile(latencies, 95) * 1000, percentile(latencies, 99) * 1000, latencies[-1] * 1000,
+        ))
+
+
+if __name__ == "__main__":
+    main()